@@ -1,23 +1,347 @@
+import os
+import json
+import time
+import random
+import asyncio
 import logging
+import threading
 import requests
 from abc import ABC
+from typing import Dict, Generator, Optional, Tuple, Union
+from weakref import WeakKeyDictionary
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+from apis import cancellation
+from apis.async_http import AsyncHTTPClient, require_aiohttp
+from apis.rate_limiter import TokenBucket
+from apis.response_cache import ResponseCache
+from instrumentation import METRICS
+
+
+class RateLimitError(Exception):
+    pass
+
 
 class APITemplate(ABC):
     BASE_URL = None
-    
-    @classmethod
-    def get(cls, url) -> requests.Response:
-        try:
-            res = requests.get(f'{cls.BASE_URL}/{url}')
-            APITemplate.handle_response_errors(res)
-            return res
-        except Exception as e:
-            logging.error(f"Error while requesting {cls.BASE_URL}: {e}")
-            raise e
-
-    @staticmethod    
+    POOL_SIZE = 10
+    CONNECT_TIMEOUT = 5
+    READ_TIMEOUT = 30
+    CACHE_TTL = 0 # seconds a cached response is served for, 0 disables the cache
+    CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "checkpoint-project", "responses.sqlite3")
+    CACHE_MAX_BYTES = 256 * 1024 * 1024 # of response bodies, a CPE page alone can weigh a few MB
+    CACHE_MAX_AGE = 24 * 60 * 60 # the longest TTL asked of the cache, older responses are purged
+    RATE_LIMIT: Optional[Tuple[int, float]] = None # (requests, per seconds) allowed without an API key
+    AUTHENTICATED_RATE_LIMIT: Optional[Tuple[int, float]] = None
+    API_KEY_ENV: Optional[str] = None # the environment variable holding the API key
+    MAX_RATE_LIMIT_WAIT = 60 # seconds, waiting longer than that fails the request instead
+    MAX_RETRIES = 4
+    BACKOFF_BASE = 1 # seconds, doubled on every retry
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    MAX_REDIRECTS = 30 # as many as requests follows
+    ASYNC_POOL_SIZE = 100 # connections per host shared by all the tasks of an event loop
+    HTTP_BACKEND: Optional[str] = None # "threads" or "asyncio", read from HTTP_BACKEND_ENV when not set
+    HTTP_BACKEND_ENV = "HTTP_BACKEND"
+
+    _sessions: Dict[str, requests.Session] = {} # one pooled keep-alive session per host, shared by all subclasses
+    _sessions_lock = threading.Lock()
+    _rate_limiters: Dict[str, TokenBucket] = {}
+    _cache: Optional[ResponseCache] = None
+    _async_clients: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncHTTPClient]]" = WeakKeyDictionary()
+
+    @classmethod
+    def get(cls, url, cache_ttl: Optional[float] = None, stream: bool = False) -> requests.Response:
+        """
+        a streamed response's body is read by the caller as it arrives, so it is never cached
+        """
+        full_url = f'{cls.BASE_URL}/{url}'
+        cache_ttl = 0 if stream else cls.CACHE_TTL if cache_ttl is None else cache_ttl
+        with METRICS.span("http_request", host=urlsplit(cls.BASE_URL).netloc, method="GET", cache="miss", status="error") as span_labels:
+            try:
+                if cache_ttl > 0:
+                    cached_body = cls.get_cache().get(full_url, cache_ttl)
+                    if cached_body is not None:
+                        span_labels.update(cache="hit", status="200")
+                        METRICS.count("http_response_bytes", len(cached_body), host=span_labels["host"], cache="hit")
+                        return APITemplate.__cached_response(full_url, cached_body)
+                res = cls.__request_with_retries("GET", full_url, stream)
+                span_labels["status"] = str(res.status_code)
+                APITemplate.handle_response_errors(res)
+                # a streamed body is still to be read, its size is only known from the headers
+                METRICS.count("http_response_bytes", int(res.headers.get("Content-Length") or 0) if stream else len(res.content),
+                              host=span_labels["host"], cache="miss")
+                if cache_ttl > 0 and 200 <= res.status_code < 300: # e.g. not the body of a redirect that was not followed
+                    cls.get_cache().set(full_url, res.content)
+                return res
+            except Exception as e:
+                logging.error(f"Error while requesting {cls.BASE_URL}: {e}")
+                raise e
+
+    @classmethod
+    def post(cls, url, payload: dict) -> requests.Response:
+        """
+        posts payload as JSON, meant for queries (e.g. GraphQL) which are safe to retry, the responses are not cached
+        """
+        full_url = f'{cls.BASE_URL}/{url}'
+        with METRICS.span("http_request", host=urlsplit(cls.BASE_URL).netloc, method="POST", cache="miss", status="error") as span_labels:
+            try:
+                res = cls.__request_with_retries("POST", full_url, payload=payload)
+                span_labels["status"] = str(res.status_code)
+                APITemplate.handle_response_errors(res)
+                METRICS.count("http_response_bytes", len(res.content), host=span_labels["host"], cache="miss")
+                return res
+            except Exception as e:
+                logging.error(f"Error while posting to {cls.BASE_URL}: {e}")
+                raise e
+
+    @classmethod
+    async def async_get(cls, url, cache_ttl: Optional[float] = None) -> requests.Response:
+        """
+        get for the tasks of an event loop, which share the host's connection pool (of that loop), rate limiter and cache
+        with each other and with the threads
+        """
+        full_url = f'{cls.BASE_URL}/{url}'
+        cache_ttl = cls.CACHE_TTL if cache_ttl is None else cache_ttl
+        with METRICS.span("http_request", host=urlsplit(cls.BASE_URL).netloc, method="GET", cache="miss", status="error") as span_labels:
+            try:
+                if cache_ttl > 0:
+                    cached_body = cls.get_cache().get(full_url, cache_ttl)
+                    if cached_body is not None:
+                        span_labels.update(cache="hit", status="200")
+                        METRICS.count("http_response_bytes", len(cached_body), host=span_labels["host"], cache="hit")
+                        return APITemplate.__cached_response(full_url, cached_body)
+                res = await cls.__async_request_with_retries("GET", full_url)
+                span_labels["status"] = str(res.status_code)
+                APITemplate.handle_response_errors(res)
+                METRICS.count("http_response_bytes", len(res.content), host=span_labels["host"], cache="miss")
+                if cache_ttl > 0 and 200 <= res.status_code < 300:
+                    cls.get_cache().set(full_url, res.content)
+                return res
+            except Exception as e:
+                logging.error(f"Error while requesting {cls.BASE_URL}: {e}")
+                raise e
+
+    @classmethod
+    async def async_post(cls, url, payload: dict) -> requests.Response:
+        full_url = f'{cls.BASE_URL}/{url}'
+        with METRICS.span("http_request", host=urlsplit(cls.BASE_URL).netloc, method="POST", cache="miss", status="error") as span_labels:
+            try:
+                res = await cls.__async_request_with_retries("POST", full_url, payload)
+                span_labels["status"] = str(res.status_code)
+                APITemplate.handle_response_errors(res)
+                METRICS.count("http_response_bytes", len(res.content), host=span_labels["host"], cache="miss")
+                return res
+            except Exception as e:
+                logging.error(f"Error while posting to {cls.BASE_URL}: {e}")
+                raise e
+
+    @classmethod
+    def __request_with_retries(cls, method: str, full_url: str, stream: bool = False, payload: Optional[dict] = None) -> requests.Response:
+        attempts = cls.__attempts()
+        delay = next(attempts)
+        while True:
+            cancellation.raise_if_cancelled()
+            if delay > 0:
+                cancellation.sleep(delay)
+            try:
+                outcome = cls.get_session().request(method, full_url, json=payload, headers=cls.get_auth_headers(),
+                                                    timeout=(cls.CONNECT_TIMEOUT, cls.READ_TIMEOUT), stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                outcome = e
+            try:
+                delay = attempts.send(outcome)
+            except StopIteration as done:
+                return done.value
+
+    @classmethod
+    async def __async_request_with_retries(cls, method: str, full_url: str, payload: Optional[dict] = None) -> requests.Response:
+        """
+        the same retries as __request_with_retries, waiting with asyncio.sleep instead of blocking the loop
+        """
+        headers = cls.get_auth_headers()
+        body = None
+        if payload is not None:
+            headers, body = {**headers, "Content-Type": "application/json"}, json.dumps(payload).encode()
+        attempts = cls.__attempts()
+        delay = next(attempts)
+        while True:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                outcome = await cls.get_async_client().request(method, full_url, headers, body)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                outcome = e
+            try:
+                delay = attempts.send(outcome)
+            except StopIteration as done:
+                return done.value
+
+    @classmethod
+    def __attempts(cls) -> Generator[float, Union[requests.Response, Exception], requests.Response]:
+        """
+        the retries of both backends, without their I/O: yields the seconds to wait before sending the request (for the rate
+        limit or a backoff), is sent what sending it gave (the response or the connection error) and returns the response
+        once it needs no retry or none is left
+        """
+        rate_limiter = cls.get_rate_limiter()
+        delay = 0.0
+        for attempt in range(cls.MAX_RETRIES + 1):
+            rate_limit_wait = rate_limiter.reserve(cls.MAX_RATE_LIMIT_WAIT) if rate_limiter else 0.0
+            if rate_limit_wait is None:
+                raise RateLimitError(f"Rate limit of {cls.BASE_URL} exhausted, try again later")
+            outcome = yield max(delay, rate_limit_wait) # the token is taken now, so it is available once the backoff is over
+            if isinstance(outcome, Exception):
+                if attempt == cls.MAX_RETRIES:
+                    raise outcome
+                delay = cls.__backoff_delay(attempt)
+                logging.warning(f"{outcome} while requesting {cls.BASE_URL}, retrying in {delay:.1f} seconds")
+                continue
+            res = outcome
+            if res.status_code not in cls.RETRY_STATUS_CODES and not APITemplate.__is_rate_limited(res):
+                return res
+            delay = APITemplate.__server_requested_delay(res)
+            if delay is not None:
+                if delay > cls.MAX_RATE_LIMIT_WAIT:
+                    raise RateLimitError(f"Rate limit of {cls.BASE_URL} exhausted for the next {delay:.0f} seconds")
+                if rate_limiter:
+                    rate_limiter.pause(delay)
+            else:
+                delay = cls.__backoff_delay(attempt)
+            if attempt == cls.MAX_RETRIES:
+                return res
+            logging.warning(f"Error code {res.status_code} from {cls.BASE_URL}, retrying in {delay:.1f} seconds")
+            res.close() # releases the connection of a streamed response back to the pool
+
+    @classmethod
+    def __backoff_delay(cls, attempt: int) -> float:
+        return random.uniform(0, cls.BACKOFF_BASE * 2 ** attempt) # full jitter, so concurrent retries spread out
+
+    @staticmethod
+    def __is_rate_limited(res: requests.Response) -> bool:
+        return res.status_code == 403 and ("Retry-After" in res.headers or res.headers.get("X-RateLimit-Remaining") == "0")
+
+    @staticmethod
+    def __server_requested_delay(res: requests.Response) -> Optional[float]:
+        retry_after = res.headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+            try:
+                retry_at = parsedate_to_datetime(retry_after) # an HTTP date
+            except (TypeError, ValueError, IndexError): # malformed, the request is retried after the usual backoff
+                return None
+            if retry_at.tzinfo is None: # HTTP dates are in GMT
+                retry_at = retry_at.replace(tzinfo=timezone.utc)
+            return max(0.0, retry_at.timestamp() - time.time())
+        if res.headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in res.headers:
+            return max(0.0, float(res.headers["X-RateLimit-Reset"]) - time.time())
+        return None
+
+    @classmethod
+    def get_api_key(cls) -> Optional[str]:
+        return os.environ.get(cls.API_KEY_ENV) if cls.API_KEY_ENV else None
+
+    @classmethod
+    def get_auth_headers(cls) -> Dict[str, str]:
+        return {}
+
+    @classmethod
+    def get_rate_limiter(cls) -> Optional[TokenBucket]:
+        rate_limit = cls.AUTHENTICATED_RATE_LIMIT if cls.get_api_key() and cls.AUTHENTICATED_RATE_LIMIT else cls.RATE_LIMIT
+        if rate_limit is None:
+            return None
+        host = urlsplit(cls.BASE_URL).netloc
+        with APITemplate._sessions_lock:
+            rate_limiter = APITemplate._rate_limiters.get(host)
+            if rate_limiter is None:
+                rate_limiter = TokenBucket(*rate_limit)
+                APITemplate._rate_limiters[host] = rate_limiter
+            return rate_limiter
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        host = urlsplit(cls.BASE_URL).netloc
+        with APITemplate._sessions_lock:
+            session = APITemplate._sessions.get(host)
+            if session is None:
+                session = APITemplate.__create_session(cls.POOL_SIZE)
+                APITemplate._sessions[host] = session
+            return session
+
+    @classmethod
+    def get_async_client(cls) -> AsyncHTTPClient:
+        """
+        the client of BASE_URL's host, whose connections belong to the loop that opened them, so every running loop has its own
+        """
+        loop = asyncio.get_running_loop()
+        host = urlsplit(cls.BASE_URL).netloc
+        with APITemplate._sessions_lock:
+            clients = APITemplate._async_clients.setdefault(loop, {})
+            client = clients.get(host)
+            if client is None:
+                client = clients[host] = AsyncHTTPClient(cls.ASYNC_POOL_SIZE, cls.CONNECT_TIMEOUT, cls.READ_TIMEOUT, cls.MAX_REDIRECTS)
+            return client
+
+    @classmethod
+    async def close_async_sessions(cls) -> None:
+        with APITemplate._sessions_lock:
+            clients = APITemplate._async_clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.close()
+
+    @classmethod
+    def http_backend(cls) -> str:
+        """
+        raises RuntimeError when asyncio is chosen and aiohttp is not installed, instead of failing on the first request
+        """
+        backend = cls.HTTP_BACKEND or os.environ.get(cls.HTTP_BACKEND_ENV) or "threads"
+        if backend == "asyncio":
+            require_aiohttp()
+        return backend
+
+    @classmethod
+    def close_sessions(cls) -> None:
+        with APITemplate._sessions_lock:
+            for session in APITemplate._sessions.values():
+                session.close()
+            APITemplate._sessions.clear()
+
+    @classmethod
+    def get_cache(cls) -> ResponseCache:
+        with APITemplate._sessions_lock:
+            if APITemplate._cache is None:
+                APITemplate._cache = ResponseCache(cls.CACHE_PATH, cls.CACHE_MAX_BYTES, cls.CACHE_MAX_AGE)
+            return APITemplate._cache
+
+    @staticmethod
+    def __cached_response(url: str, body: bytes) -> requests.Response:
+        res = requests.Response()
+        res.status_code = 200
+        res.url = url
+        res.encoding = "utf-8"
+        res._content = body
+        return res
+
+    @staticmethod
+    def __create_session(pool_size: int) -> requests.Session:
+        session = requests.Session()
+        # pool_block keeps the number of open sockets per host bounded when many threads share the session
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers["Connection"] = "keep-alive"
+        return session
+
+    @staticmethod
     def handle_response_errors(res: requests.Response) -> None:
         if 400 <= res.status_code < 600:
             if res.status_code == 404:
                 raise Exception("Error code 404 - not found")
+            if res.status_code == 429 or APITemplate.__is_rate_limited(res):
+                raise RateLimitError(f"Error code {res.status_code} - rate limit exceeded")
             raise Exception(f"Error code {res.status_code}: {res.text}")
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import concurrent.futures
+from typing import AsyncIterator, Awaitable, Dict, Iterator, Optional, TypeVar
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import default_user_agent, get_encoding_from_headers, requote_uri
+
+from apis import cancellation
+
+try: # optional, only the asyncio backend needs it, see requirements-asyncio.txt
+    import aiohttp
+    import yarl
+except ImportError:
+    aiohttp = yarl = None
+
+T = TypeVar("T")
+CANCEL_CHECK_SECONDS = 0.1
+
+
+def require_aiohttp() -> None:
+    if aiohttp is None:
+        raise RuntimeError("HTTP_BACKEND=asyncio needs aiohttp, install it with pip install -r requirements-asyncio.txt")
+
+
+class AsyncHTTPClient:
+    """
+    the aiohttp session of a single host for the tasks of one event loop, at most size connections are open at once and
+    the tasks beyond that wait for a free one. like requests it follows redirects (without the Authorization header to
+    another host), goes through the proxy of HTTP_PROXY / HTTPS_PROXY and its read timeout bounds every read. the responses
+    are returned as requests.Response objects with their body read, so the code handling them is the same for both backends
+    """
+    def __init__(self, size: int, connect_timeout: float, read_timeout: float, max_redirects: int):
+        require_aiohttp()
+        self._max_redirects = max_redirects
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0, limit_per_host=size),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout), # waiting for a free connection is not a timeout
+            headers={"User-Agent": default_user_agent()}, trust_env=True)
+
+    async def request(self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes]) -> requests.Response:
+        try: # quoted the way requests quotes it, and not again by yarl
+            async with self._session.request(method, yarl.URL(requote_uri(url), encoded=True), headers=headers, data=body,
+                                             max_redirects=self._max_redirects) as res:
+                content = await res.read()
+        except aiohttp.ConnectionTimeoutError as e:
+            raise requests.ConnectTimeout(f"{e!r} while requesting {url}")
+        except aiohttp.ServerTimeoutError as e:
+            raise requests.ReadTimeout(f"{e!r} while requesting {url}")
+        except (aiohttp.ClientHttpProxyError, aiohttp.ClientProxyConnectionError) as e:
+            raise requests.exceptions.ProxyError(f"{e} while requesting {url}")
+        except aiohttp.TooManyRedirects as e:
+            raise requests.TooManyRedirects(f"{e!r} while requesting {url}")
+        except aiohttp.ClientError as e: # e.g. refused or reset connections
+            raise requests.ConnectionError(f"{e!r} while requesting {url}")
+        return AsyncHTTPClient.__requests_response(res, content)
+
+    async def close(self) -> None:
+        await self._session.close()
+
+    @staticmethod
+    def __requests_response(res: "aiohttp.ClientResponse", content: bytes, history: bool = True) -> requests.Response:
+        converted = requests.Response()
+        converted.status_code = res.status
+        converted.headers = CaseInsensitiveDict(res.headers)
+        converted.url = str(res.url)
+        converted.encoding = get_encoding_from_headers(converted.headers)
+        converted.reason = res.reason
+        converted._content = content # already un-gzipped
+        converted._content_consumed = True # there is no raw stream behind it to close
+        if history: # the redirects' bodies are released unread
+            converted.history = [AsyncHTTPClient.__requests_response(redirect, b"", history=False) for redirect in res.history]
+        return converted
+
+
+class BackgroundEventLoop:
+    """
+    an event loop on a daemon thread, the sync facade of the asyncio client: threads (e.g. the Tk pages' workers)
+    run coroutines and iterate async iterators on it, and all of them share its connection pools
+    """
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="asyncio-client", daemon=True).start()
+            return self._loop
+
+    def run(self, awaitable: Awaitable[T]) -> T:
+        """
+        the awaitable is cancelled, and TaskCancelledError raised, when the work of the calling thread is cancelled
+        """
+        future = asyncio.run_coroutine_threadsafe(BackgroundEventLoop.__await(awaitable), self.loop)
+        cancel_event = cancellation.current_cancel_event()
+        if cancel_event is None:
+            return future.result()
+        while True:
+            try:
+                return future.result(CANCEL_CHECK_SECONDS)
+            except concurrent.futures.TimeoutError:
+                if cancel_event.is_set():
+                    future.cancel()
+                    raise cancellation.TaskCancelledError()
+
+    def iterate(self, async_iterator: AsyncIterator[T]) -> Iterator[T]:
+        """
+        yields the items of the async iterator as they come, closing it (which cancels its pending work) when the caller stops early
+        """
+        try:
+            while True:
+                try:
+                    item = self.run(async_iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            if hasattr(async_iterator, "aclose"):
+                with cancellation.cancellable(None): # closed even when the calling thread's work was cancelled
+                    self.run(BackgroundEventLoop.__aclose(async_iterator))
+
+    @staticmethod
+    async def __aclose(async_iterator: AsyncIterator[T]) -> None:
+        while getattr(async_iterator, "ag_running", False): # a cancelled __anext__ may still be unwinding on the loop
+            await asyncio.sleep(0)
+        await async_iterator.aclose()
+
+    @staticmethod
+    async def __await(awaitable: Awaitable[T]) -> T: # run_coroutine_threadsafe only takes coroutines, not e.g. __anext__'s awaitable
+        return await awaitable
+
+
+BACKGROUND_LOOP = BackgroundEventLoop()
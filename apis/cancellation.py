@@ -0,0 +1,61 @@
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+_scope = threading.local()
+
+
+class TaskCancelledError(Exception):
+    pass
+
+
+def current_cancel_event() -> Optional[threading.Event]:
+    """
+    the event set when the work the calling thread runs for is cancelled, None outside of cancellable work (e.g. scan.py)
+    """
+    return getattr(_scope, "cancel_event", None)
+
+
+@contextmanager
+def cancellable(cancel_event: Optional[threading.Event]):
+    previous_event = current_cancel_event()
+    _scope.cancel_event = cancel_event
+    try:
+        yield
+    finally:
+        _scope.cancel_event = previous_event
+
+
+def raise_if_cancelled() -> None:
+    cancel_event = current_cancel_event()
+    if cancel_event is not None and cancel_event.is_set():
+        raise TaskCancelledError()
+
+
+def sleep(seconds: float) -> None:
+    """
+    time.sleep that wakes up and raises TaskCancelledError as soon as the calling thread's work is cancelled,
+    so a closed window is not kept alive by a rate limit or backoff wait
+    """
+    cancel_event = current_cancel_event()
+    if cancel_event is None:
+        time.sleep(seconds)
+    elif cancel_event.wait(seconds):
+        raise TaskCancelledError()
+
+
+def propagated(function: Callable[..., T]) -> Callable[..., T]:
+    """
+    binds function to the calling thread's cancellation, for the work it hands to the threads of an executor
+    """
+    cancel_event = current_cancel_event()
+
+    @wraps(function)
+    def run_cancellable(*args, **kwargs) -> T:
+        with cancellable(cancel_event):
+            return function(*args, **kwargs)
+    return run_cancellable
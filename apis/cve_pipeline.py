@@ -0,0 +1,71 @@
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, List, Optional, Type
+
+from apis.nvd_api import NVD_API
+from classes.cve import CVE
+from instrumentation import METRICS
+
+
+class CVEPagePipeline:
+    """
+    fetches the CVE pages of a CPE on threads, decodes and extracts them in a pool of processes and builds the CVEs
+    from the extracted records back in the caller, so decoding large result sets is not bound to a single core.
+    at most max_pending_pages pages are fetched and not yet built, so a slow stage holds back the ones before it,
+    and may be shared by several threads, e.g. the workers of a BulkScanner
+    """
+    def __init__(self, processes: Optional[int] = None, max_pending_pages: Optional[int] = None, nvd_api: Type[NVD_API] = NVD_API):
+        self.processes = processes or os.cpu_count() or 1
+        self.max_pending_pages = max_pending_pages or 2 * self.processes
+        self.nvd_api = nvd_api
+        self._pending_pages = threading.BoundedSemaphore(self.max_pending_pages)
+        # spawned rather than forked, forking while other threads hold locks (e.g. the HTTP sessions') may deadlock the children
+        self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def get_vulnerabilities(self, cpe_name: str, min_severity: float = 0, has_kev: bool = False) -> List[CVE]:
+        """
+        the CVEs of NVD_API.get_vulnerabilities_by_cpe_and_severity, in the same order
+        """
+        if self.nvd_api.get_mirror() is not None and not has_kev: # the mirror is read locally, in a single pass
+            return self.nvd_api.get_vulnerabilities_by_cpe_and_severity(cpe_name, min_severity, has_kev)
+        CVEs: List[CVE] = []
+        yielded_cve_ids = set() # the pages may belong to several queries, whose results overlap
+        pages: Deque[Future] = deque()
+        try:
+            for page_body in self.nvd_api.iter_raw_CVE_pages(cpe_name, min_severity, has_kev):
+                while not self._pending_pages.acquire(blocking=False):
+                    if pages: # builds its own oldest page rather than waiting for it, so the pages of other callers can not starve it
+                        CVEs += self.__build(pages.popleft(), min_severity, yielded_cve_ids)
+                    else:
+                        self._pending_pages.acquire()
+                        break
+                pages.append(self._executor.submit(NVD_API.parse_CVE_records, page_body))
+            while pages:
+                CVEs += self.__build(pages.popleft(), min_severity, yielded_cve_ids)
+        finally:
+            for page in pages: # left by a failed fetch or build
+                page.cancel()
+                self._pending_pages.release()
+        return CVEs
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "CVEPagePipeline":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __build(self, page: Future, min_severity: float, yielded_cve_ids: set) -> List[CVE]:
+        try:
+            with METRICS.span("nvd_extraction", collection="cves"):
+                records = page.result()
+                CVEs = self.nvd_api.build_CVEs(records, min_severity, yielded_cve_ids)
+        finally:
+            self._pending_pages.release()
+        METRICS.count("nvd_items_extracted", len(records), collection="cves")
+        return CVEs
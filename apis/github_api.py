@@ -1,18 +1,296 @@
+import json
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from apis.api_template import APITemplate
+from apis.async_http import BACKGROUND_LOOP
+from apis.cancellation import propagated
+from apis.session_cache import SessionCache
 from classes.repository import Repository
 
 
 class GITHUB_API(APITemplate):
     BASE_URL = "https://api.github.com"
+    MAX_WORKERS = 8
+    CACHE_TTL = 60 * 60 # star and fork counts may be an hour old
+    RATE_LIMIT = (60, 60 * 60)
+    AUTHENTICATED_RATE_LIMIT = (5000, 60 * 60)
+    API_KEY_ENV = "GITHUB_TOKEN"
+    GRAPHQL_BATCH_SIZE = 100 # repos resolved by a single GraphQL query, the most GitHub allows per connection is 100 nodes
+    REPOSITORIES = SessionCache("github_repositories", 10000) # the repos fetched in this session, by repo_key
+
+    @classmethod
+    def get_auth_headers(cls) -> Dict[str, str]:
+        token = cls.get_api_key()
+        return {"Authorization": f"Bearer {token}"} if token else {}
     
+    @staticmethod
+    def repo_key(repo_url: str) -> str:
+        """
+        "repos/owner/name" lowered, since GitHub's owners and names are case insensitive, without a trailing ".git" or path
+        """
+        url_components = repo_url.strip('/').split('/')
+        if len(url_components) < 3:
+            return repo_url.lower()
+        owner, name = url_components[1:3]
+        return f"repos/{owner}/{name[:-4] if name.lower().endswith('.git') else name}".lower()
+
     @classmethod
     def get_repository_details(cls, repo_url: str) -> Repository:
+        """
+        a repo this session already fetched is served from REPOSITORIES, and one being fetched by another thread is waited for
+        """
+        repository = cls.REPOSITORIES.get_or_fetch(cls.repo_key(repo_url), lambda: cls.__fetch_repository_details(repo_url))
+        if repository is None: # the thread which fetched it could not
+            raise Exception(f"The repo {repo_url} could not be fetched")
+        return repository
+
+    @classmethod
+    def get_repositories_details(cls, repo_urls: Iterable[str]) -> Dict[str, Repository]:
+        """
+        repos that could not be fetched (deleted, rate limited) are left out instead of failing the whole batch
+        """
+        return dict(cls.iter_repositories_details(repo_urls))
+
+    @classmethod
+    def iter_repositories_details(cls, repo_urls: Iterable[str]) -> Iterator[Tuple[str, Repository]]:
+        """
+        yields (repo_url, repository) as soon as each repo is fetched, in completion order, skipping the repos that failed.
+        the repos this session already fetched come first, then the ones this call claimed and fetched,
+        and last the ones other threads were fetching meanwhile, which are waited for instead of being requested again
+        """
+        repo_urls_by_key = cls.__repo_urls_by_key(repo_urls)
+        if not repo_urls_by_key:
+            return
+        cached, in_flight, claimed = cls.REPOSITORIES.claim(repo_urls_by_key)
+        unresolved_keys = set(claimed)
+        try:
+            for key, repository in cached.items():
+                for repo_url in repo_urls_by_key[key]:
+                    yield repo_url, repository
+            for fetched_repo_url, repository in cls.__iter_fetched_repositories([repo_urls_by_key[key][0] for key in claimed]):
+                key = cls.repo_key(fetched_repo_url)
+                unresolved_keys.discard(key)
+                cls.REPOSITORIES.resolve(key, repository)
+                for repo_url in repo_urls_by_key[key]:
+                    yield repo_url, repository
+        finally: # the repos that failed, or were left behind by a caller that stopped early, are released for their waiters
+            for key in unresolved_keys:
+                cls.REPOSITORIES.resolve(key, None)
+        keys_by_future = {future: key for key, future in in_flight.items()}
+        for future in as_completed(keys_by_future):
+            try:
+                repository = future.result()
+            except Exception as e:
+                logging.warning(f"Skipping the repo {keys_by_future[future]}: {e}")
+                continue
+            if repository is not None:
+                for repo_url in repo_urls_by_key[keys_by_future[future]]:
+                    yield repo_url, repository
+
+    @classmethod
+    async def async_get_repository_details(cls, repo_url: str) -> Repository:
+        key = cls.repo_key(repo_url)
+        cached, in_flight, claimed = cls.REPOSITORIES.claim((key,))
+        if key in cached:
+            repository = cached[key]
+        elif key in in_flight: # being fetched by a thread or another task
+            repository = await asyncio.wrap_future(in_flight[key])
+        else:
+            try:
+                repository = await cls.__async_fetch_repository_details(repo_url)
+            except BaseException as e:
+                cls.REPOSITORIES.fail(key, e)
+                raise
+            cls.REPOSITORIES.resolve(key, repository)
+        if repository is None:
+            raise Exception(f"The repo {repo_url} could not be fetched")
+        return repository
+
+    @classmethod
+    async def async_get_repositories_details(cls, repo_urls: Iterable[str]) -> Dict[str, Repository]:
+        return {repo_url: repository async for repo_url, repository in cls.async_iter_repositories_details(repo_urls)}
+
+    @classmethod
+    async def async_iter_repositories_details(cls, repo_urls: Iterable[str]) -> AsyncIterator[Tuple[str, Repository]]:
+        """
+        iter_repositories_details for the tasks of an event loop, every claimed repo is requested by a task of its own
+        (only the host's connection pool and rate limiter bound them) and the repos are yielded in completion order
+        """
+        repo_urls_by_key = cls.__repo_urls_by_key(repo_urls)
+        if not repo_urls_by_key:
+            return
+        cached, in_flight, claimed = cls.REPOSITORIES.claim(repo_urls_by_key)
+        unresolved_keys = set(claimed)
+        try:
+            for key, repository in cached.items():
+                for repo_url in repo_urls_by_key[key]:
+                    yield repo_url, repository
+            async for fetched_repo_url, repository in cls.__async_iter_fetched_repositories([repo_urls_by_key[key][0] for key in claimed]):
+                key = cls.repo_key(fetched_repo_url)
+                unresolved_keys.discard(key)
+                cls.REPOSITORIES.resolve(key, repository)
+                for repo_url in repo_urls_by_key[key]:
+                    yield repo_url, repository
+        finally:
+            for key in unresolved_keys:
+                cls.REPOSITORIES.resolve(key, None)
+        for in_flight_repository in asyncio.as_completed([cls.__async_wait_in_flight(key, future) for key, future in in_flight.items()]):
+            key, repository = await in_flight_repository
+            if repository is not None:
+                for repo_url in repo_urls_by_key[key]:
+                    yield repo_url, repository
+
+    @classmethod
+    def __iter_fetched_repositories(cls, unique_repo_urls: List[str]) -> Iterator[Tuple[str, Repository]]:
+        """
+        with a token the repos are resolved GRAPHQL_BATCH_SIZE at a time by GraphQL queries, GitHub's GraphQL API requires one
+        """
+        if not unique_repo_urls:
+            return
+        if cls.get_api_key():
+            cached_repositories = cls.__get_cached_repositories(unique_repo_urls)
+            yield from cached_repositories.items()
+            unique_repo_urls = [url for url in unique_repo_urls if url not in cached_repositories]
+            if not unique_repo_urls:
+                return
+            batches = [unique_repo_urls[i:i + cls.GRAPHQL_BATCH_SIZE] for i in range(0, len(unique_repo_urls), cls.GRAPHQL_BATCH_SIZE)]
+            fetch, jobs = cls.__try_get_repositories_batch, batches
+        elif cls.http_backend() == "asyncio":
+            yield from BACKGROUND_LOOP.iterate(cls.__async_iter_fetched_repositories(unique_repo_urls))
+            return
+        else:
+            fetch, jobs = cls.__try_get_repository_details, unique_repo_urls
+        logging.info(f"Requesting github for the details of {len(unique_repo_urls)} repos")
+        executor = ThreadPoolExecutor(max_workers=min(cls.MAX_WORKERS, len(jobs)))
+        try:
+            fetch = propagated(fetch)
+            futures = {executor.submit(fetch, job): job for job in jobs}
+            for future in as_completed(futures):
+                result = future.result()
+                if isinstance(result, dict): # a batch
+                    yield from result.items()
+                elif result is not None:
+                    yield futures[future], result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True) # a caller that stops early (e.g. a cancelled search) drops the queued repos
+
+    @classmethod
+    def get_repositories_batch(cls, repo_urls: List[str]) -> Dict[str, Repository]:
+        """
+        resolves the repos by a single GraphQL query of aliased repository(owner:, name:) fields,
+        the repos GitHub could not resolve (deleted, renamed to private) are left out
+        """
+        logging.info(f"Requesting github GraphQL for the details of {len(repo_urls)} repos")
+        repo_urls = [repo_url for repo_url in repo_urls if len(list(filter(None, repo_url.split('/')[1:3]))) == 2] # e.g. not a link to a user
+        if not repo_urls:
+            return {}
+        variables, fields = {}, []
+        for i, repo_url in enumerate(repo_urls):
+            variables[f"owner{i}"], variables[f"name{i}"] = repo_url.split('/')[1:3]
+            fields.append(f"r{i}: repository(owner: $owner{i}, name: $name{i}) {{ stargazerCount forkCount }}")
+        declarations = ", ".join(f"$owner{i}: String!, $name{i}: String!" for i in range(len(repo_urls)))
+        response = super().post("graphql", {"query": f"query({declarations}) {{ {' '.join(fields)} }}", "variables": variables}).json()
+        data = response.get("data") or {}
+        if not data and response.get("errors"):
+            raise Exception(f"GraphQL error: {response['errors'][0].get('message')}")
+        repositories = {}
+        for i, repo_url in enumerate(repo_urls):
+            repo_details = data.get(f"r{i}")
+            if repo_details is None:
+                continue
+            repositories[repo_url] = Repository.model_validate({
+                "name": repo_url.split('/')[-1],
+                "stars_count": repo_details["stargazerCount"],
+                "forks_count": repo_details["forkCount"]
+            })
+            if cls.CACHE_TTL > 0: # kept in the REST response's shape, so either way of fetching the repo is served from it
+                cls.get_cache().set(f'{cls.BASE_URL}/{repo_url}', json.dumps({"stargazers_count": repo_details["stargazerCount"],
+                                                                              "forks": repo_details["forkCount"]}).encode())
+        return repositories
+
+    @classmethod
+    async def __async_iter_fetched_repositories(cls, unique_repo_urls: List[str]) -> AsyncIterator[Tuple[str, Repository]]:
+        if not unique_repo_urls:
+            return
+        logging.info(f"Requesting github for the details of {len(unique_repo_urls)} repos")
+        fetches = [asyncio.ensure_future(cls.__async_try_get_repository_details(repo_url)) for repo_url in unique_repo_urls]
+        try:
+            for fetch in asyncio.as_completed(fetches):
+                repo_url, repository = await fetch
+                if repository is not None:
+                    yield repo_url, repository
+        finally: # a caller that stops early cancels the repos still being fetched
+            for fetch in fetches:
+                fetch.cancel()
+
+    @classmethod
+    def __fetch_repository_details(cls, repo_url: str) -> Repository:
         logging.info(f"Requesting github for repo details: {repo_url}")
-        repo_details = super().get(repo_url).json()
-        return Repository(
-            name=repo_url.split('/')[-1],
-            stars_count=repo_details["stargazers_count"],
-            forks_count=repo_details["forks"]
-        )
+        return GITHUB_API.__repository(repo_url, super().get(repo_url).json())
+
+    @classmethod
+    async def __async_fetch_repository_details(cls, repo_url: str) -> Repository:
+        logging.info(f"Requesting github for repo details: {repo_url}")
+        return GITHUB_API.__repository(repo_url, (await super().async_get(repo_url)).json())
+
+    @classmethod
+    async def __async_try_get_repository_details(cls, repo_url: str) -> Tuple[str, Optional[Repository]]:
+        try:
+            return repo_url, await cls.__async_fetch_repository_details(repo_url)
+        except Exception as e:
+            logging.warning(f"Skipping the repo {repo_url}: {e}")
+            return repo_url, None
+
+    @staticmethod
+    async def __async_wait_in_flight(key: str, future) -> Tuple[str, Optional[Repository]]:
+        try:
+            return key, await asyncio.wrap_future(future)
+        except Exception as e:
+            logging.warning(f"Skipping the repo {key}: {e}")
+            return key, None
+
+    @staticmethod
+    def __repository(repo_url: str, repo_details: dict) -> Repository:
+        return Repository.model_validate({ # the response is validated, since this is where outside data enters
+            "name": repo_url.split('/')[-1],
+            "stars_count": repo_details["stargazers_count"],
+            "forks_count": repo_details["forks"]
+        })
+
+    @classmethod
+    def __repo_urls_by_key(cls, repo_urls: Iterable[str]) -> Dict[str, List[str]]:
+        repo_urls_by_key: Dict[str, List[str]] = {}
+        for repo_url in dict.fromkeys(repo_urls): # de-duplicates while keeping the order
+            repo_urls_by_key.setdefault(cls.repo_key(repo_url), []).append(repo_url)
+        return repo_urls_by_key
+
+    @classmethod
+    def __try_get_repository_details(cls, repo_url: str) -> Optional[Repository]:
+        try:
+            return cls.__fetch_repository_details(repo_url)
+        except Exception as e:
+            logging.warning(f"Skipping the repo {repo_url}: {e}")
+            return None
+
+    @classmethod
+    def __try_get_repositories_batch(cls, repo_urls: List[str]) -> Dict[str, Repository]:
+        try:
+            return cls.get_repositories_batch(repo_urls)
+        except Exception as e:
+            logging.warning(f"Skipping a batch of {len(repo_urls)} repos: {e}")
+            return {}
+
+    @classmethod
+    def __get_cached_repositories(cls, repo_urls: List[str]) -> Dict[str, Repository]:
+        if cls.CACHE_TTL <= 0:
+            return {}
+        repositories = {}
+        for repo_url in repo_urls:
+            cached_body = cls.get_cache().get(f'{cls.BASE_URL}/{repo_url}', cls.CACHE_TTL)
+            if cached_body is not None:
+                repo_details = json.loads(cached_body)
+                repositories[repo_url] = Repository(repo_url.split('/')[-1], repo_details["stargazers_count"], repo_details["forks"])
+        return repositories
@@ -0,0 +1,106 @@
+import re
+import json
+import codecs
+from typing import Any, Dict, Iterable, Iterator, Tuple, Union
+
+WHITESPACE = re.compile(r'\s*')
+NUMBER_TAIL = re.compile(r'[0-9.eE+-]*') # what may still follow a number cut by the end of the buffer, e.g. "1." or "1e"
+MIN_READ_AHEAD = 64 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class JSONObjectStream:
+    """
+    parses a JSON object arriving in byte chunks and yields the items of one of its array members one at a time,
+    so only a single item is in memory at once instead of the whole document,
+    the other top level members (e.g. totalResults) are collected into header as they are passed
+    """
+    def __init__(self, chunks: Iterable[bytes], items_key: Union[str, Tuple[str, ...]]):
+        self.items_keys = (items_key,) if isinstance(items_key, str) else items_key
+        self.header: Dict[str, Any] = {}
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._position = 0
+        self._exhausted = False
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        raises json.JSONDecodeError (or UnicodeDecodeError) as soon as the document turns out truncated or malformed,
+        after the items fully parsed before that point
+        """
+        self.__expect("{")
+        if not self.__next_is("}"):
+            while True:
+                if not self.__next_is('"'): # e.g. the "}" of a trailing comma
+                    raise json.JSONDecodeError("Expecting property name enclosed in double quotes", self._buffer, self._position)
+                key = self.__decode_value()
+                self.__expect(":")
+                if key in self.items_keys:
+                    yield from self.__iter_array()
+                else:
+                    self.header[key] = self.__decode_value()
+                if self.__next_is("}"):
+                    break
+                self.__expect(",")
+        self._position += 1
+        if not self.__next_is(""):
+            raise json.JSONDecodeError("Extra data", self._buffer, self._position)
+
+    def __iter_array(self) -> Iterator[Any]:
+        self.__expect("[")
+        if not self.__next_is("]"):
+            while True:
+                yield self.__decode_value() # raises on the "]" of a trailing comma
+                if self.__next_is("]"):
+                    break
+                self.__expect(",")
+        self._position += 1
+
+    def __decode_value(self) -> Any:
+        self.__skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+                # a number running to the end of the buffer may still continue, e.g. "1." is cut from "1.5"
+                if self._exhausted or type(value) not in (int, float) or NUMBER_TAIL.match(self._buffer, end).end() < len(self._buffer):
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._exhausted:
+                    raise
+            # the value is cut by the end of the buffer, reading at least as much again keeps the retries linear
+            self.__read(max(MIN_READ_AHEAD, len(self._buffer) - self._position))
+
+    def __next_is(self, character: str) -> bool:
+        self.__skip_whitespace()
+        return self._buffer[self._position:self._position + 1] == character
+
+    def __expect(self, character: str) -> None:
+        if not self.__next_is(character):
+            raise json.JSONDecodeError(f"Expecting '{character}'", self._buffer, self._position)
+        self._position += 1
+
+    def __skip_whitespace(self) -> None:
+        while True:
+            self._position = WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer) or self._exhausted:
+                return
+            self.__read(MIN_READ_AHEAD)
+
+    def __read(self, at_least: int) -> None:
+        self._buffer = self._buffer[self._position:] # drops what was already parsed
+        self._position = 0
+        read_text = []
+        read_length = 0
+        while read_length < at_least:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                read_text.append(self._text_decoder.decode(b"", final=True))
+                self._exhausted = True
+                break
+            text = self._text_decoder.decode(chunk)
+            read_text.append(text)
+            read_length += len(text)
+        self._buffer += "".join(read_text)
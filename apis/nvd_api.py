@@ -1,65 +1,435 @@
+import os
+import re
+import json
+import asyncio
 import logging
-from typing import List
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from itertools import starmap
+from typing import AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from classes.cve import CVE
 from apis.api_template import APITemplate
+from apis.cancellation import propagated
+from apis.async_http import BACKGROUND_LOOP
+from apis.json_stream import JSONObjectStream
+from apis.session_cache import SessionCache
+from instrumentation import METRICS
+
+FIRST_SENTENCE_END = re.compile(r'(?<=\D)\.(?= )') # a dot after a non digit (not a version like 2.4.49) and before a space
+MAX_DESCRIPTION_LENGTH = 551 # kept of a description without a sentence end
+# the owner and repo of a link into a repo, "raw" links to a repo's files included and gists (which are not repos) left out
+GITHUB_REPO_URL = re.compile(r'^https?://(?:www\.)?(?:github\.com|raw\.githubusercontent\.com)/([\w.-]+)/([\w.-]+?)(?:\.git)?(?:[/?#]|$)', re.IGNORECASE)
+GITHUB_RESERVED_OWNERS = frozenset(("advisories", "orgs", "users", "topics", "marketplace", "sponsors", "features", "security"))
+CVSS_METRICS_VERSIONS = ("cvssMetricV31", "cvssMetricV30", "cvssMetricV2") # the older versions are used when the newer are missing
+PAGE_HEADER_FIELD = re.compile(rb'"(resultsPerPage|totalResults)"\s*:\s*(\d+)')
+PAGE_HEADER_SIZE = 1024 # NVD writes a page's counts before its items
+CVERecord = Tuple[str, float, str, Tuple[str, ...]] # the arguments of CVE, see NVD_API.parse_CVE_records
 
 
 class NVD_API(APITemplate):
     BASE_URL = "https://services.nvd.nist.gov/rest/json"
+    CPES_PER_PAGE = 10000 # the maximal page sizes NVD allows
+    CVES_PER_PAGE = 2000
+    STREAM_CHUNK_SIZE = 64 * 1024
+    MAX_PARALLEL_PAGES = 4 # the rate limiter below keeps the parallel pages within NVD's quota
+    RATE_LIMIT = (5, 30)
+    AUTHENTICATED_RATE_LIMIT = (50, 30)
+    API_KEY_ENV = "NVD_API_KEY"
+    RETRY_STATUS_CODES = (403, 429, 500, 502, 503, 504) # NVD answers 403 when the rate limit is exceeded
+    CPES_CACHE_TTL = 24 * 60 * 60 # the CPE dictionary rarely changes
+    CVES_CACHE_TTL = 5 * 60 # CVE lists should stay fresh
+    MAX_LAST_MODIFIED_RANGE = timedelta(days=120) # the longest lastModStartDate-lastModEndDate range NVD accepts
+    MAX_PUBLISHED_RANGE = timedelta(days=120) # the same goes for pubStartDate-pubEndDate
+    # the severity bands NVD filters by and the highest score of each, see __severity_filters
+    CVSS_V3_SEVERITIES: Tuple[Tuple[str, float], ...] = (("LOW", 3.9), ("MEDIUM", 6.9), ("HIGH", 8.9), ("CRITICAL", 10.0))
+    CVSS_V2_SEVERITIES: Tuple[Tuple[str, float], ...] = (("LOW", 3.9), ("MEDIUM", 6.9), ("HIGH", 10.0))
+    SERVER_FILTER_MIN_SEVERITY = 7.0 # lower thresholds are only applied locally
+    MIRROR_PATH_ENV = "NVD_MIRROR_PATH" # when set, CPE and CVE queries are answered from the local mirror at that path
+    MIRROR = None
+    CVES = SessionCache("nvd_cves", 50000) # the CVEs returned in this session, by cve_id
+
+    @classmethod
+    def get_auth_headers(cls) -> Dict[str, str]:
+        api_key = cls.get_api_key()
+        return {"apiKey": api_key} if api_key else {}
 
     @classmethod
     def get_CPEs_by_keyword(cls, keyword: str) -> List[str]:
+        return [cpe for cpes_page in cls.iter_CPEs_by_keyword(keyword) for cpe in cpes_page]
+
+    @classmethod
+    def iter_CPEs_by_keyword(cls, keyword: str) -> Iterator[List[str]]:
+        """
+        yields the CPEs page by page, so the first results can be shown before the rest have arrived
+        """
+        mirror = cls.get_mirror()
+        if mirror is not None:
+            yield from mirror.iter_CPEs(keyword)
+            return
         logging.info(f"Requesting NVD for CPEs by the keyword: {keyword}")
-        cpes_list = []
-        products = super().get(f'cpes/2.0/?keywordSearch={keyword}').json()["products"]
-        for product in products:
-            title = product["cpe"]["titles"][0]["title"]
-            cpe_name = product["cpe"]["cpeName"]
-            cpes_list.append(f'{title} ({cpe_name})')
-        return cpes_list
+        for products in cls.__iter_pages(f'cpes/2.0/?keywordSearch={keyword}', "products", cls.CPES_PER_PAGE, cls.CPES_CACHE_TTL):
+            yield cls.__extract_CPEs(products) # extracted before yielding, so the caller's time is not counted
+
+    @classmethod
+    async def async_get_CPEs_by_keyword(cls, keyword: str) -> List[str]:
+        mirror = cls.get_mirror()
+        if mirror is not None:
+            return mirror.search_CPEs(keyword)
+        logging.info(f"Requesting NVD for CPEs by the keyword: {keyword}")
+        return [cpe async for products in cls.__async_iter_pages(f'cpes/2.0/?keywordSearch={keyword}', "products", cls.CPES_PER_PAGE, cls.CPES_CACHE_TTL)
+                for cpe in cls.__extract_CPEs(products)]
     
     @classmethod
-    def get_vulnerabilities_by_cpe_and_severity(cls, cpe_name: str, min_severity: float = 0) -> List[CVE]:
+    def get_vulnerabilities_by_cpe_and_severity(cls, cpe_name: str, min_severity: float = 0, has_kev: bool = False,
+                                                published_start: Optional[datetime] = None, published_end: Optional[datetime] = None,
+                                                no_rejected: bool = True) -> List[CVE]:
+        return [cve for CVEs_page in cls.iter_vulnerabilities_by_cpe_and_severity(cpe_name, min_severity, has_kev, published_start, published_end, no_rejected)
+                for cve in CVEs_page]
+
+    @classmethod
+    def iter_vulnerabilities_by_cpe_and_severity(cls, cpe_name: str, min_severity: float = 0, has_kev: bool = False,
+                                                 published_start: Optional[datetime] = None, published_end: Optional[datetime] = None,
+                                                 no_rejected: bool = True) -> Iterator[List[CVE]]:
+        """
+        the filters are sent to NVD, so only CVEs that may pass them are transferred and parsed,
+        has_kev keeps the CVEs in CISA's Known Exploited Vulnerabilities catalog and a published range without an end runs until now
+        """
+        mirror = cls.get_mirror()
+        if mirror is not None and not has_kev and published_start is None and published_end is None: # the mirror keeps neither
+            for CVEs in mirror.iter_vulnerabilities(cpe_name, min_severity):
+                yield cls.__shared_CVEs(CVEs)
+            return
+        logging.info(f"Requesting NVD for CVEs by the CPE: {cpe_name} and with min severity of: {min_severity}")
+        queries = cls.__CVEs_queries(cpe_name, min_severity, has_kev, published_start, published_end, no_rejected)
+        yielded_cve_ids = set() if len(queries) > 1 else None # a CVE may be in several queries' results, e.g. in both a v3 and a v2 band
+        for query in queries:
+            for vulnerabilities in cls.__iter_pages(query, "vulnerabilities", cls.CVES_PER_PAGE, cls.CVES_CACHE_TTL):
+                yield cls.__extract_CVEs(vulnerabilities, min_severity, yielded_cve_ids)
+
+    @classmethod
+    async def async_get_vulnerabilities_by_cpe_and_severity(cls, cpe_name: str, min_severity: float = 0, has_kev: bool = False,
+                                                            published_start: Optional[datetime] = None, published_end: Optional[datetime] = None,
+                                                            no_rejected: bool = True) -> List[CVE]:
+        """
+        the queries of the filters are fetched concurrently, and their CVEs are kept in the order of the queries
+        """
+        mirror = cls.get_mirror()
+        if mirror is not None and not has_kev and published_start is None and published_end is None:
+            return cls.__shared_CVEs(mirror.get_vulnerabilities(cpe_name, min_severity))
         logging.info(f"Requesting NVD for CVEs by the CPE: {cpe_name} and with min severity of: {min_severity}")
+        queries = cls.__CVEs_queries(cpe_name, min_severity, has_kev, published_start, published_end, no_rejected)
+
+        async def get_pages(query: str) -> List[List[dict]]:
+            return [vulnerabilities async for vulnerabilities in cls.__async_iter_pages(query, "vulnerabilities", cls.CVES_PER_PAGE, cls.CVES_CACHE_TTL)]
+
+        queries_pages = await asyncio.gather(*(get_pages(query) for query in queries))
+        yielded_cve_ids = set() if len(queries) > 1 else None
+        return [cve for pages in queries_pages for vulnerabilities in pages for cve in cls.__extract_CVEs(vulnerabilities, min_severity, yielded_cve_ids)]
+
+    @classmethod
+    def iter_raw_CVE_pages(cls, cpe_name: str, min_severity: float = 0, has_kev: bool = False,
+                           published_start: Optional[datetime] = None, published_end: Optional[datetime] = None,
+                           no_rejected: bool = True) -> Iterator[bytes]:
+        """
+        the undecoded bodies of the pages iter_vulnerabilities_by_cpe_and_severity fetches, for decoding them elsewhere
+        (e.g. in another process, see parse_CVE_records), only the start of the first page of a query is read here
+        """
+        logging.info(f"Requesting NVD for CVE pages by the CPE: {cpe_name} and with min severity of: {min_severity}")
+        for query in cls.__CVEs_queries(cpe_name, min_severity, has_kev, published_start, published_end, no_rejected):
+            yield from cls.__iter_raw_pages(query, cls.CVES_PER_PAGE, cls.CVES_CACHE_TTL)
+
+    @staticmethod
+    def parse_CVE_records(page_body: bytes) -> List[CVERecord]:
+        """
+        decodes a CVE page and extracts its CVEs as tuples, which are cheaper to pickle than CVEs, see build_CVEs
+        """
+        return list(NVD_API.__iter_CVE_records(vulnerability["cve"] for vulnerability in json.loads(page_body)["vulnerabilities"]))
+
+    @classmethod
+    def build_CVEs(cls, records: Iterable[CVERecord], min_severity: float = 0, yielded_cve_ids: Optional[Set[str]] = None) -> List[CVE]:
+        """
+        the CVEs of the records scoring at least min_severity (the severity bands are coarser than the score),
+        leaving out and adding to yielded_cve_ids the ones already returned by another query, when there are several.
+        they are shared with the CVEs this session already returned, like the fetched ones
+        """
         CVEs_list: List[CVE] = []
-        vulnerabilities = super().get(f'cves/2.0?cpeName={cpe_name}').json()["vulnerabilities"]
-        for vulnerability in vulnerabilities:
-            cve_details = vulnerability["cve"]
-            cve = CVE(**cls.__extract_returned_details_for_cve(cve_details))
-            if (cve.severity >= min_severity):
+        for cve in starmap(CVE, records):
+            if cve.severity >= min_severity and (yielded_cve_ids is None or cve.cve_id not in yielded_cve_ids):
                 CVEs_list.append(cve)
+                if yielded_cve_ids is not None:
+                    yielded_cve_ids.add(cve.cve_id)
+        return cls.__shared_CVEs(CVEs_list)
+
+    @classmethod
+    def iter_CVEs_streamed(cls, cpe_name: str, min_severity: float = 0, has_kev: bool = False,
+                           published_start: Optional[datetime] = None, published_end: Optional[datetime] = None,
+                           no_rejected: bool = True) -> Iterator[CVE]:
+        """
+        yields the CVEs one at a time while the responses are parsed incrementally, so a 2000 CVEs page
+        is never held in memory as a whole, the pages are fetched one after the other
+        """
+        logging.info(f"Streaming NVD CVEs by the CPE: {cpe_name} and with min severity of: {min_severity}")
+        queries = cls.__CVEs_queries(cpe_name, min_severity, has_kev, published_start, published_end, no_rejected)
+        yielded_cve_ids = set()
+        for query in queries:
+            for vulnerability in cls.iter_streamed_items(query, "vulnerabilities", cls.CVES_PER_PAGE):
+                cve = cls.parse_CVE(vulnerability["cve"])
+                METRICS.count("nvd_items_extracted", collection="cves") # not timed, parsing is interleaved with reading the response
+                if (cve.severity >= min_severity) and cve.cve_id not in yielded_cve_ids:
+                    if len(queries) > 1:
+                        yielded_cve_ids.add(cve.cve_id)
+                    yield cls.__shared_CVEs([cve])[0]
+
+    @classmethod
+    def iter_streamed_items(cls, url: str, items_key: str, results_per_page: int) -> Iterator[dict]:
+        separator = "&" if "?" in url else "?"
+        start_index = 0
+        while True:
+            res = cls.get(f'{url}{separator}resultsPerPage={results_per_page}&startIndex={start_index}', stream=True)
+            with res:
+                page = JSONObjectStream(res.iter_content(cls.STREAM_CHUNK_SIZE), items_key)
+                items_count = 0
+                for item in page:
+                    items_count += 1
+                    yield item
+            start_index += items_count
+            if items_count == 0 or start_index >= page.header["totalResults"]:
+                return
+
+    @classmethod
+    def iter_modified(cls, collection: str, last_modified_start: Optional[datetime], last_modified_end: datetime) -> Iterator[List[dict]]:
+        """
+        yields the raw pages of "cpes" or "cves" modified in the given range, or of the whole collection without a start,
+        ranges longer than NVD accepts are split into several queries
+        """
+        items_key, results_per_page = ("products", cls.CPES_PER_PAGE) if collection == "cpes" else ("vulnerabilities", cls.CVES_PER_PAGE)
+        if last_modified_start is None:
+            logging.info(f"Requesting NVD for all the {collection}")
+            yield from cls.__iter_pages(f'{collection}/2.0', items_key, results_per_page, 0)
+            return
+        while last_modified_start < last_modified_end:
+            range_end = min(last_modified_end, last_modified_start + cls.MAX_LAST_MODIFIED_RANGE)
+            logging.info(f"Requesting NVD for the {collection} modified between {last_modified_start} and {range_end}")
+            dates = f'lastModStartDate={cls.__format_date(last_modified_start)}&lastModEndDate={cls.__format_date(range_end)}'
+            yield from cls.__iter_pages(f'{collection}/2.0?{dates}', items_key, results_per_page, 0)
+            last_modified_start = range_end
+
+    @classmethod
+    def get_mirror(cls):
+        if cls.MIRROR is None and os.environ.get(cls.MIRROR_PATH_ENV):
+            from apis.nvd_mirror import NVDMirror # imported here since the mirror itself builds on NVD_API
+            NVD_API.MIRROR = NVDMirror(os.environ[cls.MIRROR_PATH_ENV])
+        return cls.MIRROR
+
+    @staticmethod
+    def format_CPE(product: dict) -> str:
+        title = product["cpe"]["titles"][0]["title"]
+        cpe_name = product["cpe"]["cpeName"]
+        return f'{title} ({cpe_name})'
+
+    @staticmethod
+    def parse_CVE(cve_details: dict) -> CVE:
+        return NVD_API.parse_CVEs((cve_details,))[0]
+
+    @staticmethod
+    def parse_CVEs(cves_details: Iterable[dict]) -> List[CVE]:
+        return list(starmap(CVE, NVD_API.__iter_CVE_records(cves_details)))
+
+    @staticmethod
+    def __iter_CVE_records(cves_details: Iterable[dict]) -> Iterator[CVERecord]:
+        """
+        extracts a whole page of CVE details in one pass, with the regexes and lookups bound once for the page
+        """
+        find_sentence_end = FIRST_SENTENCE_END.search
+        match_github_url = GITHUB_REPO_URL.match
+        for cve_details in cves_details:
+            cve_metrics = cve_details.get("metrics", {})
+            cve_version = next((version for version in CVSS_METRICS_VERSIONS if version in cve_metrics), None)
+            severity = cve_metrics[cve_version][0]["cvssData"]["baseScore"] if cve_version else 0 # not scored yet
+            descriptions = cve_details.get("descriptions") or ({"value": ""},) # a reserved or rejected CVE may have none
+            whole_description = next((description["value"] for description in descriptions if description.get("lang") == "en"), descriptions[0]["value"])
+            sentence_end = find_sentence_end(whole_description, 1)
+            description = whole_description[:sentence_end.end()] if sentence_end else whole_description[:MAX_DESCRIPTION_LENGTH]
+            repositories_urls = {}
+            for reference in cve_details["references"]:
+                if "Exploit" in reference.get("tags", ()):
+                    github_url = match_github_url(reference["url"])
+                    if github_url and github_url.group(1).lower() not in GITHUB_RESERVED_OWNERS:
+                        repositories_urls[f"repos/{github_url.group(1)}/{github_url.group(2)}"] = None
+            yield cve_details["id"], severity, description, tuple(repositories_urls)
+
+    @classmethod
+    def __extract_CPEs(cls, products: List[dict]) -> List[str]:
+        with METRICS.span("nvd_extraction", collection="cpes"):
+            CPEs_list = [cls.format_CPE(product) for product in products]
+        METRICS.count("nvd_items_extracted", len(CPEs_list), collection="cpes")
+        return CPEs_list
+
+    @classmethod
+    def __extract_CVEs(cls, vulnerabilities: List[dict], min_severity: float, yielded_cve_ids: Optional[Set[str]]) -> List[CVE]:
+        """
+        the CVEs of a page scoring at least min_severity (the severity bands are coarser than the score),
+        leaving out and adding to yielded_cve_ids the ones already returned by another query, when there are several
+        """
+        with METRICS.span("nvd_extraction", collection="cves"):
+            CVEs_list = cls.build_CVEs(NVD_API.__iter_CVE_records(vulnerability["cve"] for vulnerability in vulnerabilities), min_severity, yielded_cve_ids)
+        METRICS.count("nvd_items_extracted", len(vulnerabilities), collection="cves")
         return CVEs_list
-    
+
+    @classmethod
+    def __shared_CVEs(cls, CVEs: List[CVE]) -> List[CVE]:
+        """
+        a CVE this session already returned (e.g. for a sibling CPE) is returned as the same object while NVD reports it
+        unchanged, so the repos it was enriched with come along instead of being fetched again
+        """
+        shared_CVEs = cls.CVES.merge({cve.cve_id: cve for cve in CVEs}, lambda cached, fetched:
+                                     (cached.severity, cached.description, tuple(cached.relevant_repositories_urls)) ==
+                                     (fetched.severity, fetched.description, tuple(fetched.relevant_repositories_urls)))
+        return [shared_CVEs[cve.cve_id] for cve in CVEs]
+
+    @classmethod
+    def __CVEs_queries(cls, cpe_name: str, min_severity: float, has_kev: bool, published_start: Optional[datetime],
+                       published_end: Optional[datetime], no_rejected: bool) -> List[str]:
+        """
+        NVD takes a single severity band and a published range of up to 120 days per query,
+        so a filter spanning several of them is answered by a query for each, whose results may overlap
+        """
+        base_query = f'cves/2.0?cpeName={cpe_name}'
+        if has_kev:
+            base_query += "&hasKev"
+        if no_rejected:
+            base_query += "&noRejected"
+        queries = [f'{base_query}{severity_filter}' for severity_filter in cls.__severity_filters(min_severity)]
+        if published_start is None:
+            if published_end is not None:
+                raise ValueError("A published range needs a start date")
+            return queries
+        if published_end is None: # dates are in UTC, naive or not
+            published_end = datetime.now(timezone.utc) if published_start.tzinfo else datetime.now(timezone.utc).replace(tzinfo=None)
+        published_ranges = []
+        while published_start < published_end:
+            range_end = min(published_end, published_start + cls.MAX_PUBLISHED_RANGE)
+            published_ranges.append(f'&pubStartDate={cls.__format_date(published_start)}&pubEndDate={cls.__format_date(range_end)}')
+            published_start = range_end
+        return [f'{query}{published_range}' for query in queries for published_range in published_ranges]
+
+    @classmethod
+    def __severity_filters(cls, min_severity: float) -> List[str]:
+        """
+        the bands a CVE scoring at least min_severity may be in, asked by both CVSS versions since a CVE's severity
+        falls back to its v2 score when it has no v3 one. most older CVEs have both scores, so below SERVER_FILTER_MIN_SEVERITY
+        the v3 and v2 results overlap so much that together they weigh about as much as the unfiltered history
+        """
+        if min_severity < cls.SERVER_FILTER_MIN_SEVERITY:
+            return [""]
+        return [f'&cvssV3Severity={severity}' for severity, max_score in cls.CVSS_V3_SEVERITIES if max_score >= min_severity] + \
+               [f'&cvssV2Severity={severity}' for severity, max_score in cls.CVSS_V2_SEVERITIES if max_score >= min_severity]
+
     @staticmethod
-    def __extract_returned_details_for_cve(cve_details: dict) -> dict:
-        cve_details_to_return = {}
-        cve_details_to_return["cve_id"] = cve_details["id"]
-        cve_metrics = cve_details["metrics"]
-        cve_version = "cvssMetricV31" if "cvssMetricV31" in cve_metrics else "cvssMetricV2" # use older version if I have to
-        cve_details_to_return["severity"] = cve_details["metrics"][cve_version][0]["cvssData"]["baseScore"]
-        whole_description = list(filter(lambda x: x["lang"] == "en", cve_details["descriptions"]))[0]["value"]
-        cve_details_to_return["description"] = NVD_API.__extract_first_sentence_from_description(whole_description)
-        cve_details_to_return["relevant_repositories_urls"] = NVD_API.__extract_exploit_github_references_urls(cve_details["references"])
-        return cve_details_to_return
-    
+    def __format_date(date: datetime) -> str:
+        return date.strftime("%Y-%m-%dT%H:%M:%S.000") + "%2B00:00" # the dates are in UTC, with an url encoded "+"
+
+    @classmethod
+    def __iter_pages(cls, url: str, items_key: str, results_per_page: int, cache_ttl: float) -> Iterator[List[dict]]:
+        """
+        reads the first page to learn totalResults, then fetches the remaining offsets concurrently
+        and yields the pages in order
+        """
+        if cls.http_backend() == "asyncio":
+            yield from BACKGROUND_LOOP.iterate(cls.__async_iter_pages(url, items_key, results_per_page, cache_ttl))
+            return
+        page_url = NVD_API.__page_url(url, results_per_page)
+        first_page = cls.get(f'{page_url}0', cache_ttl).json()
+        yield first_page[items_key]
+
+        offsets = NVD_API.__next_offsets(url, first_page)
+        if len(offsets) == 0:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(cls.MAX_PARALLEL_PAGES, len(offsets)))
+        try:
+            get_page = propagated(lambda offset: cls.get(f'{page_url}{offset}', cache_ttl).json()[items_key])
+            pages = [executor.submit(get_page, offset) for offset in offsets]
+            for page in pages:
+                yield page.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True) # the caller may stop iterating early
+
+    @classmethod
+    def __iter_raw_pages(cls, url: str, results_per_page: int, cache_ttl: float) -> Iterator[bytes]:
+        """
+        __iter_pages without decoding the pages, the pages after the first are fetched at most MAX_PARALLEL_PAGES ahead
+        of the caller, so a caller that is slower than the fetching holds the fetching back
+        """
+        page_url = NVD_API.__page_url(url, results_per_page)
+        first_page = cls.get(f'{page_url}0', cache_ttl).content
+        yield first_page
+
+        offsets = NVD_API.__next_offsets(url, NVD_API.__page_header(first_page))
+        if len(offsets) == 0:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(cls.MAX_PARALLEL_PAGES, len(offsets)))
+        try:
+            get_page = propagated(lambda offset: cls.get(f'{page_url}{offset}', cache_ttl).content)
+            pages: Deque = deque()
+            for offset in offsets:
+                pages.append(executor.submit(get_page, offset))
+                if len(pages) == cls.MAX_PARALLEL_PAGES:
+                    yield pages.popleft().result()
+            while pages:
+                yield pages.popleft().result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
     @staticmethod
-    def __extract_first_sentence_from_description(description: str) -> str: 
-        """
-        asuming a sentence is a non numeric string followed by a dot
-        """ 
-        for i in range(1, len(description) - 2):
-            if description[i] == "." and not description[i - 1].isnumeric() and description[i + 1] == " ":
-                return description[:i + 1]
-        return description[:min(len(description), 551)]
-    
+    def __page_url(url: str, results_per_page: int) -> str:
+        """
+        the url of the query's pages, missing only the startIndex value
+        """
+        separator = "&" if "?" in url else "?"
+        return f'{url}{separator}resultsPerPage={results_per_page}&startIndex='
+
     @staticmethod
-    def __extract_exploit_github_references_urls(references: List[dict]) -> List[str]:
-        return list(set([NVD_API.__slice_github_url(reference["url"]) for reference in references
-                if "github" in reference["url"] and "tags" in reference and "Exploit" in reference["tags"]]))
+    def __next_offsets(url: str, first_page_header: dict) -> range:
+        """
+        the startIndex of every page after the first, stepping by the first page's size since NVD may return less than requested
+        """
+        page_size = first_page_header["resultsPerPage"]
+        if page_size == 0:
+            return range(0)
+        offsets = range(page_size, first_page_header["totalResults"], page_size)
+        if len(offsets) > 0:
+            logging.info(f"Requesting NVD for {len(offsets)} more pages of {url}")
+        return offsets
 
     @staticmethod
-    def __slice_github_url(url: str) -> str: # so it contains the endpoint until the repo name without additionals
-        url_components = url[8:].split('/')[1:3]
-        url_components.insert(0, "repos")
-        return "/".join(url_components)
+    def __page_header(page_body: bytes) -> Dict[str, int]:
+        header = {name.decode(): int(value) for name, value in PAGE_HEADER_FIELD.findall(page_body, 0, PAGE_HEADER_SIZE)}
+        return header if len(header) == 2 else json.loads(page_body) # written in another order, the whole page is decoded
+
+    @classmethod
+    async def __async_iter_pages(cls, url: str, items_key: str, results_per_page: int, cache_ttl: float) -> AsyncIterator[List[dict]]:
+        """
+        __iter_pages for the tasks of an event loop, the pages are large so no more of them are in flight than with threads
+        """
+        page_url = NVD_API.__page_url(url, results_per_page)
+        first_page = (await cls.async_get(f'{page_url}0', cache_ttl)).json()
+        yield first_page[items_key]
+
+        offsets = NVD_API.__next_offsets(url, first_page)
+        if len(offsets) == 0:
+            return
+        parallel_pages = asyncio.Semaphore(cls.MAX_PARALLEL_PAGES)
+
+        async def get_page(offset: int) -> List[dict]:
+            async with parallel_pages:
+                return (await cls.async_get(f'{page_url}{offset}', cache_ttl)).json()[items_key]
+
+        pages = [asyncio.ensure_future(get_page(offset)) for offset in offsets]
+        try:
+            for page in pages:
+                yield await page
+        finally: # the caller may stop iterating early
+            for page in pages:
+                page.cancel()
@@ -0,0 +1,315 @@
+import re
+import os
+import sys
+import gzip
+import json
+import logging
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from apis.nvd_api import NVD_API
+from apis.json_stream import JSONObjectStream
+from classes.cve import CVE
+
+CPE_COMPONENTS_SEPARATOR = re.compile(r'(?<!\\):') # colons inside components are escaped
+VERSION_PARTS_SEPARATOR = re.compile(r'[.\-_+]')
+FEED_CHUNK_SIZE = 1024 * 1024
+FEED_BATCH_SIZE = 5000
+VERSION_RANGE_KEYS = ("versionStartIncluding", "versionStartExcluding", "versionEndIncluding", "versionEndExcluding")
+FIRST_PAGE_SIZE = 500 # CPEs or CVE matches, the first page of a lookup takes a few ms however many results follow
+
+
+class NVDMirror:
+    """
+    a local SQLite copy of the NVD CPE dictionary and CVEs, filled once by a bulk import
+    and kept current by incremental syncs of what was modified since the last one
+    """
+    def __init__(self, path: str):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # the formatted CPEs are read from cpes, reading the stored columns of an FTS table is several times slower than a table's,
+        # and a product's matches are read from the covering index alone
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS cpes (id INTEGER PRIMARY KEY, cpe_name TEXT UNIQUE NOT NULL, title TEXT NOT NULL,
+                formatted TEXT NOT NULL DEFAULT '');
+            CREATE VIRTUAL TABLE IF NOT EXISTS cpes_search USING fts5(title, cpe_name, tokenize='trigram');
+            CREATE TABLE IF NOT EXISTS cves (id INTEGER PRIMARY KEY, cve_id TEXT UNIQUE NOT NULL, severity REAL NOT NULL,
+                description TEXT NOT NULL, relevant_repositories_urls TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS cve_matches (cve_id TEXT NOT NULL, vendor TEXT NOT NULL, product TEXT NOT NULL,
+                criteria TEXT NOT NULL, version_range TEXT, cve_row INTEGER);
+            CREATE INDEX IF NOT EXISTS cve_matches_cve ON cve_matches (cve_id);
+            CREATE TABLE IF NOT EXISTS sync_state (collection TEXT PRIMARY KEY, synced_until TEXT NOT NULL);
+        """)
+        self.__migrate()
+        self._connection.executescript("""
+            CREATE INDEX IF NOT EXISTS cve_matches_product_row ON cve_matches (vendor, product, cve_row, criteria, version_range);
+            DROP INDEX IF EXISTS cve_matches_product;
+            DROP INDEX IF EXISTS cve_matches_product_range;
+        """)
+        self._connection.commit()
+
+    def import_CPEs(self, products: Iterable[dict]) -> int:
+        count = 0
+        with self._lock:
+            for product in products:
+                cpe_name = product["cpe"]["cpeName"]
+                self.__delete_CPE(cpe_name)
+                title = product["cpe"]["titles"][0]["title"]
+                rowid = self._connection.execute("INSERT INTO cpes (cpe_name, title, formatted) VALUES (?, ?, ?)",
+                                                 (cpe_name, title, NVD_API.format_CPE(product))).lastrowid
+                self._connection.execute("INSERT INTO cpes_search (rowid, title, cpe_name) VALUES (?, ?, ?)", (rowid, title, cpe_name))
+                count += 1
+            self._connection.commit()
+        return count
+
+    def import_vulnerabilities(self, vulnerabilities: Iterable[dict]) -> int:
+        count = 0
+        with self._lock:
+            for vulnerability in vulnerabilities:
+                cve_details = vulnerability["cve"]
+                self._connection.execute("DELETE FROM cves WHERE cve_id = ?", (cve_details["id"],))
+                self._connection.execute("DELETE FROM cve_matches WHERE cve_id = ?", (cve_details["id"],))
+                if cve_details.get("vulnStatus") == "Rejected":
+                    continue
+                cve = NVD_API.parse_CVE(cve_details)
+                cve_row = self._connection.execute("INSERT INTO cves (cve_id, severity, description, relevant_repositories_urls) VALUES (?, ?, ?, ?)",
+                                                   (cve.cve_id, cve.severity, cve.description, json.dumps(cve.relevant_repositories_urls))).lastrowid
+                self._connection.executemany("INSERT INTO cve_matches (cve_id, vendor, product, criteria, version_range, cve_row) VALUES (?, ?, ?, ?, ?, ?)",
+                                             (match + (cve_row,) for match in NVDMirror.__extract_matches(cve_details)))
+                count += 1
+            self._connection.commit()
+        return count
+
+    def import_feed_file(self, path: str) -> int:
+        """
+        imports a JSON file (optionally gzipped) in the format of the NVD 2.0 API responses and feeds,
+        the file is parsed as a stream since the yearly CVE feeds are hundreds of megabytes
+        """
+        count = 0
+        collection = None
+        with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as feed_file:
+            feed = JSONObjectStream(iter(lambda: feed_file.read(FEED_CHUNK_SIZE), b""), ("products", "vulnerabilities"))
+            for batch in NVDMirror.__batches(feed, FEED_BATCH_SIZE):
+                collection = "cpes" if "cpe" in batch[0] else "cves"
+                count += self.import_CPEs(batch) if collection == "cpes" else self.import_vulnerabilities(batch)
+        if collection and "timestamp" in feed.header: # the next sync continues from the oldest imported feed
+            feed_time = NVDMirror.__parse_time(feed.header["timestamp"])
+            synced_until = self.__get_synced_until(collection)
+            if synced_until is None or feed_time < synced_until:
+                self.__set_synced_until(collection, feed_time)
+        return count
+
+    def sync(self, until: Optional[datetime] = None) -> Tuple[int, int]:
+        """
+        fetches what NVD modified since the last sync, a mirror that was never synced downloads everything
+        """
+        until = until or datetime.now(timezone.utc)
+        counts = []
+        for collection, import_page in (("cpes", self.import_CPEs), ("cves", self.import_vulnerabilities)):
+            synced_until = self.__get_synced_until(collection)
+            count = 0
+            for page in NVD_API.iter_modified(collection, synced_until, until):
+                count += import_page(page)
+            self.__set_synced_until(collection, until)
+            counts.append(count)
+        logging.info(f"Synced the NVD mirror until {until}: {counts[0]} CPEs and {counts[1]} CVEs updated")
+        return counts[0], counts[1]
+
+    def search_CPEs(self, keyword: str) -> List[str]:
+        return [cpe for cpes_page in self.iter_CPEs(keyword) for cpe in cpes_page]
+
+    def iter_CPEs(self, keyword: str, page_size: int = FIRST_PAGE_SIZE) -> Iterator[List[str]]:
+        """
+        like NVD's keywordSearch, every word of the keyword has to appear in the title or the CPE name.
+        the CPEs are read in pages of twice the size of the previous one, in the order they were imported
+        """
+        words = keyword.split()
+        if not words:
+            return
+        long_words = [word for word in words if len(word) >= 3] # the trigram index can only look up 3 characters or more
+        short_words = [word for word in words if len(word) < 3]
+        if long_words: # the index is read in rowid order, and stops at the page's end
+            order = "cpes_search.rowid"
+            query = "SELECT cpes.id, cpes.formatted FROM cpes_search JOIN cpes ON cpes.id = cpes_search.rowid WHERE cpes_search MATCH ? AND cpes_search.rowid > ?"
+            params = [" AND ".join('"' + word.replace('"', '""') + '"' for word in long_words)]
+        else:
+            order = "id"
+            query = "SELECT id, formatted FROM cpes WHERE id > ?"
+            params = []
+        query += " AND (cpes.title LIKE ? OR cpes.cpe_name LIKE ?)" * len(short_words) + f" ORDER BY {order} LIMIT ?"
+        short_words_params = [f"%{word}%" for word in short_words for _ in range(2)]
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._connection.execute(query, params + [last_id] + short_words_params + [page_size]).fetchall()
+            if not rows:
+                return
+            yield [formatted for _, formatted in rows]
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1][0]
+            page_size *= 2 # the first page is shown soon, the next ones cost fewer queries
+
+    def get_vulnerabilities(self, cpe_name: str, min_severity: float = 0) -> List[CVE]:
+        return [cve for CVEs_page in self.iter_vulnerabilities(cpe_name, min_severity) for cve in CVEs_page]
+
+    def iter_vulnerabilities(self, cpe_name: str, min_severity: float = 0, page_size: int = FIRST_PAGE_SIZE) -> Iterator[List[CVE]]:
+        """
+        the product's matches are read from their covering index in pages of twice the size of the previous one, in the order
+        their CVEs were imported, and checked first, so only the matched CVEs are read. a page ends with all the matches of its last CVE
+        """
+        cpe_components = NVDMirror.__split_cpe(cpe_name)
+        product = (cpe_components[3].lower(), cpe_components[4].lower())
+        matches: Dict[Tuple[str, Optional[str]], bool] = {} # the rows of a product share a few criteria and ranges
+        last_row = 0
+        while True:
+            with self._lock:
+                match_rows = self._connection.execute("""
+                    SELECT cve_row, criteria, version_range FROM cve_matches WHERE vendor = ? AND product = ? AND cve_row > ? AND cve_row <= IFNULL(
+                        (SELECT cve_row FROM cve_matches WHERE vendor = ? AND product = ? AND cve_row > ? ORDER BY cve_row LIMIT 1 OFFSET ?), 9223372036854775807) -- or up to the last one
+                    ORDER BY cve_row
+                """, (*product, last_row, *product, last_row, page_size - 1)).fetchall()
+            if not match_rows:
+                return
+            matched_rows = []
+            for cve_row, criteria, version_range in match_rows:
+                if matched_rows and matched_rows[-1] == cve_row: # the matches of a CVE are next to each other
+                    continue
+                is_match = matches.get((criteria, version_range))
+                if is_match is None:
+                    is_match = matches[criteria, version_range] = NVDMirror.__matches(cpe_components, criteria, version_range)
+                if is_match:
+                    matched_rows.append(cve_row)
+            last_row = match_rows[-1][0]
+            page_size *= 2
+            if not matched_rows:
+                continue
+            with self._lock:
+                rows = self._connection.execute("""
+                    SELECT cve_id, severity, description, relevant_repositories_urls FROM cves
+                    WHERE id IN (SELECT value FROM json_each(?)) AND severity >= ? ORDER BY id
+                """, (json.dumps(matched_rows), min_severity)).fetchall()
+            if rows:
+                cve_ids, severities, descriptions, repositories_urls = zip(*rows)
+                # decoded as a single JSON array, one call instead of one per CVE
+                yield list(map(CVE, cve_ids, severities, descriptions, json.loads(f"[{','.join(repositories_urls)}]")))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __migrate(self) -> None:
+        """
+        mirrors built before the formatted CPEs moved out of cpes_search get them copied into cpes,
+        and those built before the matches were paged get the rows of their CVEs
+        """
+        cpes_columns = {name for _, name, *_ in self._connection.execute("PRAGMA table_info(cpes)")}
+        if "formatted" not in cpes_columns:
+            logging.info("Moving the formatted CPEs of the NVD mirror out of its search index")
+            self._connection.execute("ALTER TABLE cpes ADD COLUMN formatted TEXT NOT NULL DEFAULT ''")
+            self._connection.execute("UPDATE cpes SET formatted = (SELECT formatted FROM cpes_search WHERE cpes_search.rowid = cpes.id)")
+        cve_matches_columns = {name for _, name, *_ in self._connection.execute("PRAGMA table_info(cve_matches)")}
+        if "cve_row" not in cve_matches_columns:
+            logging.info("Adding the rows of their CVEs to the matches of the NVD mirror")
+            self._connection.execute("ALTER TABLE cve_matches ADD COLUMN cve_row INTEGER")
+            self._connection.execute("UPDATE cve_matches SET cve_row = (SELECT id FROM cves WHERE cves.cve_id = cve_matches.cve_id)")
+
+    def __delete_CPE(self, cpe_name: str) -> None:
+        row = self._connection.execute("SELECT id FROM cpes WHERE cpe_name = ?", (cpe_name,)).fetchone()
+        if row is not None:
+            self._connection.execute("DELETE FROM cpes_search WHERE rowid = ?", row)
+            self._connection.execute("DELETE FROM cpes WHERE id = ?", row)
+
+    def __get_synced_until(self, collection: str) -> Optional[datetime]:
+        with self._lock:
+            row = self._connection.execute("SELECT synced_until FROM sync_state WHERE collection = ?", (collection,)).fetchone()
+        return NVDMirror.__parse_time(row[0]) if row else None
+
+    def __set_synced_until(self, collection: str, synced_until: datetime) -> None:
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (collection, synced_until.isoformat()))
+            self._connection.commit()
+
+    @staticmethod
+    def __parse_time(timestamp: str) -> datetime:
+        parsed = datetime.fromisoformat(timestamp)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc) # NVD timestamps are in UTC
+
+    @staticmethod
+    def __batches(items: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def __extract_matches(cve_details: dict) -> List[tuple]:
+        matches = []
+        for configuration in cve_details.get("configurations", []):
+            for node in configuration.get("nodes", []):
+                for cpe_match in node.get("cpeMatch", []):
+                    if not cpe_match.get("vulnerable", True):
+                        continue
+                    components = NVDMirror.__split_cpe(cpe_match["criteria"])
+                    version_range = {key: cpe_match[key] for key in VERSION_RANGE_KEYS if key in cpe_match}
+                    matches.append((cve_details["id"], components[3].lower(), components[4].lower(), cpe_match["criteria"],
+                                    json.dumps(version_range) if version_range else None))
+        return matches
+
+    @staticmethod
+    def __matches(cpe_components: List[str], criteria: str, version_range: Optional[str]) -> bool:
+        criteria_components = NVDMirror.__split_cpe(criteria)
+        for cpe_component, criteria_component in zip(cpe_components[2:], criteria_components[2:]):
+            if criteria_component != "*" and criteria_component.lower() != cpe_component.lower():
+                return False
+        if version_range is None:
+            return True
+        version = NVDMirror.__version_key(cpe_components[5])
+        for key, bound in json.loads(version_range).items():
+            bound = NVDMirror.__version_key(bound)
+            if (key == "versionStartIncluding" and version < bound) or (key == "versionStartExcluding" and version <= bound) \
+                    or (key == "versionEndIncluding" and version > bound) or (key == "versionEndExcluding" and version >= bound):
+                return False
+        return True
+
+    @staticmethod
+    def __split_cpe(cpe_name: str) -> List[str]:
+        components = CPE_COMPONENTS_SEPARATOR.split(cpe_name)
+        return components + ["*"] * (13 - len(components))
+
+    @staticmethod
+    def __version_key(version: str) -> tuple:
+        return tuple((0, int(part), "") if part.isdigit() else (1, 0, part.lower()) for part in VERSION_PARTS_SEPARATOR.split(version) if part)
+
+
+def main(arguments: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Builds and syncs the local NVD mirror")
+    parser.add_argument("--path", default=os.environ.get(NVD_API.MIRROR_PATH_ENV, "nvd_mirror.sqlite3"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="import NVD 2.0 JSON feed files (CPE or CVE, optionally gzipped)")
+    import_parser.add_argument("files", nargs="+")
+    subparsers.add_parser("sync", help="fetch from the NVD API what was modified since the last sync")
+    parsed_arguments = parser.parse_args(arguments)
+
+    logging.basicConfig(level=logging.INFO)
+    mirror = NVDMirror(parsed_arguments.path)
+    if parsed_arguments.command == "import":
+        for feed_file in parsed_arguments.files:
+            logging.info(f"Imported {mirror.import_feed_file(feed_file)} records from {feed_file}")
+    else:
+        mirror.sync()
+    mirror.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,65 @@
+import time
+import asyncio
+import threading
+from typing import Optional
+
+from apis import cancellation
+
+
+class TokenBucket:
+    """
+    allows up to capacity requests per period seconds, requests above it wait for the bucket to refill
+    """
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float) -> bool:
+        """
+        takes a token, sleeping until it is available, returns False without taking it if that would take over max_wait seconds
+        """
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            cancellation.sleep(wait)
+        return True
+
+    async def acquire_async(self, max_wait: float) -> bool:
+        """
+        like acquire, for tasks of an event loop, which wait without blocking the loop and share the bucket with the threads
+        """
+        wait = self.reserve(max_wait)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        takes a token and returns the seconds to wait until it is available, or None without taking it if that is over max_wait
+        """
+        with self._lock:
+            self.__refill()
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1 # may go negative, which queues the waiting callers one after the other
+        return wait
+
+    def pause(self, delay: float) -> None:
+        """
+        holds every caller back for delay seconds, used when the server reports its quota is exhausted
+        """
+        with self._lock:
+            self.__refill()
+            self._tokens = min(self._tokens, 1 - delay * self.rate)
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+EVICTED_TO = 0.9 # of max_bytes, so the next responses are stored without evicting again
+
+
+class ResponseCache:
+    """
+    a single-file SQLite store of response bodies keyed by the requested url, entries expire by the TTL given on lookup
+    and are purged once older than max_age (the longest TTL asked of the cache). above max_bytes of bodies the expired
+    and then the least recently used entries are evicted, down to EVICTED_TO of it
+    """
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, max_age: float = 24 * 60 * 60):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, body BLOB NOT NULL, stored_at REAL NOT NULL, last_access REAL NOT NULL)""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._connection.execute("DELETE FROM responses WHERE stored_at < ?", (time.time() - max_age,))
+        self._connection.commit()
+        self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str, ttl: float) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT body, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > min(ttl, self.max_age):
+                if row is not None and now - row[1] > self.max_age:
+                    self.__delete(key, len(row[0]))
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, body: bytes) -> None:
+        now = time.time()
+        with self._lock:
+            replaced = self._connection.execute("SELECT LENGTH(body) FROM responses WHERE key = ?", (key,)).fetchone()
+            self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, body, now, now))
+            self._total_bytes += len(body) - (replaced[0] if replaced else 0)
+            if self._total_bytes > self.max_bytes:
+                self.__evict(now)
+            self._connection.commit()
+
+    def __evict(self, now: float) -> None:
+        """
+        the expired entries first, then the least recently used ones until the bodies fit in EVICTED_TO of max_bytes
+        """
+        self._connection.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.max_age,))
+        self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+        evicted_keys = []
+        for key, size in self._connection.execute("SELECT key, LENGTH(body) FROM responses ORDER BY last_access"):
+            if self._total_bytes <= self.max_bytes * EVICTED_TO:
+                break
+            evicted_keys.append((key,))
+            self._total_bytes -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+
+    def __delete(self, key: str, size: int) -> None:
+        self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._connection.commit()
+        self._total_bytes -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self._total_bytes = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": self._total_bytes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
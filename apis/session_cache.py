@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from instrumentation import METRICS
+
+
+class SessionCache:
+    """
+    an in-memory LRU of the values fetched during this session, bounded to max_entries (0 keeps nothing), with single-flight
+    fetching: the first caller to claim a missing key fetches it and resolves it, the callers asking for it meanwhile get
+    its future and wait for it instead of fetching it again. lookups are counted as hits, coalesced (waited for another
+    caller's fetch) or misses (fetched), the hits and coalesced lookups are the fetches saved
+    """
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._values: "OrderedDict[str, Any]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            return value
+
+    def claim(self, keys: Iterable[str]) -> Tuple[Dict[str, Any], Dict[str, Future], List[str]]:
+        """
+        returns the cached values, the futures of the keys other callers are fetching and the keys claimed for the caller
+        to fetch, every claimed key must then be resolved (with None when it could not be fetched) or its waiters wait forever
+        """
+        cached, in_flight, claimed = {}, {}, []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._values:
+                    self._values.move_to_end(key)
+                    cached[key] = self._values[key]
+                elif key in self._in_flight:
+                    in_flight[key] = self._in_flight[key]
+                else:
+                    self._in_flight[key] = Future()
+                    claimed.append(key)
+            self.hits += len(cached)
+            self.coalesced += len(in_flight)
+            self.misses += len(claimed)
+        for result, count in (("hit", len(cached)), ("coalesced", len(in_flight)), ("miss", len(claimed))):
+            if count:
+                METRICS.count("session_cache_lookups", count, cache=self.name, result=result)
+        return cached, in_flight, claimed
+
+    def resolve(self, key: str, value: Optional[Any]) -> None:
+        """
+        hands the fetched value to the waiters and caches it, None (not found, failed) is handed over but not cached,
+        so it is fetched again next time
+        """
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+            if value is not None:
+                self.__store(key, value)
+        if future is not None:
+            future.set_result(value)
+
+    def fail(self, key: str, error: BaseException) -> None:
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future is not None:
+            future.set_exception(error)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Any:
+        cached, in_flight, claimed = self.claim((key,))
+        if key in cached:
+            return cached[key]
+        if key in in_flight:
+            return in_flight[key].result()
+        try:
+            value = fetch()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.resolve(key, value)
+        return value
+
+    def merge(self, values: Dict[str, Any], is_current: Callable[[Any, Any], bool]) -> Dict[str, Any]:
+        """
+        stores values fetched together (e.g. a page of CVEs), keeping the cached value of a key instead
+        when is_current(cached, fetched) says it is still up to date, and returns the values to use
+        """
+        merged, hits = {}, 0
+        with self._lock:
+            for key, value in values.items():
+                cached = self._values.get(key)
+                if cached is not None and is_current(cached, value):
+                    self._values.move_to_end(key)
+                    merged[key] = cached
+                    hits += 1
+                else:
+                    self.__store(key, value)
+                    merged[key] = value
+            self.hits += hits
+            self.misses += len(values) - hits
+        for result, count in (("hit", hits), ("miss", len(values) - hits)):
+            if count:
+                METRICS.count("session_cache_lookups", count, cache=self.name, result=result)
+        return merged
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cache": self.name, "entries": len(self._values), "max_entries": self.max_entries, "hits": self.hits,
+                    "coalesced": self.coalesced, "misses": self.misses, "evictions": self.evictions,
+                    "fetches_saved": self.hits + self.coalesced}
+
+    def __store(self, key: str, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_entries:
+            self._values.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,122 @@
+"""
+throughput of fetching thousands of GitHub repos through the thread pool of the default backend (with its default
+and with a hundred workers) against the asyncio client, called from a loop (by a single call, and by a task per repo)
+and through its sync facade (HTTP_BACKEND=asyncio, the way the Tk pages use it), all against a local stub server.
+exits with 1 when the modes do not resolve the same repos or the same NVD pages, the client itself is tested in
+tests/test_async_client.py
+
+usage: python -m benchmarks.bench_async_client [repos_count] [latency_seconds]
+"""
+import json
+import sys
+import time
+import asyncio
+from typing import Callable, Dict
+
+from apis.api_template import APITemplate
+from apis.github_api import GITHUB_API
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+from classes.repository import Repository
+
+RATE_LIMITED_REPOS = 300
+RATE_LIMIT = (50, 0.5) # a burst of 50, then 100 requests a second
+
+
+class StubGITHUB_API(GITHUB_API):
+    RATE_LIMIT = None
+    CACHE_TTL = 0
+    MAX_RETRIES = 0
+    REPOSITORIES = SessionCache("github_repositories", 0) # every mode fetches every repo
+
+    @classmethod
+    def get_api_key(cls):
+        return None
+
+
+class StubNVD_API(NVD_API):
+    RATE_LIMIT = None
+    CVES_CACHE_TTL = 0
+    CVES_PER_PAGE = NVD_API.CVES_PER_PAGE // 10
+    MAX_RETRIES = 0
+    CVES = SessionCache("nvd_cves", 0)
+
+    @classmethod
+    def get_api_key(cls):
+        return None
+
+    @classmethod
+    def get_mirror(cls):
+        return None
+
+
+def run_async(make_coroutine: Callable):
+    async def run_and_close():
+        try:
+            return await make_coroutine()
+        finally:
+            await APITemplate.close_async_sessions()
+    return asyncio.run(run_and_close())
+
+
+async def task_per_repo(repo_urls) -> Dict[str, Repository]:
+    repositories = await asyncio.gather(*(StubGITHUB_API.async_get_repository_details(repo_url) for repo_url in repo_urls))
+    return dict(zip(repo_urls, repositories))
+
+
+def main(repos_count: int = 2000, latency: float = 0.02) -> None:
+    repo_urls = [f"repos/owner{i}/exploit-{i}" for i in range(repos_count)]
+    vulnerabilities = make_vulnerabilities(5 * StubNVD_API.CVES_PER_PAGE) # 5 pages
+    routes = {
+        "/repos/": lambda path, query, body: json_response({"stargazers_count": len(path), "forks": len(path) % 7}),
+        "/cves/2.0": lambda path, query, body: json_response(nvd_page(vulnerabilities, "vulnerabilities", query)),
+    }
+
+    results, resolved = {}, {}
+    with StubServer(routes, latency=latency) as server:
+        StubGITHUB_API.BASE_URL = StubNVD_API.BASE_URL = server.base_url
+
+        def measure(mode: str, fetch: Callable[[], Dict[str, Repository]]) -> None:
+            requests_before, start = server.requests_count, time.perf_counter()
+            resolved[mode] = {url: (repository.stars_count, repository.forks_count) for url, repository in fetch().items()}
+            seconds = time.perf_counter() - start
+            results[mode] = {"requests": server.requests_count - requests_before, "seconds": round(seconds, 3),
+                             "requests_per_second": round((server.requests_count - requests_before) / seconds)}
+
+        measure("threads_default_workers", lambda: StubGITHUB_API.get_repositories_details(repo_urls))
+        StubGITHUB_API.MAX_WORKERS = StubGITHUB_API.POOL_SIZE = StubGITHUB_API.ASYNC_POOL_SIZE
+        StubGITHUB_API.close_sessions() # re-created with the bigger pool
+        measure(f"threads_{StubGITHUB_API.MAX_WORKERS}_workers", lambda: StubGITHUB_API.get_repositories_details(repo_urls))
+        measure("asyncio", lambda: run_async(lambda: StubGITHUB_API.async_get_repositories_details(repo_urls)))
+        measure("asyncio_task_per_repo", lambda: run_async(lambda: task_per_repo(repo_urls)))
+        StubGITHUB_API.HTTP_BACKEND = "asyncio"
+        measure("asyncio_sync_facade", lambda: StubGITHUB_API.get_repositories_details(repo_urls))
+
+        StubGITHUB_API.RATE_LIMIT = RATE_LIMIT
+        start = time.perf_counter()
+        run_async(lambda: task_per_repo(repo_urls[:RATE_LIMITED_REPOS // 2])) # the tasks and the facade's threads take from the same bucket
+        StubGITHUB_API.get_repositories_details(repo_urls[RATE_LIMITED_REPOS // 2:RATE_LIMITED_REPOS])
+        seconds = time.perf_counter() - start
+        results["rate_limited_mixed"] = {"requests": RATE_LIMITED_REPOS, "seconds": round(seconds, 3),
+                                         "expected_seconds": round((RATE_LIMITED_REPOS - RATE_LIMIT[0]) * RATE_LIMIT[1] / RATE_LIMIT[0], 3)}
+
+        StubNVD_API.HTTP_BACKEND = "threads"
+        threads_CVEs = StubNVD_API.get_vulnerabilities_by_cpe_and_severity(make_cpe_name(0))
+        asyncio_CVEs = run_async(lambda: StubNVD_API.async_get_vulnerabilities_by_cpe_and_severity(make_cpe_name(0)))
+        StubNVD_API.HTTP_BACKEND = "asyncio"
+        facade_CVEs = StubNVD_API.get_vulnerabilities_by_cpe_and_severity(make_cpe_name(0))
+        StubNVD_API.close_sessions()
+
+    mismatches = [mode for mode in resolved if resolved[mode] != resolved["threads_default_workers"] or len(resolved[mode]) != repos_count]
+    if not threads_CVEs == asyncio_CVEs == facade_CVEs or len(threads_CVEs) != len(vulnerabilities):
+        mismatches.append("nvd_cves")
+    print(json.dumps({"benchmark": "async_client", "repos": repos_count, "latency_seconds": latency, "results": results,
+                      "mismatches": mismatches}, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*(cast(argument) for cast, argument in zip((int, float), sys.argv[1:3])))
@@ -0,0 +1,77 @@
+"""
+time of the CVE table's local operations on tens of thousands of enriched CVEs: building the columnar store, sorting by
+every column (the first sort of a column and a cached one), filtering by severity and keyword (also typed out a keystroke
+at a time, as the table's filter does it), and the summary.
+exits with 1 when the timed views differ from sorting and filtering the CVE objects directly, the views and the
+summary are tested in tests/test_cve_table.py
+
+usage: python -m benchmarks.bench_cve_table [cves_count]
+"""
+import json
+import sys
+import time
+from random import Random
+from typing import Callable
+
+from apis.nvd_api import NVD_API
+from benchmarks.payloads import make_vulnerabilities
+from classes.cve import CVE
+from classes.cve_table import CVETable, SORT_COLUMNS
+from classes.repository import Repository
+
+TYPED_KEYWORD = "overflow"
+
+
+def make_CVEs(cves_count: int):
+    random = Random(0)
+    CVEs = NVD_API.parse_CVEs(vulnerability["cve"] for vulnerability in make_vulnerabilities(cves_count))
+    for cve in CVEs:
+        for url in cve.relevant_repositories_urls:
+            cve.add_relevant_repository(Repository(url[len("repos/"):], random.randrange(5000), random.randrange(500)), url)
+    return CVEs
+
+
+def measure_ms(operation: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    operation()
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def stars_count(cve: CVE) -> int:
+    return sum(repo.stars_count for repo in cve.relevant_repositories_list)
+
+
+def main(cves_count: int = 50000) -> None:
+    CVEs = make_CVEs(cves_count)
+    results = {"build": measure_ms(lambda: CVETable(CVEs))}
+    table = CVETable(CVEs)
+    for column in SORT_COLUMNS:
+        results[f"sort_{column}_first"] = measure_ms(lambda: table.view(sort_column=column, descending=True))
+        results[f"sort_{column}_cached"] = measure_ms(lambda: table.view(sort_column=column, descending=True))
+    results["filter_severity"] = measure_ms(lambda: table.view(min_severity=7.0, sort_column="severity", descending=True))
+    results["filter_keyword"] = measure_ms(lambda: table.view(keyword="remote code", sort_column="severity", descending=True))
+    results["filter_both_cached_words"] = measure_ms(lambda: table.view(min_severity=9.0, keyword="remote code", sort_column="severity", descending=True))
+    typed_table = CVETable(CVEs)
+    typing_ms = [measure_ms(lambda: typed_table.view(min_severity=7.0, keyword=TYPED_KEYWORD[:length]))
+                 for length in range(1, len(TYPED_KEYWORD) + 1)]
+    results["filter_keyword_typed_first_keystroke"] = typing_ms[0]
+    results["filter_keyword_typed_next_keystrokes_max"] = max(typing_ms[1:])
+    results["aggregates_all"] = measure_ms(lambda: table.aggregates())
+    high_rows = table.view(min_severity=7.0)
+    results["aggregates_filtered"] = measure_ms(lambda: table.aggregates(high_rows))
+
+    mismatches = {
+        "sort_by_stars": [table.CVEs[row].cve_id for row in table.view(sort_column="stars_count", descending=True)] !=
+                         [cve.cve_id for cve in sorted(CVEs, key=stars_count, reverse=True)],
+        "filter": [table.CVEs[row].cve_id for row in table.view(min_severity=7.0, keyword="Remote")] !=
+                  [cve.cve_id for cve in CVEs if cve.severity >= 7.0 and "remote" in (cve.cve_id + cve.description).lower()],
+        "max_stars": table.aggregates()["max_stars_count"] != max(map(stars_count, CVEs)),
+    }
+    print(json.dumps({"benchmark": "cve_table", "cves": len(CVEs), "results_ms": results,
+                      "severity_bands": table.aggregates()["severity_bands"], "mismatches": [name for name, failed in mismatches.items() if failed]}, indent=2))
+    if any(mismatches.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
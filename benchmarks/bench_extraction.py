@@ -0,0 +1,82 @@
+"""
+time per CVE of NVD_API.parse_CVEs against the character by character helpers it replaced (kept below as the baseline),
+on the same corpus of NVD shaped CVEs whose exploit links come in the shapes seen in real references
+(http, www., .git, deep links, gists). the links and descriptions it extracts are tested in tests/test_cve_parsing.py
+
+usage: python -m benchmarks.bench_extraction [cves_count]
+"""
+import json
+import sys
+import time
+from typing import List
+
+from apis.nvd_api import NVD_API
+from benchmarks.payloads import load_fixture, make_vulnerabilities
+from classes.cve import CVE
+
+URL_SHAPES = (
+    "https://github.com/{owner}/{repo}",
+    "http://github.com/{owner}/{repo}",
+    "https://www.github.com/{owner}/{repo}",
+    "https://github.com/{owner}/{repo}.git",
+    "https://github.com/{owner}/{repo}/blob/main/exploit.py",
+    "https://gist.github.com/{owner}/0123456789abcdef",
+)
+
+
+def legacy_parse_CVE(cve_details: dict) -> dict:
+    cve_details_to_return = {}
+    cve_details_to_return["cve_id"] = cve_details["id"]
+    cve_metrics = cve_details.get("metrics", {})
+    cve_version = next((version for version in ("cvssMetricV31", "cvssMetricV30", "cvssMetricV2") if version in cve_metrics), None)
+    cve_details_to_return["severity"] = cve_metrics[cve_version][0]["cvssData"]["baseScore"] if cve_version else 0
+    whole_description = list(filter(lambda x: x["lang"] == "en", cve_details["descriptions"]))[0]["value"]
+    cve_details_to_return["description"] = legacy_extract_first_sentence(whole_description)
+    cve_details_to_return["relevant_repositories_urls"] = list(set([legacy_slice_github_url(reference["url"]) for reference in cve_details["references"]
+                                                                   if "github" in reference["url"] and "tags" in reference and "Exploit" in reference["tags"]]))
+    return cve_details_to_return
+
+
+def legacy_extract_first_sentence(description: str) -> str:
+    for i in range(1, len(description) - 2):
+        if description[i] == "." and not description[i - 1].isnumeric() and description[i + 1] == " ":
+            return description[:i + 1]
+    return description[:min(len(description), 551)]
+
+
+def legacy_slice_github_url(url: str) -> str:
+    url_components = url[8:].split('/')[1:3]
+    url_components.insert(0, "repos")
+    return "/".join(url_components)
+
+
+def make_corpus(cves_count: int) -> List[dict]:
+    vulnerabilities = make_vulnerabilities(cves_count)
+    for index, vulnerability in enumerate(vulnerabilities):
+        for reference in vulnerability["cve"]["references"]:
+            if "Exploit" in reference["tags"]:
+                owner, repo = reference["url"].split("/")[3:5]
+                reference["url"] = URL_SHAPES[index % len(URL_SHAPES)].format(owner=owner, repo=repo)
+    return [vulnerability["cve"] for vulnerability in vulnerabilities] + [vulnerability["cve"] for vulnerability in load_fixture("nvd_cves_sample.json")["vulnerabilities"]]
+
+
+def measure(extract, corpus: List[dict]) -> dict:
+    extract(corpus)
+    start = time.perf_counter()
+    extract(corpus)
+    seconds = time.perf_counter() - start
+    return {"us_per_cve": round(seconds / len(corpus) * 1e6, 3), "seconds": round(seconds, 4)}
+
+
+def main(cves_count: int = 50000) -> None:
+    corpus = make_corpus(cves_count)
+    results = {
+        "legacy_helpers": measure(lambda cves_details: [legacy_parse_CVE(cve_details) for cve_details in cves_details], corpus),
+        "legacy_helpers_to_CVE": measure(lambda cves_details: [CVE(**legacy_parse_CVE(cve_details)) for cve_details in cves_details], corpus),
+        "batch_extractor": measure(NVD_API.parse_CVEs, corpus),
+    }
+    print(json.dumps({"benchmark": "extraction", "cves": len(corpus), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
@@ -0,0 +1,68 @@
+"""
+requests and time to resolve the repos of a large CVE set one REST call per repo against GraphQL batches,
+on a local stub of GitHub's REST and GraphQL endpoints, that both ways resolve the same repos is checked by
+tests/test_github_batching.py
+
+usage: python -m benchmarks.bench_github_batching [repos_count] [latency_seconds]
+"""
+import json
+import sys
+import time
+
+from apis.github_api import GITHUB_API
+from apis.session_cache import SessionCache
+from benchmarks.stub_server import StubServer, json_response
+
+MISSING_REPOS_EVERY = 50 # every 50th repo was deleted
+
+
+def repo_details(name: str):
+    index = int(name.rsplit("-", 1)[1])
+    return None if index % MISSING_REPOS_EVERY == 0 else {"stargazerCount": index * 3, "forkCount": index}
+
+
+def rest_route(path, query, body):
+    details = repo_details(path.rsplit("/", 1)[1])
+    if details is None:
+        return json_response({"message": "Not Found"}, status=404)
+    return json_response({"stargazers_count": details["stargazerCount"], "forks": details["forkCount"]})
+
+
+def graphql_route(path, query, body):
+    variables = json.loads(body)["variables"]
+    data, errors = {}, []
+    for i in range(len(variables) // 2):
+        data[f"r{i}"] = repo_details(variables[f"name{i}"])
+        if data[f"r{i}"] is None:
+            errors.append({"type": "NOT_FOUND", "path": [f"r{i}"], "message": "Could not resolve to a Repository"})
+    return json_response({"data": data, "errors": errors} if errors else {"data": data})
+
+
+def main(repos_count: int = 1000, latency: float = 0.02) -> None:
+    repo_urls = [f"repos/owner{i % 97}/exploit-{i}" for i in range(repos_count)]
+    results = {}
+    with StubServer({"/repos/": rest_route, "/graphql": graphql_route}, latency=latency) as server:
+        for mode, token in (("rest", None), ("graphql", "stub-token")):
+            class StubGITHUB_API(GITHUB_API):
+                BASE_URL = server.base_url
+                RATE_LIMIT = None
+                AUTHENTICATED_RATE_LIMIT = None
+                CACHE_TTL = 0
+                MAX_RETRIES = 0
+                REPOSITORIES = SessionCache("github_repositories", 0) # both modes fetch every repo
+
+                @classmethod
+                def get_api_key(cls):
+                    return token
+
+            requests_before = server.requests_count
+            start = time.perf_counter()
+            resolved = StubGITHUB_API.get_repositories_details(repo_urls)
+            seconds = time.perf_counter() - start
+            results[mode] = {"requests": server.requests_count - requests_before, "resolved": len(resolved), "seconds": round(seconds, 3)}
+        StubGITHUB_API.close_sessions()
+    print(json.dumps({"benchmark": "github_batching", "repos": repos_count, "latency_seconds": latency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*(cast(argument) for cast, argument in zip((int, float), sys.argv[1:3])))
@@ -0,0 +1,59 @@
+"""
+import time of the NVD mirror and the latency of keyword and CPE lookups answered from it, overall, per lookup and until
+their first page,
+on the recorded sample feed in benchmarks/fixtures plus a synthetic CPE dictionary and CVE set (all of whose CVEs
+apply to the same product, so the first CPE below matches every one of them)
+
+usage: python -m benchmarks.bench_nvd_mirror [cpes_count] [cves_count]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from apis.nvd_mirror import NVDMirror
+from benchmarks.payloads import FIXTURES_DIR, make_cpe_name, make_cpe_products, make_vulnerabilities
+
+
+def latencies_ms(lookup, arguments: list, rounds: int = 20) -> dict:
+    latencies = []
+    for _ in range(rounds):
+        for argument in arguments:
+            start = time.perf_counter()
+            lookup(argument)
+            latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {"p50_ms": round(latencies[len(latencies) // 2], 3), "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+            "max_ms": round(latencies[-1], 3)}
+
+
+def main(cpes_count: int = 100000, cves_count: int = 20000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        mirror = NVDMirror(os.path.join(directory, "mirror.sqlite3"))
+        start = time.perf_counter()
+        for fixture in ("nvd_cpes_sample.json", "nvd_cves_sample.json"):
+            mirror.import_feed_file(os.path.join(FIXTURES_DIR, fixture))
+        mirror.import_CPEs(make_cpe_products(cpes_count))
+        mirror.import_vulnerabilities(make_vulnerabilities(cves_count, make_cpe_name(0), repos_per_cve=1))
+        import_seconds = time.perf_counter() - start
+
+        keywords = ["apache", "http server 2.4", "log4j", "microsoft windows", "openssl 3.0", "Tomcat 5", "nonexistent"]
+        cpe_names = [make_cpe_name(0), "cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*", "cpe:2.3:a:apache:http_server:2.4.49:*:*:*:*:*:*:*"]
+        results = {
+            "import_seconds": round(import_seconds, 3),
+            "keyword_lookup": latencies_ms(mirror.search_CPEs, keywords),
+            "keyword_results": {keyword: {"results": len(mirror.search_CPEs(keyword)), **latencies_ms(mirror.search_CPEs, [keyword])}
+                                for keyword in keywords}, # the latency grows with the results, which are all returned
+            "keyword_first_page": latencies_ms(lambda keyword: next(mirror.iter_CPEs(keyword), None), keywords),
+            "cve_lookup_by_cpe": latencies_ms(mirror.get_vulnerabilities, cpe_names, rounds=3),
+            "cve_results": {cpe_name: {"results": len(mirror.get_vulnerabilities(cpe_name)), **latencies_ms(mirror.get_vulnerabilities, [cpe_name], rounds=5)}
+                            for cpe_name in cpe_names},
+            "cve_first_page_by_cpe": latencies_ms(lambda cpe_name: next(mirror.iter_vulnerabilities(cpe_name), None), cpe_names),
+        }
+        mirror.close()
+    print(json.dumps({"benchmark": "nvd_mirror", "cpes": cpes_count, "cves": cves_count, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:3]))
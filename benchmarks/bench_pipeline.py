@@ -0,0 +1,84 @@
+"""
+wall time of fetching and decoding a CPE's CVE pages in the calling thread against CVEPagePipeline with 1, 2, 4...
+processes up to the machine's cores, all against recorded pages served by a local stub server, with the speedup and
+the parallel efficiency over a single process. the pools are started (and their processes spawned) before timing,
+and it exits with 1 when a run does not give back the same CVEs
+
+usage: python -m benchmarks.bench_pipeline [cves_count] [repeats]
+"""
+import os
+import sys
+import json
+import time
+from typing import Callable, List
+
+from apis.cve_pipeline import CVEPagePipeline
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer
+from classes.cve import CVE
+
+
+class StubNVD_API(NVD_API):
+    RATE_LIMIT = None
+    CVES_CACHE_TTL = 0
+    MAX_RETRIES = 0
+    CVES = SessionCache("nvd_cves", 0) # every run builds its own CVEs
+
+    @classmethod
+    def get_api_key(cls):
+        return None
+
+    @classmethod
+    def get_mirror(cls):
+        return None
+
+
+def best_seconds(operation: Callable[[], List[CVE]], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    return round(min(timings), 3)
+
+
+def main(cves_count: int = 40000, repeats: int = 3) -> None:
+    vulnerabilities = make_vulnerabilities(cves_count)
+    recorded_pages = {str(start_index): json.dumps(nvd_page(vulnerabilities, "vulnerabilities", {"startIndex": start_index})).encode()
+                      for start_index in range(0, cves_count, NVD_API.CVES_PER_PAGE)} # encoded once, so serving a page costs no CPU
+    routes = {"/cves/2.0": lambda path, query, body: (200, {"Content-Type": "application/json"}, recorded_pages[query.get("startIndex", "0")])}
+    cpe_name = make_cpe_name(0)
+    cores = os.cpu_count() or 1
+    processes_counts = sorted({1, *(2 ** power for power in range(1, cores.bit_length()) if 2 ** power <= cores), cores})
+
+    results, mismatches = {}, []
+    with StubServer(routes) as server:
+        StubNVD_API.BASE_URL = server.base_url
+        expected = StubNVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name)
+        results["in_thread"] = {"seconds": best_seconds(lambda: StubNVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name), repeats)}
+        for processes in processes_counts:
+            start = time.perf_counter()
+            with CVEPagePipeline(processes, nvd_api=StubNVD_API) as pipeline:
+                CVEs = pipeline.get_vulnerabilities(cpe_name) # spawns the processes
+                startup_seconds = round(time.perf_counter() - start, 3)
+                seconds = best_seconds(lambda: pipeline.get_vulnerabilities(cpe_name), repeats)
+            if CVEs != expected:
+                mismatches.append(processes)
+            results[f"processes_{processes}"] = {"seconds": seconds, "first_run_seconds": startup_seconds}
+        StubNVD_API.close_sessions()
+
+    single_process_seconds = results["processes_1"]["seconds"]
+    for processes in processes_counts:
+        result = results[f"processes_{processes}"]
+        result["speedup"] = round(single_process_seconds / result["seconds"], 2)
+        result["efficiency"] = round(result["speedup"] / processes, 2)
+    print(json.dumps({"benchmark": "pipeline", "cves": cves_count, "pages": len(recorded_pages), "cpu_count": cores,
+                      "results": results, "mismatches": mismatches}, indent=2))
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:3]))
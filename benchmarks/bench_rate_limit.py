@@ -0,0 +1,73 @@
+"""
+time the token bucket and the retry/backoff of APITemplate.get take against a local server that answers 429
+(with Retry-After or X-RateLimit-Reset) before letting requests through. that they wait as long as the server asks and
+no longer is tested in tests/test_rate_limit.py
+
+usage: python -m benchmarks.bench_rate_limit
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apis.api_template import APITemplate, RateLimitError
+from benchmarks.stub_server import StubServer, json_response
+
+
+def flaky_route(failures_per_path: int, headers_factory):
+    attempts = {}
+    lock = threading.Lock()
+
+    def route(path, query, body):
+        with lock:
+            attempts[path] = attempts.get(path, 0) + 1
+            attempt = attempts[path]
+        if attempt <= failures_per_path:
+            return json_response({"message": "rate limited"}, status=429, headers=headers_factory())
+        return json_response({"ok": True})
+    return route
+
+
+def timed(request) -> dict:
+    start = time.perf_counter()
+    try:
+        request()
+        outcome = "ok"
+    except RateLimitError as e:
+        outcome = f"RateLimitError: {e}"
+    return {"seconds": round(time.perf_counter() - start, 3), "outcome": outcome}
+
+
+def main() -> None:
+    routes = {
+        "/retry-after/": flaky_route(2, lambda: {"Retry-After": "0.2"}),
+        "/ratelimit-reset/": flaky_route(1, lambda: {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 0.3)}),
+        "/no-headers/": flaky_route(2, lambda: {}),
+        "/always/": flaky_route(10 ** 6, lambda: {}),
+        "/ok/": json_response({"ok": True}),
+    }
+    with StubServer(routes) as server:
+        class StubAPI(APITemplate):
+            BASE_URL = server.base_url
+            BACKOFF_BASE = 0.05
+            MAX_RETRIES = 3
+
+        class LimitedStubAPI(StubAPI):
+            RATE_LIMIT = (5, 1)
+
+        results = {
+            "retry_after_then_ok": timed(lambda: StubAPI.get("retry-after/a")),
+            "ratelimit_reset_then_ok": timed(lambda: StubAPI.get("ratelimit-reset/a")),
+            "jittered_backoff_then_ok": timed(lambda: StubAPI.get("no-headers/a")),
+            "retries_exhausted": timed(lambda: StubAPI.get("always/a")),
+        }
+        requests_before = server.requests_count
+        with ThreadPoolExecutor(max_workers=10) as executor: # 20 requests through a 5 per second bucket take ~3 seconds
+            results["token_bucket_20_requests_at_5_per_second"] = timed(lambda: list(executor.map(lambda i: LimitedStubAPI.get(f"ok/{i}"), range(20))))
+        results["token_bucket_20_requests_at_5_per_second"]["requests"] = server.requests_count - requests_before
+        StubAPI.close_sessions()
+    print(json.dumps({"benchmark": "rate_limit", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
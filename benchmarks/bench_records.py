@@ -0,0 +1,50 @@
+"""
+construction time and allocated memory per record of the slotted CVE and Repository records,
+built directly (trusted) and through model_validate, against the pydantic models they replaced
+
+usage: python -m benchmarks.bench_records [records_count]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from classes.cve import CVE, CVEModel
+from classes.repository import Repository, RepositoryModel
+
+
+def measure(build, records: list) -> dict:
+    start = time.perf_counter()
+    build(records)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    built = build(records)
+    allocated = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del built
+    return {"us_per_record": round(seconds / len(records) * 1e6, 3), "bytes_per_record": round(allocated / len(records))}
+
+
+def main(records_count: int = 50000) -> None:
+    cve_records = [{"cve_id": f"CVE-2024-{i:06d}", "severity": (i % 100) / 10, "description": f"Description number {i}.",
+                    "relevant_repositories_urls": [f"repos/owner{i % 97}/exploit-{i}", f"repos/owner{i % 89}/poc-{i}"]}
+                   for i in range(records_count)]
+    repository_records = [{"name": f"exploit-{i}", "stars_count": i % 1000, "forks_count": i % 100} for i in range(records_count)]
+    results = {
+        "cve": {
+            "pydantic_model": measure(lambda records: [CVEModel(**record) for record in records], cve_records),
+            "slotted_trusted": measure(lambda records: [CVE(**record) for record in records], cve_records),
+            "slotted_validated": measure(lambda records: [CVE.model_validate(record) for record in records], cve_records),
+        },
+        "repository": {
+            "pydantic_model": measure(lambda records: [RepositoryModel(**record) for record in records], repository_records),
+            "slotted_trusted": measure(lambda records: [Repository(**record) for record in records], repository_records),
+            "slotted_validated": measure(lambda records: [Repository.model_validate(record) for record in records], repository_records),
+        },
+    }
+    print(json.dumps({"benchmark": "records", "records": records_count, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
@@ -0,0 +1,47 @@
+"""
+per-request latency of a bare requests.get (new connection every time) against the pooled
+keep-alive session behind APITemplate.get, both hitting a local stub server
+
+usage: python -m benchmarks.bench_session [requests_count]
+"""
+import json
+import statistics
+import sys
+import time
+
+import requests
+
+from apis.api_template import APITemplate
+from benchmarks.stub_server import StubServer, json_response
+
+
+def measure(request, count: int) -> dict:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        request()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+    }
+
+
+def main(count: int = 500) -> None:
+    with StubServer({"/repos/": json_response({"stargazers_count": 1, "forks": 1})}) as server:
+        class StubAPI(APITemplate):
+            BASE_URL = server.base_url
+
+        url = "repos/owner/name"
+        results = {
+            "bare_requests_get": measure(lambda: requests.get(f"{server.base_url}/{url}"), count),
+            "pooled_session": measure(lambda: StubAPI.get(url), count),
+        }
+        StubAPI.close_sessions()
+    print(json.dumps({"benchmark": "session", "requests": count, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
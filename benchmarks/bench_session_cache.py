@@ -0,0 +1,100 @@
+"""
+GitHub and NVD requests of searching sibling CPEs (versions of one product, sharing most of their CVEs and repos) and
+enriching their CVEs the way the CVE table does, with the session caches off and on, and of threads asking for the same
+repos at once, where only the thread that claims a repo requests it. that both ways enrich the CVEs the same, and that
+every thread gets every repo, is checked by tests/test_session_cache.py
+
+usage: python -m benchmarks.bench_session_cache [cpes_count] [cves_per_cpe] [latency_seconds]
+"""
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List
+
+from apis.github_api import GITHUB_API
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+
+SIBLINGS_OVERLAP = 0.8 # the share of a CPE's CVEs the next version also has
+CONCURRENT_THREADS = 8
+
+
+@contextmanager
+def session_caches(max_entries: Dict[SessionCache, int]):
+    saved = {cache: cache.max_entries for cache in max_entries}
+    for cache, cache_max_entries in max_entries.items():
+        cache.max_entries = cache_max_entries
+        cache.clear()
+    try:
+        yield
+    finally:
+        for cache, cache_max_entries in saved.items():
+            cache.max_entries = cache_max_entries
+            cache.clear()
+
+
+def search_and_enrich(cpe_names: List[str]) -> Dict[str, List[str]]:
+    """
+    like the CVE table, only the repos an earlier search did not add to the (shared) CVEs are asked from GitHub
+    """
+    enriched = {}
+    for cpe_name in cpe_names:
+        CVEs = NVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name)
+        repositories = GITHUB_API.get_repositories_details(url for cve in CVEs for url in cve.missing_repositories_urls)
+        for cve in CVEs:
+            for url in cve.missing_repositories_urls:
+                if url in repositories:
+                    cve.add_relevant_repository(repositories[url], url)
+        enriched[cpe_name] = sorted(f"{cve.cve_id} {cve.relevant_repositories}" for cve in CVEs)
+    return enriched
+
+
+def main(cpes_count: int = 8, cves_per_cpe: int = 300, latency: float = 0.005) -> None:
+    step = max(1, round(cves_per_cpe * (1 - SIBLINGS_OVERLAP)))
+    vulnerabilities = make_vulnerabilities(cves_per_cpe + step * (cpes_count - 1), repos_per_cve=2)
+    cpe_names = [make_cpe_name(i) for i in range(cpes_count)]
+    vulnerabilities_by_cpe = {cpe_name: vulnerabilities[i * step:i * step + cves_per_cpe] for i, cpe_name in enumerate(cpe_names)}
+    routes = {
+        "/cves/2.0": lambda path, query, body: json_response(nvd_page(vulnerabilities_by_cpe[query["cpeName"]], "vulnerabilities", query)),
+        "/repos/": lambda path, query, body: json_response({"stargazers_count": len(path), "forks": len(path) // 2}),
+    }
+    settings = {"BASE_URL": None, "RATE_LIMIT": None, "API_KEY_ENV": None, "CACHE_TTL": 0, "CVES_CACHE_TTL": 0, "MAX_RETRIES": 0}
+    saved = {api: {setting: getattr(api, setting) for setting in settings if hasattr(api, setting)} for api in (NVD_API, GITHUB_API)}
+    results = {}
+    with StubServer(routes, latency=latency) as server:
+        for api in (NVD_API, GITHUB_API):
+            for setting, value in settings.items():
+                if hasattr(api, setting):
+                    setattr(api, setting, server.base_url if setting == "BASE_URL" else value)
+        get_mirror = NVD_API.__dict__["get_mirror"]
+        NVD_API.get_mirror = classmethod(lambda cls: None)
+        try:
+            for mode, max_entries in (("off", 0), ("on", 50000)):
+                with session_caches({NVD_API.CVES: max_entries, GITHUB_API.REPOSITORIES: max_entries}):
+                    requests_before, start = server.requests_count, time.perf_counter()
+                    search_and_enrich(cpe_names)
+                    results[f"sibling_cpes_cache_{mode}"] = {"requests": server.requests_count - requests_before, "seconds": round(time.perf_counter() - start, 3),
+                                                             "caches": [NVD_API.CVES.stats(), GITHUB_API.REPOSITORIES.stats()]}
+
+            repo_urls = sorted({url for cve in NVD_API.parse_CVEs(vulnerability["cve"] for vulnerability in vulnerabilities) for url in cve.relevant_repositories_urls})
+            with session_caches({GITHUB_API.REPOSITORIES: 50000}):
+                requests_before, start = server.requests_count, time.perf_counter()
+                with ThreadPoolExecutor(max_workers=CONCURRENT_THREADS) as executor:
+                    list(executor.map(lambda _: GITHUB_API.get_repositories_details(repo_urls), range(CONCURRENT_THREADS)))
+                results["concurrent_threads"] = {"threads": CONCURRENT_THREADS, "repos": len(repo_urls), "requests": server.requests_count - requests_before,
+                                                 "seconds": round(time.perf_counter() - start, 3), "caches": [GITHUB_API.REPOSITORIES.stats()]}
+        finally:
+            NVD_API.get_mirror = get_mirror
+            for api, api_settings in saved.items():
+                for setting, value in api_settings.items():
+                    setattr(api, setting, value)
+            NVD_API.close_sessions()
+    print(json.dumps({"benchmark": "session_cache", "cpes": cpes_count, "cves_per_cpe": cves_per_cpe, "latency_seconds": latency, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*(cast(argument) for cast, argument in zip((int, int, float), sys.argv[1:4])))
@@ -0,0 +1,81 @@
+"""
+bytes transferred, requests and CVEs parsed when min_severity is only applied locally against when it is also sent
+to NVD as severity bands, on a stub server filtering a synthetic product history the way NVD does.
+that both ways keep the same CVEs is checked by tests/test_severity_filter.py
+
+usage: python -m benchmarks.bench_severity_filter [cves_count]
+"""
+import json
+import sys
+import time
+
+from apis.nvd_api import NVD_API
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer
+
+THRESHOLDS = (0, 4.0, 7.0, 9.0, 9.5)
+
+
+def severity_band(score: float, bands) -> str:
+    return next(severity for severity, max_score in bands if score <= max_score)
+
+
+def make_history(cves_count: int, cpe_name: str):
+    """
+    every 5th CVE only has a v2 score, like CVEs from before 2016, and every 11th is not scored yet
+    """
+    vulnerabilities = make_vulnerabilities(cves_count, cpe_name, repos_per_cve=1)
+    for index, vulnerability in enumerate(vulnerabilities):
+        metrics = vulnerability["cve"]["metrics"]
+        if index % 11 == 0:
+            metrics.clear()
+        elif index % 5 == 0:
+            del metrics["cvssMetricV31"]
+            metrics["cvssMetricV2"][0]["cvssData"]["baseScore"] = round((index * 7 % 100) / 10, 1)
+        else:
+            metrics["cvssMetricV2"][0]["cvssData"]["baseScore"] = round((index * 3 % 100) / 10, 1) # v2 and v3 disagree
+    return vulnerabilities
+
+
+def matches_query(vulnerability: dict, query: dict) -> bool:
+    metrics = vulnerability["cve"]["metrics"]
+    if "cvssV3Severity" in query:
+        return "cvssMetricV31" in metrics and query["cvssV3Severity"] == severity_band(metrics["cvssMetricV31"][0]["cvssData"]["baseScore"], NVD_API.CVSS_V3_SEVERITIES)
+    if "cvssV2Severity" in query:
+        return "cvssMetricV2" in metrics and query["cvssV2Severity"] == severity_band(metrics["cvssMetricV2"][0]["cvssData"]["baseScore"], NVD_API.CVSS_V2_SEVERITIES)
+    return True
+
+
+def main(cves_count: int = 6000) -> None:
+    cpe_name = make_cpe_name(0)
+    vulnerabilities = make_history(cves_count, cpe_name)
+    transferred = {"bytes": 0}
+
+    def route(path, query, body):
+        page = json.dumps(nvd_page([vulnerability for vulnerability in vulnerabilities if matches_query(vulnerability, query)], "vulnerabilities", query)).encode()
+        transferred["bytes"] += len(page)
+        return 200, {"Content-Type": "application/json"}, page
+
+    results = []
+    with StubServer({"/cves/2.0": route}) as server:
+        class StubNVD_API(NVD_API):
+            BASE_URL = server.base_url
+            RATE_LIMIT = None
+            CVES_CACHE_TTL = 0
+
+        for min_severity in THRESHOLDS:
+            transferred["bytes"], requests_before = 0, server.requests_count
+            start = time.perf_counter()
+            CVEs = StubNVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name, min_severity)
+            seconds = time.perf_counter() - start
+            results.append({"min_severity": min_severity, "cves": len(CVEs), "requests": server.requests_count - requests_before,
+                            "transferred_mb": round(transferred["bytes"] / 2 ** 20, 2), "whole_history_mb": None, "seconds": round(seconds, 3)})
+        whole_history_mb = results[0]["transferred_mb"]
+        for result in results:
+            result["whole_history_mb"] = whole_history_mb # what was transferred for every threshold before the filters were sent
+        StubNVD_API.close_sessions()
+    print(json.dumps({"benchmark": "severity_filter", "cves": cves_count, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
@@ -0,0 +1,52 @@
+"""
+size and time of exporting and importing tens of thousands of enriched CVEs as a snapshot, against the JSON of their
+model_dump (plain and gzipped) loaded back with CVE.model_validate.
+exits with 1 when the timed import did not give back the same CVEs, the format is tested in tests/test_snapshot.py
+
+usage: python -m benchmarks.bench_snapshot [cves_count]
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import tempfile
+from typing import Callable
+
+from benchmarks.bench_cve_table import make_CVEs
+from classes.cve import CVE
+from classes.snapshot import Snapshot
+
+
+def measure_seconds(operation: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    operation()
+    return round(time.perf_counter() - start, 3)
+
+
+def main(cves_count: int = 50000) -> None:
+    CVEs = make_CVEs(cves_count)
+    snapshot = Snapshot("cpe:2.3:a:vendor:product:1.0:*:*:*:*:*:*:*", CVEs=CVEs, min_severity=0.0)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name: os.path.join(directory, name) for name in ("snapshot.cvesnap", "cves.json", "cves.json.gz")}
+        dump_json = lambda open_file: json.dump([cve.model_dump() for cve in CVEs], open_file(), separators=(",", ":"))
+        load_json = lambda open_file: [CVE.model_validate(cve_details) for cve_details in json.load(open_file())]
+        results = {
+            "snapshot": {"export": measure_seconds(lambda: snapshot.dump(paths["snapshot.cvesnap"])),
+                         "import": measure_seconds(lambda: Snapshot.load(paths["snapshot.cvesnap"]))},
+            "json": {"export": measure_seconds(lambda: dump_json(lambda: open(paths["cves.json"], "w", encoding="utf-8"))),
+                     "import": measure_seconds(lambda: load_json(lambda: open(paths["cves.json"], encoding="utf-8")))},
+            "json_gzip": {"export": measure_seconds(lambda: dump_json(lambda: gzip.open(paths["cves.json.gz"], "wt", encoding="utf-8"))),
+                          "import": measure_seconds(lambda: load_json(lambda: gzip.open(paths["cves.json.gz"], "rt", encoding="utf-8")))},
+        }
+        for name, path in zip(results, paths.values()):
+            results[name]["bytes"] = os.path.getsize(path)
+        imported = Snapshot.load(paths["snapshot.cvesnap"])
+    round_trip_equal = imported.CVEs == CVEs and imported.title == snapshot.title
+    print(json.dumps({"benchmark": "snapshot", "cves": len(CVEs), "results_seconds": results, "round_trip_equal": round_trip_equal}, indent=2))
+    if not round_trip_equal:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
@@ -0,0 +1,64 @@
+"""
+time from a fresh interpreter to the app's module being imported, and to its first frame being drawn when a display is
+available, the median of several runs each in a new process. exits with 1 when a median is over its threshold,
+so a change pulling the network or model stacks back into the startup path is caught
+
+usage: python -m benchmarks.bench_startup [runs]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+IMPORT_THRESHOLD_MS = 100
+FIRST_PAINT_THRESHOLD_MS = 300
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE_STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+import tkinter as tk
+from cpe_search_page import MyApp
+imported = time.perf_counter()
+first_paint = None
+try:
+    root = tk.Tk()
+except tk.TclError: # no display
+    pass
+else:
+    MyApp(root)
+    root.update_idletasks()
+    root.update()
+    first_paint = (time.perf_counter() - start) * 1000
+    root.destroy()
+eager_modules = [module for module in ("requests", "pydantic", "apis.nvd_api", "apis.github_api", "cpe_list_page") if module in sys.modules]
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_paint_ms": first_paint, "eager_modules": eager_modules}))
+"""
+
+
+def measure_once() -> dict:
+    output = subprocess.run([sys.executable, "-c", MEASURE_STARTUP], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(runs: int = 7) -> None:
+    measurements = [measure_once() for _ in range(runs)]
+    first_paints = [measurement["first_paint_ms"] for measurement in measurements if measurement["first_paint_ms"] is not None]
+    results = {
+        "import_ms": round(statistics.median(measurement["import_ms"] for measurement in measurements), 1),
+        "first_paint_ms": round(statistics.median(first_paints), 1) if first_paints else None, # None without a display
+        "eager_modules": measurements[-1]["eager_modules"], # imported before the first frame, the prewarm comes after it
+    }
+    failures = []
+    if results["import_ms"] > IMPORT_THRESHOLD_MS:
+        failures.append(f"import took {results['import_ms']} ms, over the {IMPORT_THRESHOLD_MS} ms threshold")
+    if results["first_paint_ms"] is not None and results["first_paint_ms"] > FIRST_PAINT_THRESHOLD_MS:
+        failures.append(f"the first frame took {results['first_paint_ms']} ms, over the {FIRST_PAINT_THRESHOLD_MS} ms threshold")
+    print(json.dumps({"benchmark": "startup", "runs": runs, "results": results, "failures": failures}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
@@ -0,0 +1,59 @@
+"""
+peak memory and time of reading CVEs through whole-page .json() parsing against the incremental
+streaming path, on a large synthetic recording of NVD CVE pages served by a local stub server
+
+usage: python -m benchmarks.bench_streaming_json [cves_count]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer
+
+
+def measure(read_CVEs) -> dict:
+    start = time.perf_counter()
+    count = read_CVEs()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    read_CVEs()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cves": count, "seconds": round(seconds, 3), "peak_mb": round(peak / 2 ** 20, 2)}
+
+
+def main(cves_count: int = 6000) -> None:
+    cpe_name = make_cpe_name(0)
+    pages_bodies = {}
+    vulnerabilities = make_vulnerabilities(cves_count, cpe_name)
+
+    def route(path, query, body):
+        start_index = query.get("startIndex", "0")
+        if start_index not in pages_bodies: # the recording is serialized once, like a real recorded response
+            pages_bodies[start_index] = json.dumps(nvd_page(vulnerabilities, "vulnerabilities", query)).encode()
+        return 200, {"Content-Type": "application/json"}, pages_bodies[start_index]
+
+    with StubServer({"/cves/2.0": route}) as server:
+        class StubNVD_API(NVD_API):
+            BASE_URL = server.base_url
+            RATE_LIMIT = None
+            CVES_CACHE_TTL = 0
+            CVES = SessionCache("nvd_cves", 0) # otherwise every run after the warm up returns the CVEs it kept instead of its own
+
+        StubNVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name) # warms up the recording and the connections
+        page_mb = sum(len(body) for body in pages_bodies.values()) / 2 ** 20 / len(pages_bodies)
+        results = {
+            "whole_page_json": measure(lambda: len(StubNVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name))),
+            "streamed_collected": measure(lambda: len(list(StubNVD_API.iter_CVEs_streamed(cpe_name)))),
+            "streamed_consumed": measure(lambda: sum(1 for _ in StubNVD_API.iter_CVEs_streamed(cpe_name))),
+        }
+        StubNVD_API.close_sessions()
+    print(json.dumps({"benchmark": "streaming_json", "cves": cves_count, "page_mb": round(page_mb, 2), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:2]))
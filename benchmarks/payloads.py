@@ -0,0 +1,74 @@
+import json
+import os
+import random
+from typing import List
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+VENDORS = ["apache", "microsoft", "openssl", "oracle", "google", "mozilla", "cisco", "linux", "nginx", "redhat"]
+PRODUCTS = ["http_server", "log4j", "openssl", "mysql", "chrome", "firefox", "ios", "kernel", "nginx", "tomcat", "struts", "windows"]
+WORDS = ["buffer", "overflow", "remote", "attacker", "execute", "arbitrary", "code", "crafted", "request", "allows",
+         "denial", "service", "memory", "corruption", "authentication", "bypass", "injection", "via", "the", "in"]
+
+
+def load_fixture(name: str) -> dict:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as fixture_file:
+        return json.load(fixture_file)
+
+
+def make_cpe_name(index: int) -> str:
+    vendor = VENDORS[index % len(VENDORS)]
+    product = PRODUCTS[(index // len(VENDORS)) % len(PRODUCTS)]
+    return f"cpe:2.3:a:{vendor}:{product}:{index // 120}.{index % 10}.{index % 7}:*:*:*:*:*:*:*"
+
+
+def make_cpe_products(count: int) -> List[dict]:
+    products = []
+    for index in range(count):
+        cpe_name = make_cpe_name(index)
+        _, _, _, vendor, product, version = cpe_name.split(":")[:6]
+        products.append({"cpe": {"deprecated": False, "cpeName": cpe_name, "lastModified": "2024-01-01T00:00:00.000",
+                                 "titles": [{"title": f"{vendor.title()} {product.replace('_', ' ').title()} {version}", "lang": "en"}]}})
+    return products
+
+
+def make_vulnerabilities(count: int, cpe_name: str = make_cpe_name(0), repos_per_cve: int = 3, seed: int = 0) -> List[dict]:
+    """
+    NVD 2.0 shaped CVEs with full metrics and references, every CVE references repos_per_cve exploit repos
+    drawn from a pool smaller than the CVEs count, so repos repeat across CVEs like they do in real results
+    """
+    rand = random.Random(seed)
+    repos_pool = max(1, count // 2)
+    vulnerabilities = []
+    for index in range(count):
+        description = " ".join(rand.choice(WORDS) for _ in range(40)) + ". " + " ".join(rand.choice(WORDS) for _ in range(60)) + "."
+        references = [{"url": f"https://example.com/advisory/{index}/{i}", "source": "example", "tags": ["Vendor Advisory"]} for i in range(8)]
+        references += [{"url": f"https://github.com/owner{repo % 97}/exploit-{repo}", "source": "example", "tags": ["Exploit", "Third Party Advisory"]}
+                       for repo in (rand.randrange(repos_pool) for _ in range(repos_per_cve))]
+        score = round(rand.uniform(0, 10), 1)
+        vulnerabilities.append({"cve": {
+            "id": f"CVE-2024-{index:06d}", "sourceIdentifier": "cve@mitre.org", "published": "2024-01-01T00:00:00.000",
+            "lastModified": "2024-02-01T00:00:00.000", "vulnStatus": "Analyzed",
+            "descriptions": [{"lang": "es", "value": "Descripción."}, {"lang": "en", "value": description}],
+            "metrics": {"cvssMetricV31": [{"source": "nvd@nist.gov", "type": "Primary", "cvssData": {
+                "version": "3.1", "vectorString": "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H", "attackVector": "NETWORK",
+                "attackComplexity": "LOW", "privilegesRequired": "NONE", "userInteraction": "NONE", "scope": "UNCHANGED",
+                "confidentialityImpact": "HIGH", "integrityImpact": "HIGH", "availabilityImpact": "HIGH", "baseScore": score,
+                "baseSeverity": "CRITICAL"}, "exploitabilityScore": 3.9, "impactScore": 5.9}],
+                "cvssMetricV2": [{"source": "nvd@nist.gov", "type": "Primary", "cvssData": {"version": "2.0", "baseScore": score}}]},
+            "weaknesses": [{"source": "nvd@nist.gov", "type": "Primary", "description": [{"lang": "en", "value": "CWE-787"}]}],
+            "configurations": [{"nodes": [{"operator": "OR", "negate": False, "cpeMatch": [
+                {"vulnerable": True, "criteria": cpe_name, "matchCriteriaId": "00000000-0000-0000-0000-000000000000"}]}]}],
+            "references": references}})
+    return vulnerabilities
+
+
+def nvd_page(items: List[dict], items_key: str, query: dict) -> dict:
+    """
+    the page of items NVD would return for the startIndex and resultsPerPage of the query
+    """
+    start_index = int(query.get("startIndex", 0))
+    results_per_page = int(query.get("resultsPerPage", 2000))
+    page_items = items[start_index:start_index + results_per_page]
+    return {"resultsPerPage": len(page_items), "startIndex": start_index, "totalResults": len(items),
+            "format": "NVD_CVE" if items_key == "vulnerabilities" else "NVD_CPE", "version": "2.0",
+            "timestamp": "2024-06-01T00:00:00.000", items_key: page_items}
@@ -0,0 +1,209 @@
+"""
+the end to end benchmark suite: replays recorded NVD CPE and CVE pages and GitHub repo responses from a local stub server
+for small, medium and huge payloads, and times the CPE search, the CVE search, CVE construction, the enrichment
+and the CVE table's rendering (skipped without a display). the recordings are synthesized from a fixed seed and serialized
+once, so every run replays the same bytes.
+
+the results are printed as JSON (and written to --output), --compare reports the ratio of every timing to a previous run's
+and exits with 1 when one is slower than --max-regression times its baseline
+
+usage: python -m benchmarks.run_all [--sizes small medium huge] [--repeats 5] [--output results.json] [--compare baseline.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from apis.github_api import GITHUB_API
+from apis.nvd_api import NVD_API
+from benchmarks.payloads import make_cpe_name, make_cpe_products, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+from classes.cve import CVE
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = {
+    "small": {"cpes": 50, "cves": 20, "repos_per_cve": 1},
+    "medium": {"cpes": 2000, "cves": 500, "repos_per_cve": 2},
+    "huge": {"cpes": 30000, "cves": 6000, "repos_per_cve": 3},
+}
+MIN_COMPARED_SECONDS = 0.005 # shorter timings are too noisy to flag as regressions
+
+
+class Recording:
+    """
+    the responses of one payload size, every page is serialized the first time it is requested and replayed after that
+    """
+    def __init__(self, cpes_count: int, cves_count: int, repos_per_cve: int):
+        self.cpe_name = make_cpe_name(0)
+        self.products = make_cpe_products(cpes_count)
+        self.vulnerabilities = make_vulnerabilities(cves_count, self.cpe_name, repos_per_cve)
+        self._bodies: Dict[str, bytes] = {}
+
+    def routes(self) -> dict:
+        return {
+            "/cpes/2.0": lambda path, query, body: self.__page("products", self.products, query),
+            "/cves/2.0": lambda path, query, body: self.__page("vulnerabilities", self.vulnerabilities, query),
+            "/repos/": lambda path, query, body: json_response({"stargazers_count": len(path), "forks": len(path) // 2}),
+        }
+
+    def __page(self, items_key: str, items: List[dict], query: dict):
+        key = f'{items_key}:{query.get("startIndex", "0")}:{query.get("resultsPerPage")}'
+        if key not in self._bodies:
+            self._bodies[key] = json.dumps(nvd_page(items, items_key, query)).encode()
+        return 200, {"Content-Type": "application/json"}, self._bodies[key]
+
+
+@contextmanager
+def pointed_at(server: StubServer):
+    """
+    points the APIs at the stub server, without rate limits, caching (on disk or for the session), retries or API keys for
+    the duration of the block, so a token in the environment does not change the way repos are fetched between runs
+    """
+    settings = ("BASE_URL", "RATE_LIMIT", "AUTHENTICATED_RATE_LIMIT", "API_KEY_ENV", "CACHE_TTL", "CPES_CACHE_TTL", "CVES_CACHE_TTL", "MAX_RETRIES", "MIRROR")
+    saved = {api: {setting: api.__dict__[setting] for setting in settings if setting in api.__dict__} for api in (NVD_API, GITHUB_API)}
+    for api in (NVD_API, GITHUB_API):
+        api.BASE_URL = server.base_url
+        api.RATE_LIMIT = api.AUTHENTICATED_RATE_LIMIT = api.API_KEY_ENV = None
+        api.CACHE_TTL = api.MAX_RETRIES = 0
+    NVD_API.CPES_CACHE_TTL = NVD_API.CVES_CACHE_TTL = 0
+    NVD_API.MIRROR = None
+    session_caches = {cache: cache.max_entries for cache in (NVD_API.CVES, GITHUB_API.REPOSITORIES)}
+    for cache in session_caches:
+        cache.max_entries = 0
+        cache.clear()
+    get_mirror = NVD_API.__dict__["get_mirror"]
+    NVD_API.get_mirror = classmethod(lambda cls: None) # an NVD_MIRROR_PATH in the environment must not answer instead of the stub
+    try:
+        yield
+    finally:
+        NVD_API.get_mirror = get_mirror
+        for cache, max_entries in session_caches.items():
+            cache.max_entries = max_entries
+        for api, api_settings in saved.items():
+            for setting in settings:
+                if setting in api_settings:
+                    setattr(api, setting, api_settings[setting])
+                elif setting in api.__dict__:
+                    delattr(api, setting)
+        NVD_API.close_sessions()
+
+
+def measure(run: Callable[[], int], repeats: int) -> dict:
+    """
+    run returns how many items it handled, the first run warms up the connections and the recording
+    """
+    items = run()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {"median_seconds": round(median, 5), "min_seconds": round(min(timings), 5), "items": items,
+            "items_per_second": round(items / median, 1) if median else None}
+
+
+def measure_table_render(CVEs: List[CVE], repeats: int) -> dict:
+    """
+    opening the CVE table and scrolling it through, with a real (hidden) Tk window, so it needs a display
+    """
+    import tkinter as tk
+    from results_table_page import SearchResultsTablePage
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {"skipped": f"no display ({e})"}
+    root.geometry("+-10000+-10000") # drawn out of sight
+    root.update()
+
+    def open_and_scroll() -> int:
+        table_page = SearchResultsTablePage(root, "benchmark", CVEs)
+        table_page.top.update_idletasks()
+        for first_row in range(0, len(CVEs), max(1, len(CVEs) // 100)):
+            table_page._scroll_to(first_row)
+        table_page.top.update_idletasks()
+        table_page._on_closing()
+        return len(CVEs)
+
+    try:
+        return measure(open_and_scroll, repeats)
+    finally:
+        root.destroy()
+
+
+def run_size(size: str, repeats: int) -> dict:
+    recording = Recording(SIZES[size]["cpes"], SIZES[size]["cves"], SIZES[size]["repos_per_cve"])
+    results = {}
+    with StubServer(recording.routes()) as server, pointed_at(server):
+        results["cpes_by_keyword"] = measure(lambda: len(NVD_API.get_CPEs_by_keyword("benchmark")), repeats)
+        results["cves_by_cpe"] = measure(lambda: len(NVD_API.get_vulnerabilities_by_cpe_and_severity(recording.cpe_name)), repeats)
+        results["cve_construction"] = measure(lambda: len([NVD_API.parse_CVE(vulnerability["cve"]) for vulnerability in recording.vulnerabilities]), repeats)
+        CVEs = NVD_API.get_vulnerabilities_by_cpe_and_severity(recording.cpe_name)
+        results["cve_validation"] = measure(lambda: len([CVE.model_validate(cve.model_dump()) for cve in CVEs]), repeats)
+        results["enrichment"] = measure(lambda: CVE.set_relevant_repositories_for_CVEs(CVEs) or len(CVEs), repeats)
+        results["cves_end_to_end"] = measure(lambda: len(enriched_CVEs(recording.cpe_name)), repeats)
+        results["table_render"] = measure_table_render(CVEs, repeats)
+    return results
+
+
+def enriched_CVEs(cpe_name: str) -> List[CVE]:
+    CVEs = NVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name)
+    CVE.set_relevant_repositories_for_CVEs(CVEs)
+    return CVEs
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    regressions = []
+    for size, benchmarks in results["results"].items():
+        for name, result in benchmarks.items():
+            baseline_result = baseline.get("results", {}).get(size, {}).get(name, {})
+            if "median_seconds" not in result or not baseline_result.get("median_seconds"):
+                continue
+            ratio = result["median_seconds"] / baseline_result["median_seconds"]
+            result["baseline_ratio"] = round(ratio, 3)
+            if ratio > max_regression and max(result["median_seconds"], baseline_result["median_seconds"]) >= MIN_COMPARED_SECONDS:
+                regressions.append(f"{size}/{name} took {ratio:.2f}x its baseline")
+    return regressions
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(arguments: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Runs the end to end benchmark suite against recorded responses")
+    parser.add_argument("--sizes", nargs="+", choices=tuple(SIZES), default=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--compare", help="a previous run's results to compare to")
+    parser.add_argument("--max-regression", type=float, default=1.25)
+    parsed_arguments = parser.parse_args(arguments)
+
+    results = {"benchmark": "suite", "commit": current_commit(), "python": platform.python_version(), "repeats": parsed_arguments.repeats,
+               "sizes": {size: SIZES[size] for size in parsed_arguments.sizes},
+               "results": {size: run_size(size, parsed_arguments.repeats) for size in parsed_arguments.sizes}}
+    regressions = []
+    if parsed_arguments.compare:
+        with open(parsed_arguments.compare, encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), parsed_arguments.max_regression)
+        results["regressions"] = regressions
+    output = json.dumps(results, indent=2)
+    print(output)
+    if parsed_arguments.output:
+        with open(parsed_arguments.output, "w", encoding="utf-8") as output_file:
+            output_file.write(output + "\n")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
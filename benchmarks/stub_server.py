@@ -0,0 +1,83 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+StubResponse = Tuple[int, Dict[str, str], bytes]
+Route = Union[StubResponse, Callable[[str, Dict[str, str], bytes], StubResponse]]
+
+
+def json_response(payload, status: int = 200, headers: Optional[Dict[str, str]] = None) -> StubResponse:
+    return status, {"Content-Type": "application/json", **(headers or {})}, json.dumps(payload).encode()
+
+
+class BacklogHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 1024 # the asyncio client opens up to a hundred connections at once, above the default backlog of 5
+
+
+class StubServer:
+    """
+    a local keep-alive HTTP/1.1 server replaying canned responses, routes are matched by path prefix
+    and can be either a fixed (status, headers, body) tuple or a callable of (path, query, body)
+    """
+    def __init__(self, routes: Dict[str, Route], latency: float = 0.0):
+        self.routes = routes
+        self.latency = latency
+        self.requests_count = 0
+        self._lock = threading.Lock()
+        self._server = BacklogHTTPServer(("127.0.0.1", 0), self.__make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, path: str, body: bytes) -> StubResponse:
+        with self._lock:
+            self.requests_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        split = urlsplit(path)
+        query = {key: values[0] for key, values in parse_qs(split.query).items()}
+        for prefix in sorted(self.routes, key=len, reverse=True):
+            if split.path.startswith(prefix):
+                route = self.routes[prefix]
+                return route(split.path, query, body) if callable(route) else route
+        return json_response({"message": "Not Found"}, status=404)
+
+    def __make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                status, headers, body = stub._respond(self.path, self.rfile.read(length) if length else b"")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *_):
+                pass
+
+        return Handler
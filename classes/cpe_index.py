@@ -0,0 +1,148 @@
+import re
+import heapq
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_SEPARATOR = re.compile(r'[^0-9a-z.]+')
+CPE_NAME_PATTERN = re.compile(r'^(.*) \((cpe:[^()]*)\)$')
+
+EXACT_MATCH_SCORE = 3.0
+PREFIX_MATCH_SCORE = 2.0
+INFIX_MATCH_SCORE = 1.5
+CPE_COMPONENT_BONUS = 1.0 # a vendor or product match is worth more than a word somewhere in the title
+MIN_FUZZY_SIMILARITY = 0.4
+
+
+class CPEIndex:
+    """
+    an in-memory inverted index over the "title (cpeName)" strings returned by NVD_API.get_CPEs_by_keyword,
+    indexing the title words and the vendor, product and version of the CPE name for prefix, infix and fuzzy (trigram) lookups
+    """
+    def __init__(self):
+        self._cpes: List[str] = []
+        self._cpe_ids: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        self._component_postings: Dict[str, Set[int]] = {} # the CPEs in which the token is (part of) the vendor or product
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._sorted_tokens: List[str] = []
+        self._sorted_tokens_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._cpes)
+
+    def add(self, cpes: Iterable[str]) -> None:
+        for cpe in cpes:
+            if cpe in self._cpe_ids:
+                continue
+            cpe_id = len(self._cpes)
+            self._cpes.append(cpe)
+            self._cpe_ids[cpe] = cpe_id
+            title_tokens, component_tokens = CPEIndex.__tokenize_cpe(cpe)
+            for token in component_tokens:
+                self._component_postings.setdefault(token, set()).add(cpe_id)
+            for token in title_tokens | component_tokens:
+                if token not in self._postings:
+                    self._postings[token] = set()
+                    for trigram in CPEIndex.__trigrams(token):
+                        self._trigrams.setdefault(trigram, set()).add(token)
+                    self._sorted_tokens_dirty = True
+                self._postings[token].add(cpe_id)
+
+    def search(self, keyword: str, limit: Optional[int] = None) -> List[str]:
+        """
+        returns the CPEs matching every word of the keyword, best matches first
+        """
+        scores = self.__score(keyword, candidates=None)
+        rank_key = lambda cpe_id: (-scores[cpe_id], len(self._cpes[cpe_id]), cpe_id)
+        ranked_ids = sorted(scores, key=rank_key) if limit is None else heapq.nsmallest(limit, scores, key=rank_key)
+        return [self._cpes[cpe_id] for cpe_id in ranked_ids]
+
+    def rank(self, keyword: str, cpes: List[str]) -> List[str]:
+        """
+        orders CPEs (e.g. fresh NVD results) by how well they match the keyword, keeping the ones the index cannot match at the end
+        """
+        self.add(cpes)
+        scores = self.__score(keyword, candidates={self._cpe_ids[cpe] for cpe in cpes})
+        return sorted(cpes, key=lambda cpe: -scores.get(self._cpe_ids[cpe], 0.0)) # a stable sort keeps NVD's order among equals
+
+    def __score(self, keyword: str, candidates: Optional[Set[int]]) -> Dict[int, float]:
+        scores: Optional[Dict[int, float]] = None
+        for word in filter(None, TOKEN_SEPARATOR.split(keyword.lower())):
+            word_scores = self.__score_word(word, candidates)
+            scores = word_scores if scores is None else {cpe_id: score + word_scores[cpe_id] for cpe_id, score in scores.items() if cpe_id in word_scores}
+            if not scores:
+                break
+            candidates = set(scores) # the next words only need to be looked up among the CPEs matching so far
+        return scores or {}
+
+    def __score_word(self, word: str, candidates: Optional[Set[int]]) -> Dict[int, float]:
+        matches: List[Tuple[str, float]] = [(word, EXACT_MATCH_SCORE)] if word in self._postings else []
+        matches += [(token, PREFIX_MATCH_SCORE) for token in self.__tokens_with_prefix(word) if token != word]
+        matches += [(token, INFIX_MATCH_SCORE) for token in self.__tokens_containing(word) if not token.startswith(word)]
+        if not matches:
+            matches = self.__similar_tokens(word)
+        scored_cpe_ids: Dict[float, Set[int]] = {} # the postings of all the tokens matching with the same score are merged first
+        for token, score in matches:
+            scored_cpe_ids.setdefault(score, set()).update(self._postings[token])
+            scored_cpe_ids.setdefault(score + CPE_COMPONENT_BONUS, set()).update(self._component_postings.get(token, ()))
+        word_scores: Dict[int, float] = {}
+        for score in sorted(scored_cpe_ids): # the best score of every CPE is written last
+            cpe_ids = scored_cpe_ids[score]
+            word_scores.update(dict.fromkeys(cpe_ids if candidates is None else cpe_ids & candidates, score))
+        return word_scores
+
+    def __tokens_with_prefix(self, prefix: str) -> List[str]:
+        if self._sorted_tokens_dirty:
+            self._sorted_tokens = sorted(self._postings)
+            self._sorted_tokens_dirty = False
+        tokens = []
+        for i in range(bisect_left(self._sorted_tokens, prefix), len(self._sorted_tokens)):
+            if not self._sorted_tokens[i].startswith(prefix):
+                break
+            tokens.append(self._sorted_tokens[i])
+        return tokens
+
+    def __tokens_containing(self, word: str) -> List[str]:
+        """
+        like NVD's keywordSearch a word may also match inside a token, found through the tokens sharing all its trigrams
+        """
+        if len(word) < 3:
+            return [token for token in self._postings if word in token]
+        word_trigrams = sorted((self._trigrams.get(word[i:i + 3], set()) for i in range(len(word) - 2)), key=len)
+        return [token for token in word_trigrams[0].intersection(*word_trigrams[1:]) if word in token]
+
+    def __similar_tokens(self, word: str) -> List[Tuple[str, float]]:
+        """
+        tokens sharing enough trigrams with the word, scored by their Jaccard similarity, to tolerate typos
+        """
+        word_trigrams = CPEIndex.__trigrams(word)
+        shared_counts: Dict[str, int] = {}
+        for trigram in word_trigrams:
+            for token in self._trigrams.get(trigram, ()):
+                shared_counts[token] = shared_counts.get(token, 0) + 1
+        similar_tokens = []
+        for token, shared_count in shared_counts.items():
+            similarity = shared_count / (len(word_trigrams) + len(CPEIndex.__trigrams(token)) - shared_count)
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                similar_tokens.append((token, similarity))
+        return similar_tokens
+
+    @staticmethod
+    def __tokenize_cpe(cpe: str) -> Tuple[Set[str], Set[str]]:
+        match = CPE_NAME_PATTERN.match(cpe)
+        title, cpe_name = (match.group(1), match.group(2)) if match else (cpe, "")
+        title_tokens = set(filter(None, TOKEN_SEPARATOR.split(title.lower())))
+        component_tokens = set()
+        components = cpe_name.lower().split(":")
+        if len(components) > 5:
+            for component in components[3:5]: # vendor and product
+                component_tokens.add(component)
+                component_tokens.update(filter(None, TOKEN_SEPARATOR.split(component)))
+            if components[5] not in ("*", "-"):
+                title_tokens.add(components[5]) # the version
+        return title_tokens, component_tokens
+
+    @staticmethod
+    def __trigrams(token: str) -> Set[str]:
+        padded = f" {token} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
@@ -1,21 +1,101 @@
-from typing import List
-from functools import reduce
+from typing import Dict, FrozenSet, Iterable, List, Sequence
 from pydantic import BaseModel
 
 from apis.github_api import GITHUB_API, Repository
+from classes.repository import RepositoryModel
+from instrumentation import METRICS
 
 
-class CVE(BaseModel):
+class CVEModel(BaseModel): # validates CVE details coming from outside, see CVE.model_validate
     cve_id: str
     severity: float
     description: str
     relevant_repositories_urls: List[str] = []
-    relevant_repositories_list: List[Repository] = []
-    relevant_repositories: str = ""
+    relevant_repositories_list: List[RepositoryModel] = []
+
+
+class CVE:
+    """
+    a slotted record, so tens of thousands of CVEs stay cheap to build and hold,
+    constructing it directly skips validation and is meant for details we parsed ourselves.
+    enriched_repositories_urls are the urls whose repos are in relevant_repositories_list, the others (failed, skipped or
+    left by a cancelled search) are still to be fetched, it is bookkeeping and not part of the record's fields
+    """
+    FIELDS = ("cve_id", "severity", "description", "relevant_repositories_urls", "relevant_repositories_list")
+    __slots__ = (*FIELDS, "enriched_repositories_urls")
+
+    def __init__(self, cve_id: str, severity: float, description: str,
+                 relevant_repositories_urls: Iterable[str] = (), relevant_repositories_list: Iterable[Repository] = ()):
+        self.cve_id = cve_id
+        self.severity = severity
+        self.description = description
+        self.relevant_repositories_urls: Sequence[str] = tuple(relevant_repositories_urls)
+        self.relevant_repositories_list: Sequence[Repository] = tuple(relevant_repositories_list)
+        self.enriched_repositories_urls: FrozenSet[str] = frozenset()
+
+    @classmethod
+    @METRICS.timed("model_validate", keep_recent=False, model="CVE")
+    def model_validate(cls, data: dict) -> "CVE":
+        validated = CVEModel.model_validate(data)
+        return cls(validated.cve_id, validated.severity, validated.description, validated.relevant_repositories_urls,
+                   [Repository(repo.name, repo.stars_count, repo.forks_count) for repo in validated.relevant_repositories_list])
+
+    @property
+    def relevant_repositories(self) -> str: # built only when displayed
+        return "\n".join(str(repo) for repo in self.relevant_repositories_list)
+
+    def model_dump(self) -> dict:
+        return {
+            "cve_id": self.cve_id,
+            "severity": self.severity,
+            "description": self.description,
+            "relevant_repositories_urls": list(self.relevant_repositories_urls),
+            "relevant_repositories_list": [repo.model_dump() for repo in self.relevant_repositories_list],
+            "relevant_repositories": self.relevant_repositories,
+        }
+
+    def __repr__(self) -> str:
+        return f"CVE(cve_id={self.cve_id!r}, severity={self.severity}, description={self.description!r}, " \
+               f"relevant_repositories_urls={list(self.relevant_repositories_urls)!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CVE):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in CVE.FIELDS)
     
+    @METRICS.timed("cve_enrichment")
     def set_relevant_repositories(self) -> None:
         if len(self.relevant_repositories_urls) > 0:
-            self.relevant_repositories_list = [GITHUB_API.get_repository_details(url) for url in self.relevant_repositories_urls]
-            self.relevant_repositories_list.sort()
-            repositories_details = [str(repo) for repo in self.relevant_repositories_list]
-            self.relevant_repositories = reduce(lambda a, b: a + '\n' + b, repositories_details)
\ No newline at end of file
+            self.set_repositories({url: GITHUB_API.get_repository_details(url) for url in self.relevant_repositories_urls})
+
+    @property
+    def missing_repositories_urls(self) -> List[str]:
+        return [url for url in self.relevant_repositories_urls if url not in self.enriched_repositories_urls]
+
+    def add_relevant_repository(self, repository: Repository, repo_url: str) -> None:
+        """
+        adds the repo of repo_url, unless an earlier search already added it
+        """
+        if repo_url in self.enriched_repositories_urls:
+            return
+        self.relevant_repositories_list = tuple(sorted((*self.relevant_repositories_list, repository)))
+        self.enriched_repositories_urls |= {repo_url}
+
+    def set_repositories(self, repositories: Dict[str, Repository]) -> None:
+        """
+        replaces the repos with the ones fetched for the CVE's urls, the urls missing from repositories are left to fetch
+        """
+        fetched_urls = [url for url in self.relevant_repositories_urls if url in repositories]
+        self.relevant_repositories_list = tuple(sorted(repositories[url] for url in fetched_urls))
+        self.enriched_repositories_urls = frozenset(fetched_urls)
+
+    @staticmethod
+    @METRICS.timed("cve_enrichment")
+    def set_relevant_repositories_for_CVEs(CVEs: List["CVE"]) -> None:
+        """
+        enriches all the given CVEs at once, every repo is requested only once even if several CVEs reference it
+        """
+        repositories = GITHUB_API.get_repositories_details(url for cve in CVEs for url in cve.relevant_repositories_urls)
+        for cve in CVEs:
+            if any(url in repositories for url in cve.relevant_repositories_urls):
+                cve.set_repositories(repositories)
@@ -0,0 +1,160 @@
+from array import array
+from bisect import bisect_left
+from itertools import compress, repeat
+from operator import attrgetter, mul
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from classes.cve import CVE
+
+# the CVSS v3 qualitative ratings by the highest score of each, a score of 0 means the CVE is not scored yet
+SEVERITY_BANDS: Tuple[Tuple[str, float], ...] = (("NONE", 0.0), ("LOW", 3.9), ("MEDIUM", 6.9), ("HIGH", 8.9), ("CRITICAL", 10.0))
+# the band of every score in tenths, for bytes.translate, scores above the last band's are counted in it
+SEVERITY_BAND_OF_TENTHS = bytes(bisect_left([round(max_score * 10) for _, max_score in SEVERITY_BANDS], tenths, hi=len(SEVERITY_BANDS) - 1)
+                                for tenths in range(256))
+SORT_COLUMNS = ("cve_id", "severity", "description", "stars_count", "forks_count")
+KEYWORD_MATCHES_CACHE_SIZE = 32
+
+
+class CVETable:
+    """
+    the fetched CVEs kept column by column (id, score, description and the star and fork totals of their repos),
+    so sorting, filtering and aggregating tens of thousands of them are passes over flat columns instead of attribute
+    lookups on every CVE. a view is a list of row indices, the ascending and descending order of every column is
+    sorted once and kept until the column changes.
+
+    filters are masks with a byte per row: the scores are also kept in tenths (CVSS scores have one decimal) so the
+    severity mask and the severity bands come from bytes.translate, and the masks are combined as integers,
+    which keeps the per row work in C
+    """
+    def __init__(self, CVEs: Iterable[CVE] = ()):
+        self.CVEs: List[CVE] = []
+        self.cve_ids: List[str] = []
+        self.severities = array("d")
+        self.descriptions: List[str] = []
+        self.stars_counts = array("q")
+        self.forks_counts = array("q")
+        self._severities_tenths = bytearray()
+        self._search_texts: List[str] = [] # the lowered id, description and repo names of every row, for keyword filtering
+        self._rows_by_cve_id: Dict[str, int] = {}
+        self._sort_orders: Dict[Tuple[str, bool], List[int]] = {}
+        self._keyword_matches: Dict[str, bytes] = {} # the rows' mask of recently filtered words
+        self.extend(CVEs)
+
+    def __len__(self) -> int:
+        return len(self.CVEs)
+
+    def extend(self, CVEs: Iterable[CVE]) -> None:
+        CVEs = list(CVEs)
+        first_row = len(self.CVEs)
+        self.CVEs.extend(CVEs)
+        self.cve_ids.extend(map(attrgetter("cve_id"), CVEs))
+        self.severities.extend(map(attrgetter("severity"), CVEs))
+        self.descriptions.extend(map(attrgetter("description"), CVEs))
+        self.stars_counts.extend(map(CVETable.__stars_count, CVEs))
+        self.forks_counts.extend(map(CVETable.__forks_count, CVEs))
+        self._severities_tenths.extend(min(255, max(0, round(severity * 10))) for severity in self.severities[first_row:])
+        self._search_texts.extend(map(CVETable.__search_text, CVEs))
+        self._rows_by_cve_id.update(zip(self.cve_ids[first_row:], range(first_row, len(self.CVEs))))
+        self._sort_orders.clear()
+        self._keyword_matches.clear()
+
+    def update_repositories(self, CVEs: Iterable[CVE]) -> None:
+        """
+        re-reads the repo totals and names of CVEs enriched in place since they were added
+        """
+        for cve in CVEs:
+            row = self._rows_by_cve_id.get(cve.cve_id)
+            if row is None:
+                continue
+            self.stars_counts[row] = CVETable.__stars_count(cve)
+            self.forks_counts[row] = CVETable.__forks_count(cve)
+            self._search_texts[row] = CVETable.__search_text(cve)
+        for sort_key in [sort_key for sort_key in self._sort_orders if sort_key[0] in ("stars_count", "forks_count")]:
+            del self._sort_orders[sort_key]
+        self._keyword_matches.clear()
+
+    def view(self, min_severity: float = 0.0, keyword: str = "", sort_column: Optional[str] = None, descending: bool = False) -> List[int]:
+        """
+        the rows scoring at least min_severity and containing every word of the keyword, in the order of sort_column
+        (ties keep the order the CVEs were added in) or in that order when there is none
+        """
+        rows: Sequence[int] = self.__sort_order(sort_column, descending) if sort_column else range(len(self.CVEs))
+        masks = [self.__keyword_matches(word) for word in keyword.lower().split()]
+        if min_severity > 0:
+            masks.append(self._severities_tenths.translate(bytes(tenths / 10 >= min_severity for tenths in range(256))))
+        if not masks:
+            return list(rows)
+        keep = masks[0]
+        if len(masks) > 1: # the bytes are 0 or 1, so anding the masks as integers ands every row's bytes
+            keep = CVETable.__bytes_and(masks)
+        return list(compress(rows, keep)) if isinstance(rows, range) else list(compress(rows, map(keep.__getitem__, rows)))
+
+    def aggregates(self, rows: Optional[Sequence[int]] = None) -> dict:
+        """
+        the number of CVEs in every severity band and the highest score and repo star total, of the given rows or of all of them
+        """
+        if rows is None:
+            severities_tenths, stars_counts = self._severities_tenths, self.stars_counts
+        else:
+            severities_tenths, stars_counts = bytes(map(self._severities_tenths.__getitem__, rows)), map(self.stars_counts.__getitem__, rows)
+        bands = severities_tenths.translate(SEVERITY_BAND_OF_TENTHS)
+        return {
+            "count": len(severities_tenths),
+            "severity_bands": {band: bands.count(band_index) for band_index, (band, _) in enumerate(SEVERITY_BANDS)},
+            "max_severity": max(severities_tenths) / 10 if severities_tenths else None,
+            "max_stars_count": max(stars_counts, default=None),
+        }
+
+    def __keyword_matches(self, word: str) -> bytes:
+        """
+        a row can only contain the word if it contains every part of it, so while a word is typed out
+        only the rows matching the word before the last keystroke are searched
+        """
+        matches = self._keyword_matches.get(word)
+        if matches is not None:
+            return matches
+        search_texts = self._search_texts
+        narrower_matches = next((matches for cached_word, matches in reversed(self._keyword_matches.items()) if cached_word in word), None)
+        if narrower_matches is not None:
+            search_texts = map(mul, search_texts, narrower_matches) # the other rows' texts become "" (text * 0), searched for free
+        matches = bytes(map(str.__contains__, search_texts, repeat(word)))
+        if len(self._keyword_matches) >= KEYWORD_MATCHES_CACHE_SIZE:
+            del self._keyword_matches[next(iter(self._keyword_matches))]
+        self._keyword_matches[word] = matches
+        return matches
+
+    def __sort_order(self, column: str, descending: bool) -> List[int]:
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"Can not sort by {column}, the columns are {', '.join(SORT_COLUMNS)}")
+        sort_order = self._sort_orders.get((column, descending))
+        if sort_order is None:
+            sort_order = self._sort_orders[(column, descending)] = sorted(range(len(self.CVEs)), key=self.__sort_key(column), reverse=descending)
+        return sort_order
+
+    def __sort_key(self, column: str) -> Callable[[int], object]:
+        if column == "cve_id": # by year and then number, so CVE-2021-9999 comes before CVE-2021-10000
+            cve_id_keys = [(cve_id[:8], len(cve_id), cve_id) for cve_id in self.cve_ids]
+            return cve_id_keys.__getitem__
+        if column == "description":
+            lowered_descriptions = [description.lower() for description in self.descriptions]
+            return lowered_descriptions.__getitem__
+        return {"severity": self.severities, "stars_count": self.stars_counts, "forks_count": self.forks_counts}[column].__getitem__
+
+    @staticmethod
+    def __bytes_and(masks: List[bytes]) -> bytes:
+        anded = int.from_bytes(masks[0], "little")
+        for mask in masks[1:]:
+            anded &= int.from_bytes(mask, "little")
+        return anded.to_bytes(len(masks[0]), "little")
+
+    @staticmethod
+    def __stars_count(cve: CVE) -> int:
+        return sum(repo.stars_count for repo in cve.relevant_repositories_list)
+
+    @staticmethod
+    def __forks_count(cve: CVE) -> int:
+        return sum(repo.forks_count for repo in cve.relevant_repositories_list)
+
+    @staticmethod
+    def __search_text(cve: CVE) -> str:
+        return "\n".join((cve.cve_id, cve.description, *(repo.name for repo in cve.relevant_repositories_list))).lower()
@@ -1,13 +1,41 @@
 from pydantic import BaseModel
 
+from instrumentation import METRICS
 
-class Repository(BaseModel):
+
+class RepositoryModel(BaseModel): # validates repository details coming from outside, see Repository.model_validate
     name: str
     stars_count: int
     forks_count: int
+
+
+class Repository:
+    __slots__ = ("name", "stars_count", "forks_count")
+
+    def __init__(self, name: str, stars_count: int, forks_count: int): # trusted construction, without validation
+        self.name = name
+        self.stars_count = stars_count
+        self.forks_count = forks_count
+
+    @classmethod
+    @METRICS.timed("model_validate", keep_recent=False, model="Repository")
+    def model_validate(cls, data: dict) -> "Repository":
+        validated = RepositoryModel.model_validate(data)
+        return cls(validated.name, validated.stars_count, validated.forks_count)
+
+    def model_dump(self) -> dict:
+        return {"name": self.name, "stars_count": self.stars_count, "forks_count": self.forks_count}
         
     def __str__(self) -> str:
         return f"• {self.name} (stars_count: {self.stars_count}, forks: {self.forks_count})"
+
+    def __repr__(self) -> str:
+        return f"Repository(name={self.name!r}, stars_count={self.stars_count}, forks_count={self.forks_count})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Repository):
+            return NotImplemented
+        return (self.name, self.stars_count, self.forks_count) == (other.name, other.stars_count, other.forks_count)
     
     def __lt__(self, other: "Repository") -> bool: # in order to be able to sort
         if self.stars_count < other.stars_count:
@@ -0,0 +1,226 @@
+import gc
+import sys
+import json
+import mmap
+import zlib
+import struct
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from classes.cve import CVE
+from classes.repository import Repository
+
+MAGIC = b"CVESNAP\0"
+VERSION = 1 # bumped whenever the sections or their encoding change, older readers refuse newer snapshots
+HEADER = struct.Struct("<8sHH") # magic, version, sections count
+SECTION_ENTRY = struct.Struct("<24sQQQI") # name, offset, stored length, raw length, crc32 of the stored bytes
+COMPRESSION_LEVEL = 6
+MAX_COMPRESSION_RATIO = 1032 # the most deflate can shrink its input, a larger raw length is corrupted
+FILE_EXTENSION = ".cvesnap"
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@contextmanager
+def gc_paused():
+    """
+    building tens of thousands of CVEs and repos triggers a collection every few hundred allocations, each one
+    walking the objects built so far, while those records can not form reference cycles
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class Snapshot:
+    """
+    search results saved to a file to be reopened (or shared) without any network call: the CPEs a keyword returned
+    and/or the enriched CVEs of a CPE, each of which may be empty
+    """
+    __slots__ = ("title", "cpes", "CVEs", "min_severity", "created_at")
+
+    def __init__(self, title: str, cpes: Iterable[str] = (), CVEs: Iterable[CVE] = (), min_severity: float = 0.0, created_at: Optional[str] = None):
+        self.title = title
+        self.cpes: List[str] = list(cpes)
+        self.CVEs: List[CVE] = list(CVEs)
+        self.min_severity = min_severity
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+    def __repr__(self) -> str:
+        return f"Snapshot(title={self.title!r}, cpes={len(self.cpes)}, CVEs={len(self.CVEs)}, created_at={self.created_at!r})"
+
+    def dump(self, path: str) -> int:
+        """
+        writes the snapshot and returns its size in bytes
+        """
+        sections = SnapshotWriter.sections(self)
+        with open(path, "wb") as snapshot_file:
+            snapshot_file.write(SnapshotWriter.encode(sections))
+            return snapshot_file.tell()
+
+    @classmethod
+    def load(cls, path: str) -> "Snapshot":
+        with open(path, "rb") as snapshot_file:
+            try:
+                mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: # an empty file can not be mapped
+                raise SnapshotError(f"{path} is not a snapshot")
+        with mapped:
+            return SnapshotReader(mapped, path).snapshot()
+
+
+class SnapshotWriter:
+    """
+    a snapshot is a header, a directory of sections and the sections, every section compressed on its own.
+    the CVEs are stored column by column, numbers as little endian arrays and strings as the lengths of every string
+    and their concatenated text, repos are stored once and referenced by index from the CVEs
+    """
+    @staticmethod
+    def sections(snapshot: Snapshot) -> Dict[str, bytes]:
+        CVEs = snapshot.CVEs
+        repositories: Dict[Tuple[str, int, int], int] = {}
+        repositories_indices = array("I")
+        for cve in CVEs:
+            repositories_indices.extend(repositories.setdefault((repo.name, repo.stars_count, repo.forks_count), len(repositories))
+                                        for repo in cve.relevant_repositories_list)
+        meta = {"title": snapshot.title, "min_severity": snapshot.min_severity, "created_at": snapshot.created_at,
+                "cpes_count": len(snapshot.cpes), "cves_count": len(CVEs), "repositories_count": len(repositories)}
+        sections = {"meta": json.dumps(meta).encode("utf-8")}
+        sections.update(SnapshotWriter.__strings("cpes", snapshot.cpes))
+        sections.update(SnapshotWriter.__strings("cve_ids", [cve.cve_id for cve in CVEs]))
+        sections["severities"] = SnapshotWriter.__array("d", [cve.severity for cve in CVEs])
+        sections.update(SnapshotWriter.__strings("descriptions", [cve.description for cve in CVEs]))
+        sections["urls_counts"] = SnapshotWriter.__array("I", [len(cve.relevant_repositories_urls) for cve in CVEs])
+        sections.update(SnapshotWriter.__strings("urls", [url for cve in CVEs for url in cve.relevant_repositories_urls]))
+        sections["repos_counts"] = SnapshotWriter.__array("I", [len(cve.relevant_repositories_list) for cve in CVEs])
+        sections["repos"] = SnapshotWriter.__array("I", repositories_indices)
+        sections.update(SnapshotWriter.__strings("repo_names", [name for name, _, _ in repositories]))
+        sections["repo_stars"] = SnapshotWriter.__array("q", [stars_count for _, stars_count, _ in repositories])
+        sections["repo_forks"] = SnapshotWriter.__array("q", [forks_count for _, _, forks_count in repositories])
+        return sections
+
+    @staticmethod
+    def encode(sections: Dict[str, bytes]) -> bytes:
+        stored_sections = [(name, zlib.compress(raw, COMPRESSION_LEVEL), len(raw)) for name, raw in sections.items()]
+        offset = HEADER.size + SECTION_ENTRY.size * len(stored_sections)
+        directory = []
+        for name, stored, raw_length in stored_sections:
+            directory.append(SECTION_ENTRY.pack(name.encode("ascii"), offset, len(stored), raw_length, zlib.crc32(stored)))
+            offset += len(stored)
+        return b"".join((HEADER.pack(MAGIC, VERSION, len(stored_sections)), *directory, *(stored for _, stored, _ in stored_sections)))
+
+    @staticmethod
+    def __strings(name: str, strings: Sequence[str]) -> Dict[str, bytes]:
+        return {f"{name}.lengths": SnapshotWriter.__array("I", map(len, strings)), f"{name}.text": "".join(strings).encode("utf-8")}
+
+    @staticmethod
+    def __array(typecode: str, values: Iterable) -> bytes:
+        values = array(typecode, values)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values.tobytes()
+
+
+class SnapshotReader:
+    """
+    reads a mapped snapshot, only the directory is parsed up front and every section is decompressed straight from the mapping,
+    a truncated or corrupted file raises SnapshotError whichever part of it is damaged
+    """
+    def __init__(self, mapped: mmap.mmap, path: str = "snapshot"):
+        self._mapped = mapped
+        self._path = path
+        if len(mapped) < HEADER.size:
+            raise SnapshotError(f"{path} is not a snapshot")
+        magic, version, sections_count = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        if version > VERSION:
+            raise SnapshotError(f"{path} is a version {version} snapshot, this version reads up to version {VERSION}")
+        if len(mapped) < HEADER.size + sections_count * SECTION_ENTRY.size:
+            raise SnapshotError(f"{path} is truncated")
+        self.version = version
+        self._directory: Dict[str, Tuple[int, int, int, int]] = {}
+        for i in range(sections_count):
+            name, *entry = SECTION_ENTRY.unpack_from(mapped, HEADER.size + i * SECTION_ENTRY.size)
+            try:
+                self._directory[name.rstrip(b"\0").decode("ascii")] = tuple(entry)
+            except UnicodeDecodeError:
+                raise SnapshotError(f"The directory of {path} is corrupted")
+
+    def snapshot(self) -> Snapshot:
+        try:
+            meta = json.loads(self.__section("meta"))
+            title, min_severity, created_at, cves_count = meta["title"], meta["min_severity"], meta["created_at"], meta["cves_count"]
+        except (ValueError, TypeError, KeyError):
+            raise SnapshotError(f"The meta section of {self._path} is corrupted")
+        snapshot = Snapshot(title, self.__strings("cpes"), min_severity=min_severity, created_at=created_at)
+        with gc_paused():
+            repositories = list(map(Repository, self.__strings("repo_names"), self.__array("q", "repo_stars"), self.__array("q", "repo_forks")))
+            try:
+                CVEs_repositories = list(map(repositories.__getitem__, self.__array("I", "repos")))
+            except IndexError:
+                raise SnapshotError(f"The repos section of {self._path} is corrupted")
+            CVEs = list(map(CVE, self.__strings("cve_ids"), self.__array("d", "severities"), self.__strings("descriptions"),
+                            SnapshotReader.__groups(self.__strings("urls"), self.__array("I", "urls_counts")),
+                            SnapshotReader.__groups(CVEs_repositories, self.__array("I", "repos_counts"))))
+        if len(CVEs) != cves_count:
+            raise SnapshotError(f"{self._path} is truncated, it has {len(CVEs)} of its {cves_count} CVEs")
+        snapshot.CVEs = CVEs
+        return snapshot
+
+    def __section(self, name: str) -> bytes:
+        entry = self._directory.get(name)
+        if entry is None:
+            raise SnapshotError(f"{self._path} has no {name} section")
+        offset, stored_length, raw_length, crc = entry
+        if offset + stored_length > len(self._mapped):
+            raise SnapshotError(f"{self._path} is truncated")
+        if raw_length > stored_length * MAX_COMPRESSION_RATIO: # checked before its buffer is allocated
+            raise SnapshotError(f"The {name} section of {self._path} is corrupted")
+        with memoryview(self._mapped) as mapped, mapped[offset:offset + stored_length] as stored: # released before the mapping is closed
+            if zlib.crc32(stored) != crc:
+                raise SnapshotError(f"The {name} section of {self._path} is corrupted")
+            try:
+                raw = zlib.decompress(stored, bufsize=max(raw_length, 1))
+            except zlib.error:
+                raise SnapshotError(f"The {name} section of {self._path} is corrupted")
+        if len(raw) != raw_length:
+            raise SnapshotError(f"The {name} section of {self._path} is corrupted")
+        return raw
+
+    def __array(self, typecode: str, name: str) -> array:
+        values = array(typecode)
+        try:
+            values.frombytes(self.__section(name))
+        except ValueError: # not a whole number of values
+            raise SnapshotError(f"The {name} section of {self._path} is corrupted")
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def __strings(self, name: str) -> List[str]:
+        try:
+            text = self.__section(f"{name}.text").decode("utf-8")
+        except UnicodeDecodeError:
+            raise SnapshotError(f"The {name}.text section of {self._path} is corrupted")
+        lengths = self.__array("I", f"{name}.lengths")
+        if sum(lengths) != len(text):
+            raise SnapshotError(f"The {name} sections of {self._path} do not match")
+        return SnapshotReader.__groups(text, lengths)
+
+    @staticmethod
+    def __groups(values: Sequence, lengths: Sequence[int]) -> list:
+        """
+        splits values into consecutive slices of the given lengths, with the slicing done in C since there is one per CVE
+        """
+        ends = list(accumulate(lengths))
+        return list(map(values.__getitem__, map(slice, [0, *ends], ends)))
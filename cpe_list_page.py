@@ -1,8 +1,12 @@
 import tkinter as tk
 from tkinter import ttk
+from tkinter import filedialog
 from tkinter import messagebox
 
+from apis.github_api import GITHUB_API
 from apis.nvd_api import NVD_API
+from classes.snapshot import FILE_EXTENSION, Snapshot
+from instrumentation import METRICS
 from results_table_page import SearchResultsTablePage
 
 class ScrollableFrame(ttk.Frame):
@@ -48,9 +52,12 @@ class ScrollableFrame(ttk.Frame):
 
 
 class SearchResultsPage:
-    def __init__(self, master, query, results):
+    def __init__(self, master, query, results, task_runner):
         self.master = master
+        self.task_runner = task_runner
+        self._cves_search_group = f"cves_search_{id(self)}"
         self.top = tk.Toplevel(master)
+        self.query = query
         self.top.title(f"Results for: {query}")
         self.top.geometry("600x500")
         self.top.transient(master)
@@ -62,12 +69,14 @@ class SearchResultsPage:
         self.current_page = 0
         self._active_inline_dropdown_frames = {}
         self._current_dropdown_button = None
+        self._rows_pool = []
 
 
         self.top.grid_rowconfigure(0, weight=0)  
         self.top.grid_rowconfigure(1, weight=1)
         self.top.grid_rowconfigure(2, weight=0)
         self.top.grid_rowconfigure(3, weight=0)
+        self.top.grid_rowconfigure(4, weight=0)
         self.top.grid_columnconfigure(0, weight=1)
 
 
@@ -79,6 +88,7 @@ class SearchResultsPage:
 
         self.results_scroll_frame.viewport.grid_columnconfigure(0, weight=1)
         self.results_scroll_frame.viewport.grid_columnconfigure(1, weight=0)
+        self._no_results_label = ttk.Label(self.results_scroll_frame.viewport, text="No results found for this keyword.", font=("Arial", 12, "italic"))
 
 
         self.pagination_frame = ttk.Frame(self.top)
@@ -94,8 +104,17 @@ class SearchResultsPage:
         self.next_button.pack(side=tk.LEFT, padx=5)
 
 
-        close_button = ttk.Button(self.top, text="Close", command=self._on_closing)
-        close_button.grid(row=3, column=0, pady=10)
+        self.search_status_frame = ttk.Frame(self.top)
+        self.search_status_frame.grid(row=3, column=0)
+        self.search_status_label = ttk.Label(self.search_status_frame, text="", font=("Arial", 10, "italic"))
+        self.search_status_label.pack(side=tk.LEFT, padx=5)
+        self.cancel_search_button = ttk.Button(self.search_status_frame, text="Cancel", command=self._cancel_CVEs_search, state=tk.DISABLED)
+        self.cancel_search_button.pack(side=tk.LEFT, padx=5)
+
+        buttons_frame = ttk.Frame(self.top)
+        buttons_frame.grid(row=4, column=0, pady=10)
+        ttk.Button(buttons_frame, text="Export Snapshot", command=self._export_snapshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Close", command=self._on_closing).pack(side=tk.LEFT, padx=5)
         
         self.top.update_idletasks()
         x = self.master.winfo_x() + (self.master.winfo_width() // 2) - (self.top.winfo_width() // 2)
@@ -105,11 +124,54 @@ class SearchResultsPage:
         self._display_results()
 
     def _clear_results_display(self):
-        for widget in self.results_scroll_frame.viewport.winfo_children():
-            widget.destroy()
+        for row in self._rows_pool:
+            row["container"].grid_remove()
+            row["dropdown"]["frame"].grid_remove()
+        self._no_results_label.grid_remove()
         self._active_inline_dropdown_frames = {}
         self._current_dropdown_button = None
 
+    def _create_row(self, row_index):
+        """
+        the widgets of a row are created once and re-bound to another result on every page turn
+        """
+        row = {"item": None}
+        row_container_frame = ttk.Frame(self.results_scroll_frame.viewport, relief="groove", borderwidth=1, padding=(5,5,5,5))
+        row_container_frame.grid_columnconfigure(0, weight=1)
+        row_container_frame.grid_columnconfigure(1, weight=0)
+        result_label = ttk.Label(row_container_frame, wraplength=450, justify=tk.LEFT, font=("Arial", 10))
+        result_label.grid(row=0, column=0, sticky="nw")
+
+        arrow_button = ttk.Button(row_container_frame, text="▶", width=3)
+        arrow_button.grid(row=0, column=1, padx=(5,0), sticky="e")
+        arrow_button.config(command=lambda: self._toggle_inline_dropdown(row_container_frame, row["item"], arrow_button))
+
+        inline_dropdown_frame = ttk.Frame(self.results_scroll_frame.viewport, padding=(10, 5, 10, 5), relief="raised", borderwidth=1)
+        ttk.Label(inline_dropdown_frame, text="Enter minimum CVSS score to filter by:").grid(row=0, column=0, padx=5, pady=2, sticky="w")
+        entry_var = tk.StringVar()
+        number_entry = ttk.Entry(inline_dropdown_frame, textvariable=entry_var, width=15)
+        number_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
+        inline_dropdown_frame.grid_columnconfigure(1, weight=1)
+
+        process_button = ttk.Button(inline_dropdown_frame, text="Search for vulnerabilities",
+                                    command=lambda: self._search_for_CVEs(entry_var.get(), row["item"][row["item"].index('(') + 1: -1]))
+        process_button.grid(row=0, column=2, padx=5, pady=2, sticky="e")
+
+        row.update({
+            "container": row_container_frame,
+            "label": result_label,
+            "entry_var": entry_var,
+            "dropdown": {
+                "frame": inline_dropdown_frame,
+                "button": arrow_button,
+                "visible": False,
+                "number_entry_ref": number_entry
+            }
+        })
+        row_container_frame.grid(row=row_index*2, column=0, pady=5, sticky="ew", columnspan=2) # Occupies 2 columns for label and button
+        return row
+
+    @METRICS.timed("cpe_list_render")
     def _display_results(self):
         self._clear_results_display()
 
@@ -120,46 +182,19 @@ class SearchResultsPage:
 
         if results_to_display:
             for i, item in enumerate(results_to_display):
+                if i == len(self._rows_pool):
+                    self._rows_pool.append(self._create_row(i))
+                row = self._rows_pool[i]
                 serial_number = start_index + i + 1 
-                display_text = f"{serial_number}. {item}"
-
-                row_container_frame = ttk.Frame(self.results_scroll_frame.viewport, relief="groove", borderwidth=1, padding=(5,5,5,5))
-                row_container_frame.grid(row=i*2, column=0, pady=5, sticky="ew", columnspan=2) # Occupies 2 columns for label and button
-                row_container_frame.grid_columnconfigure(0, weight=1)
-                row_container_frame.grid_columnconfigure(1, weight=0)
-                result_label = ttk.Label(row_container_frame, text=display_text, wraplength=450, justify=tk.LEFT,
-                                         font=("Arial", 10))
-                result_label.grid(row=0, column=0, sticky="nw")
-                
-                arrow_button = ttk.Button(row_container_frame, text="▶", width=3,
-                                          command=lambda rcf=row_container_frame, rt=item, btn=None: self._toggle_inline_dropdown(rcf, rt, btn))
-                arrow_button.grid(row=0, column=1, padx=(5,0), sticky="e")
-                arrow_button.config(command=lambda rcf=row_container_frame, rt=item, btn=arrow_button: self._toggle_inline_dropdown(rcf, rt, btn))
-
-
-                inline_dropdown_frame = ttk.Frame(self.results_scroll_frame.viewport, padding=(10, 5, 10, 5), relief="raised", borderwidth=1)
-                self._active_inline_dropdown_frames[item] = {
-                    "frame": inline_dropdown_frame,
-                    "button": arrow_button,
-                    "visible": False
-                }
-
-                ttk.Label(inline_dropdown_frame, text="Enter minimum CVSS score to filter by:").grid(row=0, column=0, padx=5, pady=2, sticky="w")
-                entry_var = tk.StringVar()
-                number_entry = ttk.Entry(inline_dropdown_frame, textvariable=entry_var, width=15)
-                number_entry.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
-                inline_dropdown_frame.grid_columnconfigure(1, weight=1)
-
-                process_button = ttk.Button(inline_dropdown_frame, text="Search for vulnerabilities",
-                                            command=lambda num_val=entry_var, res_text=item: self._search_for_CVEs(num_val.get(), res_text[res_text.index('(') + 1: -1])) # Modified
-                process_button.grid(row=0, column=2, padx=5, pady=2, sticky="e")
-                
-                self._active_inline_dropdown_frames[item]["number_entry_ref"] = number_entry
-
-
+                row["item"] = item
+                row["label"].config(text=f"{serial_number}. {item}")
+                row["entry_var"].set("")
+                row["dropdown"]["button"].config(text="▶")
+                row["dropdown"]["visible"] = False
+                row["container"].grid()
+                self._active_inline_dropdown_frames[item] = row["dropdown"]
         else:
-            no_results_label = ttk.Label(self.results_scroll_frame.viewport, text="No results found for this keyword.", font=("Arial", 12, "italic"))
-            no_results_label.grid(row=0, column=0, pady=20)
+            self._no_results_label.grid(row=0, column=0, pady=20)
             
         self._update_pagination_buttons()
 
@@ -229,14 +264,6 @@ class SearchResultsPage:
     def _search_for_CVEs(self, entered_number_str, result_text_context):
         try:
             entered_number = float(entered_number_str) if entered_number_str != "" else 0
-            CVEs = NVD_API.get_vulnerabilities_by_cpe_and_severity(result_text_context, entered_number)
-            for cve in CVEs:
-                cve.set_relevant_repositories()
-                            
-            SearchResultsTablePage(self.top, f"{result_text_context} (Minimum Severity: {entered_number})", map(lambda cve: cve.model_dump(), CVEs))
-            
-            self._close_all_inline_dropdowns()
-            
         except ValueError as e:
             messagebox.showerror("Invalid Input", f"Error occured while searching for CVEs: {e}")
             if self._current_dropdown_button:
@@ -247,7 +274,83 @@ class SearchResultsPage:
                 )
                 if current_result_text:
                     self._active_inline_dropdown_frames[current_result_text]["number_entry_ref"].focus_set()
+            return
+
+        self.search_status_label.config(text=f"Searching for CVEs of {result_text_context}...")
+        self.cancel_search_button.config(state=tk.NORMAL)
+        table_page = SearchResultsTablePage(self.top, f"{result_text_context} (Minimum Severity: {entered_number})", loading=True,
+                                            on_close=self._on_table_closed, min_severity=entered_number, task_runner=self.task_runner)
+        CVEs_by_repo_url = {}
+        self.task_runner.submit(
+            lambda task: self._fetch_CVEs(task, result_text_context, entered_number),
+            on_done=lambda CVEs_count: self._on_CVEs_search_done(table_page, CVEs_count),
+            on_error=lambda error: self._on_CVEs_search_error(error, table_page),
+            on_progress=lambda progress: self._on_CVEs_search_progress(table_page, CVEs_by_repo_url, progress),
+            group=self._cves_search_group
+        )
+        self._close_all_inline_dropdowns()
+
+    def _fetch_CVEs(self, task, cpe_name, min_severity):
+        """
+        streams ("CVEs", page) as NVD returns the pages and then ("repository", url, repository) as GitHub returns each repo,
+        the CVEs an earlier search enriched (NVD_API returns the same objects) keep their repos and only the missing ones are fetched
+        """
+        CVEs = []
+        for CVEs_page in NVD_API.iter_vulnerabilities_by_cpe_and_severity(cpe_name, min_severity):
+            CVEs.extend(CVEs_page)
+            task.report_progress(("CVEs", CVEs_page))
+        for repo_url, repository in GITHUB_API.iter_repositories_details(url for cve in CVEs for url in cve.missing_repositories_urls):
+            task.report_progress(("repository", repo_url, repository))
+        return len(CVEs)
+
+    def _on_CVEs_search_progress(self, table_page, CVEs_by_repo_url, progress):
+        if progress[0] == "CVEs":
+            CVEs_page = progress[1]
+            for cve in CVEs_page:
+                for url in cve.missing_repositories_urls: # the others were added by an earlier search
+                    CVEs_by_repo_url.setdefault(url, []).append(cve)
+            table_page.append_rows(CVEs_page)
+            table_page.set_status(f"Fetched {table_page.rows_count} CVEs, fetching more...")
+        else:
+            _, repo_url, repository = progress
+            enriched_CVEs = CVEs_by_repo_url.get(repo_url, ())
+            for cve in enriched_CVEs:
+                cve.add_relevant_repository(repository, repo_url)
+            table_page.refresh(enriched_CVEs)
+            table_page.set_status("Fetching the relevant repositories...")
+
+    def _on_CVEs_search_done(self, table_page, CVEs_count):
+        self.search_status_label.config(text="")
+        self.cancel_search_button.config(state=tk.DISABLED)
+        table_page.set_status(f"{CVEs_count} CVEs found.", loading=False)
+
+    def _on_CVEs_search_error(self, error, table_page):
+        self.search_status_label.config(text="")
+        self.cancel_search_button.config(state=tk.DISABLED)
+        table_page.set_status("Search failed.", loading=False)
+        messagebox.showerror("Search Failed", f"Error occured while searching for CVEs: {error}", parent=table_page.top)
+
+    def _export_snapshot(self):
+        path = filedialog.asksaveasfilename(parent=self.top, title="Export snapshot", defaultextension=FILE_EXTENSION,
+                                            filetypes=[("CVE snapshot", f"*{FILE_EXTENSION}")])
+        if not path:
+            return
+        snapshot = Snapshot(self.query, cpes=self.all_results)
+        self.task_runner.submit(lambda task: snapshot.dump(path),
+                                on_done=lambda size: self.search_status_label.config(text=f"Exported {len(snapshot.cpes)} CPEs."),
+                                on_error=lambda error: messagebox.showerror("Export Failed", f"Error occured while exporting the CPEs: {error}", parent=self.top))
+
+    def _on_table_closed(self):
+        self.task_runner.cancel_group(self._cves_search_group) # nothing is left to show the rest of the results in
+        self.search_status_label.config(text="")
+        self.cancel_search_button.config(state=tk.DISABLED)
+
+    def _cancel_CVEs_search(self):
+        self.task_runner.cancel_group(self._cves_search_group)
+        self.search_status_label.config(text="Search cancelled.")
+        self.cancel_search_button.config(state=tk.DISABLED)
 
     def _on_closing(self):
+        self.task_runner.cancel_group(self._cves_search_group)
         self._close_all_inline_dropdowns()
         self.top.destroy()
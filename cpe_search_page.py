@@ -1,16 +1,35 @@
+import importlib
 import tkinter as tk
 from tkinter import ttk
+from tkinter import filedialog
 from tkinter import messagebox
 
-from apis.nvd_api import NVD_API
-from cpe_list_page import SearchResultsPage
+from classes.cpe_index import CPEIndex
+from task_runner import TkTaskRunner
+
+# the network and model stacks (requests, pydantic) take longer to import than the window takes to draw,
+# so they are imported on a worker thread once the window is up, or by the first search if it comes first
+LAZY_MODULES = ("apis.nvd_api", "apis.github_api", "cpe_list_page")
 
 class MyApp:
+    TYPING_DEBOUNCE_MS = 400 # a typed query is searched once the typing pauses for this long
+    MIN_TYPED_QUERY_LENGTH = 3 # shorter keywords match too much of NVD to be worth fetching on every pause
+    SUGGESTIONS_COUNT = 8
+
     def __init__(self, master):
         self.master = master
         master.title("Search Application")
-        master.geometry("500x300")
+        master.geometry("500x420")
         master.resizable(True, True)
+        self.task_runner = TkTaskRunner(master)
+        self.search_task = None
+        self.cpe_index = CPEIndex()
+        self.fetched_keywords = set()
+        self.search_as_you_type = tk.BooleanVar(master, value=True)
+        self._typing_job = None
+        self._typed_query = ""
+        self._in_flight_query = None # the keyword being fetched from NVD, identical queries wait for it instead of fetching it again
+        self._open_results_when_fetched = False # whether a search (and not only typing) is waiting for the keyword in flight
 
         master.grid_rowconfigure(0, weight=1)
         master.grid_rowconfigure(1, weight=1)
@@ -40,15 +59,42 @@ class MyApp:
         self.search_entry.insert(0, "Enter a CPE keyword...")
         self.search_entry.bind("<FocusIn>", self.clear_placeholder)
         self.search_entry.bind("<FocusOut>", self.add_placeholder)
+        self.search_entry.bind("<KeyRelease>", self._on_key_release)
+        self.search_entry.bind("<Return>", lambda event: self.perform_search())
 
 
         # --- Button ---
         self.search_button = ttk.Button(self.main_frame, text="Search", command=self.perform_search)
         self.search_button.grid(row=1, column=2, padx=(10, 0), sticky="w")
 
+        self.cancel_button = ttk.Button(self.main_frame, text="Cancel", command=self.cancel_search, state=tk.DISABLED)
+        self.cancel_button.grid(row=2, column=2, padx=(10, 0), sticky="w")
+
 
         self.status_label = ttk.Label(self.main_frame, text="", font=("Arial", 10, "italic"))
-        self.status_label.grid(row=2, column=0, columnspan=3, pady=10)
+        self.status_label.grid(row=2, column=0, columnspan=2, pady=10)
+
+        self.stats_button = ttk.Button(self.main_frame, text="Stats", command=self.show_stats)
+        self.stats_button.grid(row=3, column=2, padx=(10, 0), sticky="w")
+
+        self.import_button = ttk.Button(self.main_frame, text="Import", command=self.import_snapshot)
+        self.import_button.grid(row=4, column=2, padx=(10, 0), pady=(5, 0), sticky="nw")
+
+        self.search_as_you_type_button = ttk.Checkbutton(self.main_frame, text="Search as you type", variable=self.search_as_you_type,
+                                                         command=self._on_search_as_you_type_toggled)
+        self.search_as_you_type_button.grid(row=3, column=1, padx=5, sticky="w")
+
+        self.suggestions_list = tk.Listbox(self.main_frame, height=self.SUGGESTIONS_COUNT, activestyle="none")
+        self.suggestions_list.grid(row=4, column=1, padx=5, pady=(5, 0), sticky="ew")
+        self.suggestions_list.bind("<Double-Button-1>", self._open_suggestion)
+        self.suggestions_list.bind("<Return>", self._open_suggestion)
+        self.suggestions_list.grid_remove() # shown once a typed query has matches
+
+        master.protocol("WM_DELETE_WINDOW", self._on_closing)
+        master.after_idle(self.prewarm) # after the first frame is drawn
+
+    def prewarm(self):
+        self.task_runner.submit(lambda task: [importlib.import_module(module) for module in LAZY_MODULES], on_done=lambda _: None)
 
     def clear_placeholder(self, event):
         if self.search_entry.get() == "Enter a CPE keyword...":
@@ -62,11 +108,196 @@ class MyApp:
 
     def perform_search(self):
         search_query = self.search_entry.get().strip()
-        results = NVD_API.get_CPEs_by_keyword(search_query)
 
         if search_query and search_query != "Enter a CPE keyword...":
-            SearchResultsPage(self.master, search_query, results)
-            self.status_label.config(text=f"Last search: '{search_query}'")
+            self._cancel_typing_job()
+            local_results = self.local_search(search_query)
+            if local_results is not None:
+                self._cancel_fetch()
+                self._on_search_done(search_query, local_results)
+                return
+            self._open_results_when_fetched = True
+            if self._in_flight_query is not None and self._in_flight_query.lower() == search_query.lower():
+                return # already being fetched for the typed query, its results are shown when it is done
+            self._fetch(search_query)
         else:
             messagebox.showwarning("No Query", "Please enter a search query.")
             self.status_label.config(text="No search performed.")
+
+    def show_stats(self):
+        from stats_page import StatsPage
+        StatsPage(self.master)
+
+    def import_snapshot(self):
+        """
+        reopens exported results without any request, a CPE list in its results page and CVEs in their table
+        """
+        path = filedialog.askopenfilename(parent=self.master, title="Import snapshot", filetypes=[("CVE snapshot", "*.cvesnap"), ("All files", "*")])
+        if not path:
+            return
+        self.status_label.config(text="Importing...")
+        self.task_runner.submit(lambda task: self._load_snapshot(path), on_done=self._on_snapshot_loaded, on_error=self._on_snapshot_error)
+
+    def _load_snapshot(self, path):
+        from classes.snapshot import Snapshot
+        return Snapshot.load(path)
+
+    def _on_snapshot_loaded(self, snapshot):
+        from cpe_list_page import SearchResultsPage
+        from results_table_page import SearchResultsTablePage
+        if snapshot.cpes:
+            SearchResultsPage(self.master, snapshot.title, snapshot.cpes, self.task_runner)
+        if snapshot.CVEs or not snapshot.cpes:
+            SearchResultsTablePage(self.master, snapshot.title, table_data=snapshot.CVEs, min_severity=snapshot.min_severity, task_runner=self.task_runner)
+        self.status_label.config(text=f"Imported '{snapshot.title}' ({snapshot.created_at})")
+
+    def _on_snapshot_error(self, error):
+        self.status_label.config(text="Import failed.")
+        messagebox.showerror("Import Failed", f"Error occured while importing the snapshot: {error}")
+
+    def local_search(self, search_query):
+        """
+        a query narrowing an already fetched keyword can only match CPEs NVD already returned,
+        so it is answered from the index without a request
+        """
+        if any(self._narrows(search_query, keyword) for keyword in self.fetched_keywords):
+            return self.cpe_index.search(search_query)
+        return None
+
+    @staticmethod
+    def _narrows(search_query, keyword):
+        """
+        every word of the keyword appears in the query's words
+        """
+        query_words = search_query.lower().split()
+        return all(any(keyword_word in query_word for query_word in query_words) for keyword_word in keyword.lower().split())
+
+    def cancel_search(self):
+        self._cancel_typing_job()
+        self._cancel_fetch()
+        self.status_label.config(text="Search cancelled.")
+
+    def _on_closing(self):
+        """
+        the searches in flight are cancelled so their worker threads, which would keep the process alive, stop waiting and exit
+        """
+        self._cancel_typing_job()
+        self.task_runner.shutdown()
+        self.master.destroy()
+
+    def _on_key_release(self, event):
+        search_query = self.search_entry.get().strip()
+        if not self.search_as_you_type.get() or search_query == self._typed_query: # e.g. an arrow key or a modifier
+            return
+        self._typed_query = search_query
+        self._cancel_typing_job()
+        self._typing_job = self.master.after(self.TYPING_DEBOUNCE_MS, self._search_typed_query)
+
+    def _on_search_as_you_type_toggled(self):
+        if not self.search_as_you_type.get():
+            self._cancel_typing_job()
+            self._show_suggestions([])
+            if not self._open_results_when_fetched: # nobody waits for the typed query in flight anymore
+                self._cancel_fetch()
+
+    def _search_typed_query(self):
+        """
+        suggests the CPEs matching the entry once the typing pauses, from the index when the query narrows a fetched keyword
+        (or the keyword in flight, which is answered the same way once it is done), and otherwise from NVD,
+        superseding the fetch in flight
+        """
+        self._typing_job = None
+        search_query = self.search_entry.get().strip()
+        if not self.search_as_you_type.get() or search_query == "Enter a CPE keyword...":
+            return
+        if len(search_query) < self.MIN_TYPED_QUERY_LENGTH:
+            self._show_suggestions([])
+            return
+        local_results = self.local_search(search_query)
+        if local_results is not None:
+            self._show_suggestions(local_results)
+            self.status_label.config(text=f"{len(local_results)} CPEs match '{search_query}'")
+        elif self._in_flight_query is None or not self._narrows(search_query, self._in_flight_query):
+            self._open_results_when_fetched = False
+            self._fetch(search_query)
+
+    def _show_suggestions(self, results):
+        self.suggestions_list.delete(0, tk.END)
+        for cpe in results[:self.SUGGESTIONS_COUNT]:
+            self.suggestions_list.insert(tk.END, cpe)
+        if results:
+            self.suggestions_list.grid()
+        else:
+            self.suggestions_list.grid_remove()
+
+    def _open_suggestion(self, event):
+        from cpe_list_page import SearchResultsPage
+        selection = self.suggestions_list.curselection()
+        if selection:
+            cpe = self.suggestions_list.get(selection[0])
+            SearchResultsPage(self.master, self.search_entry.get().strip(), [cpe], self.task_runner)
+
+    def _cancel_typing_job(self):
+        if self._typing_job is not None:
+            self.master.after_cancel(self._typing_job)
+            self._typing_job = None
+
+    def _fetch(self, search_query):
+        self._in_flight_query = search_query
+        self.status_label.config(text=f"Searching for '{search_query}'...")
+        self.cancel_button.config(state=tk.NORMAL)
+        self.search_task = self.task_runner.submit(
+            lambda task: self._fetch_CPEs(task, search_query),
+            on_done=lambda results: self._on_fetch_done(search_query, results),
+            on_error=self._on_search_error,
+            on_progress=lambda fetched_count: self.status_label.config(text=f"Searching for '{search_query}'... {fetched_count} CPEs so far"),
+            group="cpe_search" # a new search supersedes the one in flight, which stops at its next page
+        )
+
+    def _cancel_fetch(self):
+        self.task_runner.cancel_group("cpe_search")
+        self._in_flight_query = None
+        self._open_results_when_fetched = False
+        self.cancel_button.config(state=tk.DISABLED)
+
+    def _fetch_CPEs(self, task, search_query):
+        from apis.nvd_api import NVD_API
+        results = []
+        for cpes_page in NVD_API.iter_CPEs_by_keyword(search_query):
+            results.extend(cpes_page)
+            task.report_progress(len(results))
+        return results
+
+    def _on_fetch_done(self, search_query, results):
+        self._in_flight_query = None
+        if self._open_results_when_fetched:
+            self._open_results_when_fetched = False
+            self._on_search_done(search_query, results)
+        else:
+            self.cancel_button.config(state=tk.DISABLED)
+            self._remember_fetched(search_query, results)
+        if self._typing_job is None: # the entry may have been narrowed while fetching, which is now answered from the index
+            self._search_typed_query()
+
+    def _remember_fetched(self, search_query, results):
+        """
+        the results are ranked (and indexed) even for a keyword fetched before, a search run again gets them in the same order
+        """
+        self.fetched_keywords.add(search_query.lower())
+        return self.cpe_index.rank(search_query, results)
+
+    def _on_search_done(self, search_query, results):
+        from cpe_list_page import SearchResultsPage
+        self.cancel_button.config(state=tk.DISABLED)
+        results = self._remember_fetched(search_query, results)
+        SearchResultsPage(self.master, search_query, results, self.task_runner)
+        self.status_label.config(text=f"Last search: '{search_query}'")
+
+    def _on_search_error(self, error):
+        searched = self._open_results_when_fetched
+        self._in_flight_query = None
+        self._open_results_when_fetched = False
+        self.cancel_button.config(state=tk.DISABLED)
+        self.status_label.config(text="Search failed." if searched else f"Search failed: {error}")
+        if searched: # a failure while typing is only reported in the status, so it does not pop up over the entry
+            messagebox.showerror("Search Failed", f"Error occured while searching for CPEs: {error}")
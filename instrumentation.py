@@ -0,0 +1,160 @@
+import json
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # seconds
+RECENT_SPANS_COUNT = 200
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    counts the observed values per bucket (the bucket of a value is the first upper bound not below it),
+    quantiles are estimated as the upper bound of the bucket they fall in
+    """
+    def __init__(self, buckets: Sequence[float] = DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1) # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip((*self.buckets, float("inf")), self.bucket_counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return upper_bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    a thread safe registry of counters and histograms keyed by name and labels, a span times a block of code
+    into the histogram f"{name}_seconds" and is also kept in a short list of the most recent spans
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._recent_spans: Deque[dict] = deque(maxlen=RECENT_SPANS_COUNT)
+
+    def count(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, Metrics.__labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DURATION_BUCKETS, **labels: str) -> None:
+        key = (name, Metrics.__labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name: str, keep_recent: bool = True, **labels: str) -> Iterator[dict]:
+        """
+        yields the span's labels, which the timed block may add to (e.g. the status of a response),
+        spans timing many tiny calls pass keep_recent=False so they do not push the others out of the recent spans
+        """
+        start = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(f"{name}_seconds", seconds, **labels)
+            if keep_recent:
+                with self._lock:
+                    self._recent_spans.append({"name": name, "labels": dict(labels), "seconds": seconds, "ended_at": time.time()})
+
+    def timed(self, name: str, keep_recent: bool = True, **labels: str) -> Callable:
+        """
+        a decorator timing every call of the function as a span
+        """
+        def decorator(function: Callable) -> Callable:
+            @wraps(function)
+            def timed_function(*args, **kwargs):
+                with self.span(name, keep_recent, **labels):
+                    return function(*args, **kwargs)
+            return timed_function
+        return decorator
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._recent_spans.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(self._counters.items())],
+                "histograms": [{
+                    "name": name, "labels": dict(labels), "count": histogram.count, "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5), "p95": histogram.quantile(0.95), "p99": histogram.quantile(0.99),
+                    "buckets": {str(upper_bound): bucket_count for upper_bound, bucket_count in zip((*histogram.buckets, "+Inf"), histogram.bucket_counts)},
+                } for (name, labels), histogram in sorted(self._histograms.items())],
+                "recent_spans": list(self._recent_spans),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        the snapshot in Prometheus' text exposition format, counters get the conventional _total suffix
+        """
+        lines: List[str] = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (histogram.buckets, list(histogram.bucket_counts), histogram.count, histogram.sum))
+                                for key, histogram in self._histograms.items())
+        typed_names = set()
+        for (name, labels), value in counters:
+            if name not in typed_names:
+                typed_names.add(name)
+                lines.append(f"# TYPE {name}_total counter")
+            lines.append(f"{name}_total{Metrics.__format_labels(labels)} {value}")
+        for (name, labels), (buckets, bucket_counts, count, total) in histograms:
+            if name not in typed_names:
+                typed_names.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip((*buckets, "+Inf"), bucket_counts):
+                cumulative_count += bucket_count
+                lines.append(f"{name}_bucket{Metrics.__format_labels(labels + (('le', str(upper_bound)),))} {cumulative_count}")
+            lines.append(f"{name}_sum{Metrics.__format_labels(labels)} {total}")
+            lines.append(f"{name}_count{Metrics.__format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    @staticmethod
+    def __format_labels(labels: Labels) -> str:
+        if not labels:
+            return ""
+        escaped_labels = (f'{name}="{Metrics.__escape_label_value(value)}"' for name, value in labels)
+        return "{" + ",".join(escaped_labels) + "}"
+
+    @staticmethod
+    def __escape_label_value(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics() # the registry the whole app reports to
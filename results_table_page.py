@@ -1,6 +1,12 @@
 import textwrap
 import tkinter as tk
 from tkinter import ttk
+from tkinter import filedialog
+from tkinter import messagebox
+
+from classes.cve_table import CVETable
+from classes.snapshot import FILE_EXTENSION, Snapshot
+from instrumentation import METRICS
 
 class ToolTip:
     def __init__(self, widget):
@@ -27,9 +33,38 @@ class ToolTip:
             self.tipwindow = None
 
 class SearchResultsTablePage:
-    def __init__(self, master, parent_result_text, table_data):
-        DESCRIPTION_CHAR_LENGTH: int = 50 
-        
+    """
+    the tree only holds item slots for the rows in view, scrolling re-fills the slots from table_data (a sequence of CVEs),
+    so opening the table costs the same no matter how many CVEs there are.
+    the table opens right away and rows may keep streaming in with append_rows, they are rendered at most once per frame.
+    the CVEs are kept in a CVETable, sorting (by clicking a heading), filtering and the summary are computed from it locally,
+    rows holds the table rows of the current view.
+    the CVEs can be exported to a snapshot (on the task runner when there is one), which reopens the table without fetching
+    """
+    ROW_HEIGHT: int = 150
+    DESCRIPTION_CHAR_LENGTH: int = 50
+    COLUMNS_IDS = ("CVE_ID", "Severity", "Description", "Relevant_Repositories")
+    HEADINGS_TEXTS = {"CVE_ID": "CVE-ID", "Severity": "Severity", "Description": "Description", "Relevant_Repositories": "Relevant Repositories"}
+    SORT_COLUMNS = {"CVE_ID": "cve_id", "Severity": "severity", "Description": "description", "Relevant_Repositories": "stars_count"}
+    FRAME_INTERVAL_MS: int = 16
+
+    def __init__(self, master, parent_result_text, table_data=(), loading=False, on_close=None, min_severity=0, task_runner=None):
+        self.title = parent_result_text
+        self.task_runner = task_runner
+        self.table = CVETable(table_data)
+        self.rows = []
+        self.first_row = 0
+        self.visible_rows_count = 0
+        self.loading = loading
+        self.on_close = on_close
+        self.min_severity = min_severity # what was fetched, the filter can only narrow it
+        self.sort_column_id = None
+        self.sort_descending = False
+        self._pending_rows = []
+        self._enriched_CVEs = []
+        self._view_changed = False
+        self._render_job = None
+
         self.top = tk.Toplevel(master)
         self.top.title(f"Details for: {parent_result_text}")
         self.top.geometry("900x450")
@@ -38,29 +73,41 @@ class SearchResultsTablePage:
         self.top.protocol("WM_DELETE_WINDOW", self._on_closing)
 
         self.top.grid_rowconfigure(0, weight=0)
-        self.top.grid_rowconfigure(1, weight=1)
-        self.top.grid_rowconfigure(2, weight=0)
+        self.top.grid_rowconfigure(1, weight=0)
+        self.top.grid_rowconfigure(2, weight=1)
+        self.top.grid_rowconfigure(3, weight=0)
+        self.top.grid_rowconfigure(4, weight=0)
+        self.top.grid_rowconfigure(5, weight=0)
         self.top.grid_columnconfigure(0, weight=1)
 
         table_header = ttk.Label(self.top, text=f"CVE Results for: {parent_result_text}", font=("Arial", 14, "bold"))
         table_header.grid(row=0, column=0, pady=(15, 10), sticky="n")
 
+        filters_frame = ttk.Frame(self.top, padding=(10,0,10,5))
+        filters_frame.grid(row=1, column=0, sticky="ew")
+        ttk.Label(filters_frame, text="Minimum Severity:").pack(side=tk.LEFT)
+        self.min_severity_var = tk.StringVar(self.top, value=str(min_severity))
+        ttk.Spinbox(filters_frame, from_=min_severity, to=10, increment=0.5, width=6, textvariable=self.min_severity_var).pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(filters_frame, text="Filter:").pack(side=tk.LEFT)
+        self.keyword_var = tk.StringVar(self.top, value="")
+        ttk.Entry(filters_frame, width=40, textvariable=self.keyword_var).pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        for filter_var in (self.min_severity_var, self.keyword_var):
+            filter_var.trace_add("write", self._on_filters_changed)
+
         tree_frame = ttk.Frame(self.top, padding=(10,0,10,10))
-        tree_frame.grid(row=1, column=0, sticky="nsew")
+        tree_frame.grid(row=2, column=0, sticky="nsew")
         tree_frame.grid_rowconfigure(0, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
 
         style = ttk.Style()
-        style.configure("Treeview", rowheight=150) 
+        style.configure("Treeview", rowheight=self.ROW_HEIGHT) 
 
         self.tree = ttk.Treeview(tree_frame, show="headings", style="Treeview")
-        columns_ids = ("CVE_ID", "Severity", "Description", "Relevant_Repositories") 
-        self.tree["columns"] = columns_ids
+        self.tree["columns"] = self.COLUMNS_IDS
 
-        self.tree.heading("CVE_ID", text="CVE-ID", anchor=tk.W)
-        self.tree.heading("Severity", text="Severity", anchor=tk.CENTER)
-        self.tree.heading("Description", text="Description", anchor=tk.W)
-        self.tree.heading("Relevant_Repositories", text="Relevant Repositories", anchor=tk.W)
+        for column_id, anchor in zip(self.COLUMNS_IDS, (tk.W, tk.CENTER, tk.W, tk.W)):
+            self.tree.heading(column_id, text=self.HEADINGS_TEXTS[column_id], anchor=anchor,
+                              command=lambda column_id=column_id: self._sort_by(column_id))
 
         temp_label_cve_id = ttk.Label(self.top, text="CVE ID")
         self.tree.column("CVE_ID", width=temp_label_cve_id.winfo_reqwidth() + 100, minwidth=100, stretch=tk.NO)
@@ -79,18 +126,10 @@ class SearchResultsTablePage:
         self.tree.column("Relevant_Repositories", width=temp_label_repos.winfo_reqwidth() + 300, minwidth=350, stretch=tk.YES)
         temp_label_repos.destroy()
 
-        if table_data:
-            for row_data in table_data:
-                values = [row_data.get(column_id.lower(), "N/A") for column_id in columns_ids]
-                values[2] = textwrap.fill(values[2], width=DESCRIPTION_CHAR_LENGTH) # pack description text
-
-                self.tree.insert("", tk.END, values=values)
-        else:
-            self.tree.insert("", tk.END, values=("", "", "No detailed results available.", ""))
-
-        vsb_tree = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        vsb_tree.grid(row=0, column=1, sticky="ns")
-        self.tree.configure(yscrollcommand=vsb_tree.set)
+        self.vsb_tree = ttk.Scrollbar(tree_frame, orient="vertical", command=self._on_scrollbar)
+        self.vsb_tree.grid(row=0, column=1, sticky="ns")
+        for wheel_event in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(wheel_event, self._on_mouse_wheel)
 
         hsb_tree = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.tree.xview)
         hsb_tree.grid(row=1, column=0, sticky="ew")
@@ -98,19 +137,199 @@ class SearchResultsTablePage:
 
         self.tree.grid(row=0, column=0, sticky="nsew")
 
-        close_button = ttk.Button(self.top, text="Close Table", command=self._on_closing)
-        close_button.grid(row=2, column=0, pady=10)
+        self.summary_label = ttk.Label(self.top, text="")
+        self.summary_label.grid(row=3, column=0)
+
+        self.status_label = ttk.Label(self.top, text="Loading..." if loading else "", font=("Arial", 10, "italic"))
+        self.status_label.grid(row=4, column=0)
+
+        buttons_frame = ttk.Frame(self.top)
+        buttons_frame.grid(row=5, column=0, pady=10)
+        ttk.Button(buttons_frame, text="Export Snapshot", command=self._export_snapshot).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Close Table", command=self._on_closing).pack(side=tk.LEFT, padx=5)
 
         self.tooltip = ToolTip(self.tree)
         self.tree.bind("<Motion>", self._on_tree_hover)
         self.last_row_col = (None, None)
+        self.tree.bind("<Configure>", self._on_tree_configure)
 
         self.top.update_idletasks()
         x = master.winfo_x() + (master.winfo_width() // 2) - (self.top.winfo_width() // 2)
         y = master.winfo_y() + (master.winfo_height() // 2) - (self.top.winfo_height() // 2)
         self.top.geometry(f'+{x}+{y}')
-        
-        self.top.wait_window(self.top)
+        self._update_view()
+        self._render_rows()
+
+    def append_rows(self, rows):
+        """
+        rows appended several times within a frame are rendered together
+        """
+        self._pending_rows.extend(rows)
+        self.refresh()
+
+    @property
+    def rows_count(self):
+        return len(self.table) + len(self._pending_rows)
+
+    def refresh(self, enriched_CVEs=()):
+        """
+        re-renders the rows in view on the next frame, e.g. after their CVEs were enriched in place (pass them, so their
+        repo totals are re-read for sorting and the summary)
+        """
+        self._enriched_CVEs.extend(enriched_CVEs)
+        if self._render_job is None:
+            self._render_job = self.top.after(self.FRAME_INTERVAL_MS, self._flush_pending_rows)
+
+    def set_status(self, text, loading=None):
+        if loading is not None and loading != self.loading:
+            self.loading = loading
+            self.refresh() # the placeholder of an empty table depends on it
+        self.status_label.config(text=text)
+
+    def _flush_pending_rows(self):
+        self._render_job = None
+        if self._pending_rows or self._enriched_CVEs or self._view_changed:
+            self.table.extend(self._pending_rows)
+            self.table.update_repositories(self._enriched_CVEs)
+            self._pending_rows = []
+            self._enriched_CVEs = []
+            self._update_view()
+        self._render_rows()
+
+    @METRICS.timed("table_view")
+    def _update_view(self):
+        """
+        re-computes the rows matching the filters in the sort order and their summary,
+        the scroll position is kept unless the filters or the sort changed
+        """
+        if self._view_changed:
+            self.first_row = 0
+            self._view_changed = False
+        sort_column = self.SORT_COLUMNS[self.sort_column_id] if self.sort_column_id else None
+        min_severity, keyword = self._filters()
+        self.rows = self.table.view(min_severity, keyword, sort_column, self.sort_descending)
+        self._update_summary()
+
+    def _filters(self):
+        try:
+            min_severity = float(self.min_severity_var.get() or 0)
+        except ValueError: # typed halfway, e.g. "7."
+            min_severity = self.min_severity
+        return max(min_severity, self.min_severity), self.keyword_var.get().strip()
+
+    def _update_summary(self):
+        aggregates = self.table.aggregates(self.rows)
+        bands = ", ".join(f"{band}: {band_count}" for band, band_count in aggregates["severity_bands"].items() if band_count)
+        max_stars = f", most stars: {aggregates['max_stars_count']}" if aggregates["max_stars_count"] else ""
+        self.summary_label.config(text=f"Showing {aggregates['count']} of {len(self.table)} CVEs" + (f" ({bands}{max_stars})" if bands else ""))
+
+    def _on_filters_changed(self, *_):
+        self._view_changed = True
+        self.refresh()
+
+    def _sort_by(self, column_id):
+        """
+        a click sorts by the column ascending, a second click on it descending
+        """
+        self.sort_descending = column_id == self.sort_column_id and not self.sort_descending
+        self.sort_column_id = column_id
+        for heading_column_id, text in self.HEADINGS_TEXTS.items():
+            arrow = (" ▼" if self.sort_descending else " ▲") if heading_column_id == column_id else ""
+            self.tree.heading(heading_column_id, text=text + arrow)
+        self._view_changed = True
+        self.refresh()
+
+    def _export_snapshot(self):
+        """
+        exports every fetched CVE, whatever the filters show, so the snapshot can be filtered again once imported
+        """
+        path = filedialog.asksaveasfilename(parent=self.top, title="Export snapshot", defaultextension=FILE_EXTENSION,
+                                            filetypes=[("CVE snapshot", f"*{FILE_EXTENSION}")])
+        if not path:
+            return
+        snapshot = Snapshot(self.title, CVEs=[*self.table.CVEs, *self._pending_rows], min_severity=self.min_severity)
+        self.status_label.config(text=f"Exporting {len(snapshot.CVEs)} CVEs...")
+        if self.task_runner is None:
+            try:
+                self._on_snapshot_exported(snapshot, snapshot.dump(path))
+            except OSError as e:
+                self._on_snapshot_export_error(e)
+            return
+        self.task_runner.submit(lambda task: snapshot.dump(path), on_done=lambda size: self._on_snapshot_exported(snapshot, size),
+                                on_error=self._on_snapshot_export_error)
+
+    def _on_snapshot_exported(self, snapshot, size):
+        if self.top.winfo_exists():
+            self.status_label.config(text=f"Exported {len(snapshot.CVEs)} CVEs ({size / 1024:.0f} KB).")
+
+    def _on_snapshot_export_error(self, error):
+        if self.top.winfo_exists():
+            self.status_label.config(text="Export failed.")
+            messagebox.showerror("Export Failed", f"Error occured while exporting the CVEs: {error}", parent=self.top)
+
+    def _row_values(self, row):
+        cve = self.table.CVEs[row]
+        values = [getattr(cve, column_id.lower(), "N/A") for column_id in self.COLUMNS_IDS]
+        values[2] = textwrap.fill(values[2], width=self.DESCRIPTION_CHAR_LENGTH) # pack description text
+        return values
+
+    @METRICS.timed("table_render")
+    def _render_rows(self):
+        slots = self.tree.get_children()
+        if len(self.rows) == 0:
+            for slot in slots:
+                self.tree.delete(slot)
+            if len(self.table):
+                placeholder = "No CVEs match the filters."
+            else:
+                placeholder = "Loading..." if self.loading else "No detailed results available."
+            self.tree.insert("", tk.END, values=("", "", placeholder, ""))
+            self.vsb_tree.set(0, 1)
+            return
+        self.first_row = self._clamp_first_row(self.first_row)
+        slots_count = min(self.visible_rows_count, len(self.rows) - self.first_row)
+        for slot in slots[slots_count:]: # slots left over after a resize or near the end
+            self.tree.delete(slot)
+        for i in range(slots_count):
+            values = self._row_values(self.rows[self.first_row + i])
+            if i < len(slots):
+                self.tree.item(slots[i], values=values)
+            else:
+                self.tree.insert("", tk.END, values=values)
+        self.tree.selection_set(())
+        self.tooltip.hidetip()
+        self.last_row_col = (None, None)
+        self.vsb_tree.set(self.first_row / len(self.rows), (self.first_row + slots_count) / len(self.rows))
+
+    def _clamp_first_row(self, first_row):
+        return max(0, min(first_row, len(self.rows) - max(1, self.visible_rows_count - 1)))
+
+    def _scroll_to(self, first_row):
+        first_row = self._clamp_first_row(first_row)
+        if first_row != self.first_row:
+            self.first_row = first_row
+            self._render_rows()
+
+    def _on_tree_configure(self, event):
+        heading_height = 25
+        visible_rows_count = max(1, (event.height - heading_height) // self.ROW_HEIGHT + 1)
+        if visible_rows_count != self.visible_rows_count:
+            self.visible_rows_count = visible_rows_count
+            self._render_rows()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.rows)))
+        elif action == "scroll":
+            step = max(1, self.visible_rows_count - 1) if unit == "pages" else 1
+            self._scroll_to(self.first_row + int(amount) * step)
+
+    def _on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._scroll_to(self.first_row - 1)
+        elif event.num == 5 or event.delta < 0:
+            self._scroll_to(self.first_row + 1)
+        return "break" # keeps the scrollable CPE list behind the table from scrolling too
 
     def _on_tree_hover(self, event):
         row_id = self.tree.identify_row(event.y)
@@ -142,6 +361,11 @@ class SearchResultsTablePage:
             self.tooltip.hidetip()
 
     def _on_closing(self):
+        if self._render_job is not None:
+            self.top.after_cancel(self._render_job)
+            self._render_job = None
+        if self.on_close:
+            self.on_close()
         self.top.destroy()
         self.tooltip.hidetip()
         self.top.grab_release()
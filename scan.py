@@ -0,0 +1,212 @@
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from apis.cve_pipeline import CVEPagePipeline
+from apis.github_api import GITHUB_API
+from apis.nvd_api import NVD_API
+from classes.cve import CVE
+
+CSV_COLUMNS = ("cpe_name", "cve_id", "severity", "description", "relevant_repositories_urls", "relevant_repositories")
+
+
+class ScanStats:
+    """
+    the busy seconds of every stage are summed over the worker threads, so they may add up to more than the wall time
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.stage_seconds: Dict[str, float] = {"nvd": 0.0, "github": 0.0, "output": 0.0}
+        self.counts: Dict[str, int] = {"cpes": 0, "failed_cpes": 0, "skipped_cpes": 0, "rows": 0, "unique_cves": 0, "repos_fetched": 0}
+
+    def add(self, stage: Optional[str] = None, seconds: float = 0.0, **counts: int) -> None:
+        with self._lock:
+            if stage is not None:
+                self.stage_seconds[stage] += seconds
+            for name, count in counts.items():
+                self.counts[name] += count
+
+    def report(self) -> dict:
+        wall_seconds = time.perf_counter() - self.started_at
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+            "counts": dict(self.counts),
+            "throughput": {
+                "cpes_per_second": round(self.counts["cpes"] / wall_seconds, 2) if wall_seconds else 0.0,
+                "rows_per_second": round(self.counts["rows"] / wall_seconds, 2) if wall_seconds else 0.0,
+            },
+        }
+
+
+class BulkScanner:
+    """
+    scans many CPEs at once with up to max_workers CPEs in flight. a CVE found for several CPEs is enriched once, and a repo
+    referenced by several CVEs is requested once through GITHUB_API.REPOSITORIES, whose single-flight has the first CPE to
+    need it fetch it (batched with the other repos it needs) and the others wait for it. with a pipeline, the CVE pages are
+    decoded in its processes instead of the workers
+    """
+    def __init__(self, min_severity: float = 0, has_kev: bool = False, max_workers: int = 4, stats: Optional[ScanStats] = None,
+                 pipeline: Optional[CVEPagePipeline] = None):
+        self.min_severity = min_severity
+        self.has_kev = has_kev
+        self.max_workers = max_workers
+        self.stats = stats or ScanStats()
+        self.pipeline = pipeline
+        self._lock = threading.Lock()
+        self._CVEs: Dict[str, CVE] = {}
+
+    def scan(self, cpe_names: Iterable[str]) -> Iterator[Tuple[str, Optional[List[CVE]]]]:
+        """
+        yields (cpe_name, CVEs) in completion order, CVEs is None when the CPE could not be scanned
+        """
+        cpe_names = iter(cpe_names)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        repos_requested = GITHUB_API.REPOSITORIES.misses
+        try:
+            in_flight: Dict[Future, str] = {}
+            while True:
+                for cpe_name in cpe_names: # keeps at most twice the workers queued, instead of the whole inventory
+                    in_flight[executor.submit(self.scan_CPE, cpe_name)] = cpe_name
+                    if len(in_flight) >= 2 * self.max_workers:
+                        break
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    cpe_name = in_flight.pop(future)
+                    try:
+                        yield cpe_name, future.result()
+                    except Exception as e:
+                        logging.error(f"Failed scanning {cpe_name}: {e}")
+                        self.stats.add(failed_cpes=1)
+                        yield cpe_name, None
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.stats.add(repos_fetched=GITHUB_API.REPOSITORIES.misses - repos_requested)
+
+    def scan_CPE(self, cpe_name: str) -> List[CVE]:
+        start = time.perf_counter()
+        if self.pipeline is not None:
+            fetched_CVEs = self.pipeline.get_vulnerabilities(cpe_name, self.min_severity, self.has_kev)
+        else:
+            fetched_CVEs = NVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name, self.min_severity, self.has_kev)
+        self.stats.add("nvd", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        CVEs, new_CVEs = [], []
+        with self._lock:
+            for cve in fetched_CVEs:
+                if cve.cve_id not in self._CVEs:
+                    self._CVEs[cve.cve_id] = cve
+                    new_CVEs.append(cve)
+                CVEs.append(self._CVEs[cve.cve_id])
+        # a repo another CPE is still fetching is waited for, and a repo that failed for it is requested again
+        repositories = GITHUB_API.get_repositories_details(url for cve in CVEs for url in cve.missing_repositories_urls)
+        with self._lock: # the CVEs are shared by the workers
+            for cve in CVEs:
+                for url in cve.missing_repositories_urls:
+                    if url in repositories:
+                        cve.add_relevant_repository(repositories[url], url)
+        self.stats.add("github", time.perf_counter() - start, cpes=1, unique_cves=len(new_CVEs))
+        return CVEs
+
+
+def read_CPE_names(lines: Iterable[str]) -> Iterator[str]:
+    """
+    one CPE name per line, blank lines and lines starting with # are skipped, as are repeated CPEs
+    """
+    seen: Set[str] = set()
+    for line in lines:
+        cpe_name = line.strip()
+        if cpe_name and not cpe_name.startswith("#") and cpe_name not in seen:
+            seen.add(cpe_name)
+            yield cpe_name
+
+
+def skip_completed(cpe_names: Iterable[str], completed_CPEs: Set[str], stats: ScanStats) -> Iterator[str]:
+    """
+    counts the skipped CPEs of the inventory, the checkpoint may also hold CPEs of another inventory
+    """
+    for cpe_name in cpe_names:
+        if cpe_name in completed_CPEs:
+            stats.add(skipped_cpes=1)
+        else:
+            yield cpe_name
+
+
+def read_checkpoint(path: Optional[str]) -> Set[str]:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as checkpoint_file:
+        return set(read_CPE_names(checkpoint_file))
+
+
+def write_rows(output: TextIO, output_format: str, cpe_name: str, CVEs: List[CVE], write_header: bool = False) -> None:
+    if output_format == "jsonl":
+        for cve in CVEs:
+            output.write(json.dumps({"cpe_name": cpe_name, **cve.model_dump()}) + "\n")
+        return
+    writer = csv.writer(output)
+    if write_header:
+        writer.writerow(CSV_COLUMNS)
+    for cve in CVEs:
+        writer.writerow((cpe_name, cve.cve_id, cve.severity, cve.description, " ".join(cve.relevant_repositories_urls),
+                         "; ".join(f"{repo.name} ({repo.stars_count} stars, {repo.forks_count} forks)" for repo in cve.relevant_repositories_list)))
+
+
+def main(arguments: List[str]) -> None:
+    parser = argparse.ArgumentParser(description="Scans a list of CPEs for vulnerabilities and their exploit repositories")
+    parser.add_argument("inventory", nargs="?", default="-", help="a file with a CPE name per line, - or nothing reads stdin")
+    parser.add_argument("--min-severity", type=float, default=0)
+    parser.add_argument("--has-kev", action="store_true", help="only CVEs in CISA's Known Exploited Vulnerabilities catalog")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--output", help="the file results are appended to, stdout by default")
+    parser.add_argument("--checkpoint", help="the file completed CPEs are recorded in, they are skipped when the scan is run again")
+    parser.add_argument("--workers", type=int, default=4, help="CPEs scanned at once")
+    parser.add_argument("--processes", type=int, default=0, help="processes decoding the CVE pages, 0 decodes them in the workers")
+    parsed_arguments = parser.parse_args(arguments)
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+    completed_CPEs = read_checkpoint(parsed_arguments.checkpoint)
+    stats = ScanStats()
+    pipeline = CVEPagePipeline(parsed_arguments.processes) if parsed_arguments.processes > 0 else None
+    scanner = BulkScanner(parsed_arguments.min_severity, parsed_arguments.has_kev, parsed_arguments.workers, stats, pipeline)
+
+    inventory = sys.stdin if parsed_arguments.inventory == "-" else open(parsed_arguments.inventory, encoding="utf-8")
+    output = open(parsed_arguments.output, "a", encoding="utf-8", newline="") if parsed_arguments.output else sys.stdout
+    checkpoint = open(parsed_arguments.checkpoint, "a", encoding="utf-8") if parsed_arguments.checkpoint else None
+    write_header = parsed_arguments.format == "csv" and (output is sys.stdout or output.tell() == 0) # not again when resuming
+    try:
+        for cpe_name, CVEs in scanner.scan(skip_completed(read_CPE_names(inventory), completed_CPEs, stats)):
+            if CVEs is None:
+                continue # left out of the checkpoint, so running the scan again retries it
+            start = time.perf_counter()
+            write_rows(output, parsed_arguments.format, cpe_name, CVEs, write_header)
+            write_header = False
+            output.flush()
+            if checkpoint is not None: # recorded only once its rows were written
+                checkpoint.write(cpe_name + "\n")
+                checkpoint.flush()
+            stats.add("output", time.perf_counter() - start, rows=len(CVEs))
+    except KeyboardInterrupt:
+        logging.warning("Scan interrupted" + (", run it again with the same checkpoint to resume" if checkpoint else ""))
+    finally:
+        for opened_file in (inventory, output, checkpoint):
+            if opened_file not in (None, sys.stdin, sys.stdout):
+                opened_file.close()
+        if pipeline is not None:
+            pipeline.close()
+        print(json.dumps(stats.report(), indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
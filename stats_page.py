@@ -0,0 +1,100 @@
+import tkinter as tk
+from tkinter import ttk
+from tkinter import filedialog
+from tkinter import messagebox
+
+from instrumentation import METRICS
+
+class StatsPage:
+    """
+    a live view of the instrumentation: the timings of every span and the counters, refreshed while the window is open
+    """
+    REFRESH_INTERVAL_MS: int = 1000
+    COLUMNS_IDS = ("Metric", "Labels", "Count", "Mean_ms", "P50_ms", "P95_ms", "Total")
+
+    def __init__(self, master):
+        self.top = tk.Toplevel(master)
+        self.top.title("Performance Stats")
+        self.top.geometry("900x450")
+        self.top.transient(master)
+        self.top.protocol("WM_DELETE_WINDOW", self._on_closing)
+        self._refresh_job = None
+
+        self.top.grid_rowconfigure(0, weight=0)
+        self.top.grid_rowconfigure(1, weight=1)
+        self.top.grid_rowconfigure(2, weight=0)
+        self.top.grid_columnconfigure(0, weight=1)
+
+        stats_header = ttk.Label(self.top, text="Performance Stats", font=("Arial", 14, "bold"))
+        stats_header.grid(row=0, column=0, pady=(15, 10), sticky="n")
+
+        tree_frame = ttk.Frame(self.top, padding=(10,0,10,10))
+        tree_frame.grid(row=1, column=0, sticky="nsew")
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        style = ttk.Style()
+        style.configure("Stats.Treeview", rowheight=22) # its own style, since the CVE table makes the rows of "Treeview" tall
+        self.tree = ttk.Treeview(tree_frame, show="headings", style="Stats.Treeview")
+        self.tree["columns"] = self.COLUMNS_IDS
+        for column_id, width, anchor in (("Metric", 170, tk.W), ("Labels", 280, tk.W), ("Count", 70, tk.E), ("Mean_ms", 80, tk.E),
+                                         ("P50_ms", 70, tk.E), ("P95_ms", 70, tk.E), ("Total", 100, tk.E)):
+            self.tree.heading(column_id, text=column_id.replace("_", " "), anchor=anchor)
+            self.tree.column(column_id, width=width, minwidth=50, anchor=anchor, stretch=tk.YES if column_id == "Labels" else tk.NO)
+
+        vsb_tree = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        vsb_tree.grid(row=0, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=vsb_tree.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        buttons_frame = ttk.Frame(self.top)
+        buttons_frame.grid(row=2, column=0, pady=10)
+        ttk.Button(buttons_frame, text="Export JSON", command=lambda: self._export("json")).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Export Prometheus", command=lambda: self._export("prometheus")).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Reset", command=self._reset).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="Close", command=self._on_closing).pack(side=tk.LEFT, padx=5)
+
+        self._refresh()
+
+    def _refresh(self):
+        snapshot = METRICS.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for histogram in snapshot["histograms"]:
+            self.tree.insert("", tk.END, values=(
+                histogram["name"], self._format_labels(histogram["labels"]), histogram["count"],
+                self._format_ms(histogram["sum"] / histogram["count"]), # the quantiles are the upper bounds of their buckets
+                "≤" + self._format_ms(histogram["p50"]), "≤" + self._format_ms(histogram["p95"]), f"{histogram['sum']:.3f} s"
+            ))
+        for counter in snapshot["counters"]:
+            self.tree.insert("", tk.END, values=(counter["name"], self._format_labels(counter["labels"]), "", "", "", "", f"{counter['value']:g}"))
+        self._refresh_job = self.top.after(self.REFRESH_INTERVAL_MS, self._refresh)
+
+    def _format_ms(self, seconds):
+        return f"{seconds * 1000:.1f}" if seconds != float("inf") else "inf"
+
+    def _format_labels(self, labels):
+        return ", ".join(f"{name}={value}" for name, value in labels.items())
+
+    def _export(self, export_format):
+        path = filedialog.asksaveasfilename(parent=self.top, title="Export stats",
+                                            defaultextension=".json" if export_format == "json" else ".prom",
+                                            filetypes=[("JSON", "*.json")] if export_format == "json" else [("Prometheus text", "*.prom *.txt")])
+        if not path:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as export_file:
+                export_file.write(METRICS.to_json() if export_format == "json" else METRICS.to_prometheus())
+        except OSError as e:
+            messagebox.showerror("Export Failed", f"Error occured while exporting the stats: {e}", parent=self.top)
+
+    def _reset(self):
+        METRICS.reset()
+        if self._refresh_job is not None:
+            self.top.after_cancel(self._refresh_job)
+        self._refresh()
+
+    def _on_closing(self):
+        if self._refresh_job is not None:
+            self.top.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        self.top.destroy()
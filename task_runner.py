@@ -0,0 +1,133 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set
+
+from apis.cancellation import TaskCancelledError, cancellable
+
+
+class BackgroundTask:
+    def __init__(self, runner: "TkTaskRunner", on_done: Callable, on_error: Optional[Callable], on_progress: Optional[Callable]):
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self._runner = runner
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise TaskCancelledError()
+
+    def report_progress(self, progress: Any) -> None:
+        """
+        called from the worker thread, on_progress is then called with progress on the Tk thread
+        """
+        self.raise_if_cancelled()
+        self._runner._results.put((self, "progress", progress))
+
+
+class TkTaskRunner:
+    """
+    runs blocking work on worker threads and hands the results back to the Tk thread,
+    which polls them from a queue with after() since Tk widgets may only be touched from the Tk thread
+    """
+    POLL_INTERVAL_MS = 30
+    POLL_BUDGET_SECONDS = 0.008 # callbacks are split across polls so keystrokes are not held up by a burst of results
+
+    def __init__(self, master, max_workers: int = 4):
+        self.master = master
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._groups: Dict[str, BackgroundTask] = {}
+        self._tasks: Set[BackgroundTask] = set() # in flight, touched only from the Tk thread
+        self._pending_tasks = 0
+        self._polling = False
+
+    def submit(self, work: Callable[[BackgroundTask], Any], on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None, on_progress: Optional[Callable[[Any], None]] = None,
+               group: Optional[str] = None) -> BackgroundTask:
+        """
+        runs work(task) in the background and calls on_done with its result on the Tk thread,
+        a task submitted to a group cancels the task of that group which is still in flight
+        """
+        task = BackgroundTask(self, on_done, on_error, on_progress)
+        if group is not None:
+            self.cancel_group(group)
+            self._groups[group] = task
+        self._pending_tasks += 1
+        self._tasks.add(task)
+        self._executor.submit(self.__run, task, work)
+        self.__schedule_poll()
+        return task
+
+    def cancel_group(self, group: str) -> None:
+        previous_task = self._groups.pop(group, None)
+        if previous_task is not None:
+            previous_task.cancel()
+
+    def shutdown(self) -> None:
+        """
+        cancels every task, the ones waiting on a rate limit or a retry wake up and stop, and drops the ones not started yet,
+        without waiting for the requests in flight
+        """
+        for group in list(self._groups):
+            self.cancel_group(group)
+        for task in self._tasks:
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __run(self, task: BackgroundTask, work: Callable[[BackgroundTask], Any]) -> None:
+        try:
+            task.raise_if_cancelled()
+            with cancellable(task._cancelled): # the API clients' waits end as soon as the task is cancelled
+                result = work(task)
+            self._results.put((task, "done", result))
+        except TaskCancelledError:
+            self._results.put((task, "cancelled", None))
+        except Exception as e:
+            logging.error(f"Background task failed: {e}")
+            self._results.put((task, "error", e))
+
+    def __schedule_poll(self) -> None:
+        if not self._polling:
+            self._polling = True
+            self.master.after(self.POLL_INTERVAL_MS, self.__poll)
+
+    def __poll(self) -> None:
+        self._polling = False
+        deadline = time.perf_counter() + self.POLL_BUDGET_SECONDS
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    task, kind, value = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind != "progress":
+                    self._pending_tasks -= 1
+                    self._tasks.discard(task)
+                    for group, group_task in list(self._groups.items()):
+                        if group_task is task:
+                            del self._groups[group]
+                if task.cancelled:
+                    continue
+                # scheduled before the callback, which may run a nested event loop (e.g. wait_window) and not return for a while
+                if self._pending_tasks > 0 or not self._results.empty():
+                    self.__schedule_poll()
+                if kind == "done":
+                    task.on_done(value)
+                elif kind == "error" and task.on_error:
+                    task.on_error(value)
+                elif kind == "progress" and task.on_progress:
+                    task.on_progress(value)
+        finally:
+            if self._pending_tasks > 0 or not self._results.empty():
+                self.__schedule_poll()
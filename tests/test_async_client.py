@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+import requests
+
+from apis import async_http
+from apis.api_template import APITemplate
+from apis.github_api import GITHUB_API
+from apis.response_cache import ResponseCache
+from apis.session_cache import SessionCache
+from benchmarks.stub_server import StubServer, json_response
+
+RENAMED_REPO = {"stargazers_count": 42, "forks": 7}
+
+
+def moved(location: str, status: int = 301):
+    return status, {"Location": location, "Content-Type": "application/json"}, b'{"message": "Moved Permanently"}'
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    response_cache = ResponseCache(":memory:")
+    monkeypatch.setattr(APITemplate, "_cache", response_cache) # shared by both backends, like the one on disk
+    return response_cache
+
+
+@pytest.fixture
+def server():
+    routes = {
+        "/repos/old/name": moved("/repos/new/name"), # GitHub's answer for a renamed repo
+        "/repos/new/name": json_response(RENAMED_REPO),
+        "/repos/loop/name": moved("/repos/loop/name"),
+        "/multiple-choices": (300, {"Content-Type": "application/json"}, b"[]"), # a 3xx requests does not follow either
+    }
+    with StubServer(routes) as stub_server:
+        yield stub_server
+    APITemplate.close_sessions()
+
+
+def stub_github(base_url: str, backend: str):
+    class StubGITHUB_API(GITHUB_API):
+        BASE_URL = base_url
+        HTTP_BACKEND = backend
+        RATE_LIMIT = None
+        CACHE_TTL = 3600
+        MAX_RETRIES = 0
+        REPOSITORIES = SessionCache("github_repositories", 0)
+
+        @classmethod
+        def get_api_key(cls):
+            return None
+    return StubGITHUB_API
+
+
+def run(api, coroutine):
+    async def run_and_close():
+        try:
+            return await coroutine
+        finally:
+            await api.close_async_sessions()
+    return asyncio.run(run_and_close())
+
+
+@pytest.mark.parametrize("backend", ["threads", "asyncio"])
+def test_a_renamed_repo_is_followed_and_only_its_repo_is_cached(cache, server, backend):
+    api = stub_github(server.base_url, backend)
+
+    repository = api.get_repositories_details(["repos/old/name"])["repos/old/name"]
+
+    assert (repository.stars_count, repository.forks_count) == (RENAMED_REPO["stargazers_count"], RENAMED_REPO["forks"])
+    assert cache.get(f"{server.base_url}/repos/old/name", 3600) == json_response(RENAMED_REPO)[2]
+
+
+def test_the_threads_backend_reads_the_repo_the_asyncio_backend_cached(cache, server):
+    run(APITemplate, stub_github(server.base_url, "asyncio").async_get("repos/old/name"))
+    requests_count = server.requests_count
+
+    repository = stub_github(server.base_url, "threads").get_repository_details("repos/old/name")
+
+    assert repository.stars_count == RENAMED_REPO["stargazers_count"]
+    assert server.requests_count == requests_count
+
+
+def test_async_redirects_keep_their_history_and_final_url(server):
+    api = stub_github(server.base_url, "asyncio")
+
+    res = run(api, api.async_get("repos/old/name", cache_ttl=0))
+
+    assert res.url == f"{server.base_url}/repos/new/name"
+    assert [redirect.status_code for redirect in res.history] == [301]
+
+
+def test_a_redirect_to_another_host_is_followed(server):
+    with StubServer({"/moved": moved(f"{server.base_url}/repos/new/name", status=307)}) as other_server:
+        api = stub_github(other_server.base_url, "asyncio")
+        res = run(api, api.async_get("moved", cache_ttl=0))
+
+    assert res.json() == RENAMED_REPO
+
+
+def test_a_redirect_loop_fails_without_caching(cache, server):
+    api = stub_github(server.base_url, "asyncio")
+
+    with pytest.raises(requests.TooManyRedirects):
+        run(api, api.async_get("repos/loop/name"))
+    assert cache.get(f"{server.base_url}/repos/loop/name", 3600) is None
+
+
+@pytest.mark.parametrize("backend", ["threads", "asyncio"])
+def test_a_response_which_is_not_2xx_is_not_cached(cache, server, backend):
+    api = stub_github(server.base_url, backend)
+
+    res = api.get("multiple-choices") if backend == "threads" else run(api, api.async_get("multiple-choices"))
+
+    assert res.status_code == 300
+    assert cache.get(f"{server.base_url}/multiple-choices", 3600) is None
+
+
+def test_requests_go_through_the_http_proxy_of_the_environment(monkeypatch, server):
+    monkeypatch.setenv("HTTP_PROXY", server.base_url)
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    monkeypatch.delenv("no_proxy", raising=False)
+    api = stub_github("http://github.invalid", "asyncio") # only reachable through the proxy
+
+    res = run(api, api.async_get("repos/new/name", cache_ttl=0))
+
+    assert res.json() == RENAMED_REPO
+
+
+def test_an_https_host_is_reached_through_a_connect_tunnel(monkeypatch, server):
+    monkeypatch.setenv("HTTPS_PROXY", server.base_url) # the stub server does not support CONNECT and answers 501
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    monkeypatch.delenv("no_proxy", raising=False)
+    api = stub_github("https://github.invalid", "asyncio")
+
+    with pytest.raises(requests.exceptions.ProxyError, match="501"):
+        run(api, api.async_get("repos/new/name", cache_ttl=0))
+
+
+def drip_server(pause: float, parts: int):
+    """
+    answers every request with a body sent in parts, pause seconds apart
+    """
+    async def respond(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % parts)
+        for _ in range(parts):
+            await asyncio.sleep(pause)
+            writer.write(b".")
+            await writer.drain()
+        writer.close()
+    return asyncio.start_server(respond, "127.0.0.1", 0)
+
+
+@pytest.mark.parametrize("pause, parts, fails", [(0.1, 6, False), (0.5, 1, True)])
+def test_the_read_timeout_bounds_every_read_and_not_the_whole_response(pause, parts, fails):
+    async def fetch():
+        server = await drip_server(pause, parts)
+        async with server:
+            class SlowAPI(APITemplate):
+                BASE_URL = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+                READ_TIMEOUT = 0.3
+                MAX_RETRIES = 0
+            return await SlowAPI.async_get("slow", cache_ttl=0)
+
+    if fails:
+        with pytest.raises(requests.ReadTimeout):
+            run(APITemplate, fetch())
+    else: # 0.6 seconds in all, above the read timeout
+        assert run(APITemplate, fetch()).content == b"." * parts
+
+
+def test_the_asyncio_backend_without_aiohttp_fails_when_chosen(monkeypatch):
+    monkeypatch.setattr(async_http, "aiohttp", None)
+
+    with pytest.raises(RuntimeError, match="needs aiohttp"):
+        stub_github("http://github.invalid", "asyncio").http_backend()
+    assert stub_github("http://github.invalid", "threads").http_backend() == "threads"
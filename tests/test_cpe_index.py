@@ -0,0 +1,87 @@
+import pytest
+
+from classes.cpe_index import CPEIndex
+
+
+def cpe(title: str, vendor: str, product: str, version: str = "1.0") -> str:
+    return f"{title} ({f'cpe:2.3:a:{vendor}:{product}:{version}:*:*:*:*:*:*:*'})"
+
+
+HTTP_SERVER = cpe("Apache HTTP Server 2.4", "apache", "http_server", "2.4")
+TOMCAT = cpe("Apache Tomcat 9", "apache", "tomcat", "9")
+APACHEFOO = cpe("Apachefoo Tool", "apachefoo", "tool") # apache is a prefix of its vendor
+SUBAPACHE = cpe("Subapache Proxy", "subapache", "proxy") # and inside this one's
+TITLE_ONLY = cpe("Plugin for apache servers", "example", "plugin") # apache is only a title word
+NGINX = cpe("Nginx 1.25", "f5", "nginx", "1.25")
+
+
+@pytest.fixture
+def index():
+    cpe_index = CPEIndex()
+    cpe_index.add([NGINX, TITLE_ONLY, SUBAPACHE, APACHEFOO, TOMCAT, HTTP_SERVER])
+    return cpe_index
+
+
+def test_exact_matches_rank_before_prefix_and_infix_ones():
+    index = CPEIndex()
+    infix, prefix, exact = cpe("Superwidget", "example", "p1"), cpe("Widgetry", "example", "p2"), cpe("Widget", "example", "p3")
+    index.add([infix, prefix, exact, NGINX])
+
+    assert index.search("widget") == [exact, prefix, infix]
+
+
+def test_the_vendor_and_product_bonus_is_added_to_the_match(index):
+    results = index.search("apache")
+
+    assert results[:2] == [TOMCAT, HTTP_SERVER] # exact in the vendor, the shorter first
+    assert results[2:] == [APACHEFOO, TITLE_ONLY, SUBAPACHE] # a prefix of the vendor ties with exact in the title, then an infix of the vendor
+
+
+def test_a_vendor_or_product_match_ranks_before_a_title_match(index):
+    index.add([cpe("Nginx admin panel", "example", "panel")])
+
+    assert index.search("nginx")[0] == NGINX
+
+
+def test_every_word_has_to_match(index):
+    assert index.search("apache tomcat") == [TOMCAT]
+    assert index.search("apache nginx") == []
+    assert index.search("tomcat nothing") == []
+
+
+def test_the_scores_of_the_words_add_up(index):
+    exact_both = cpe("Apache Server", "apache", "server")
+    exact_and_prefix = cpe("Apache Serverless", "apache", "serverless")
+    index.add([exact_and_prefix, exact_both])
+
+    results = index.search("apache server")
+
+    assert results.index(exact_both) < results.index(exact_and_prefix)
+    assert set(results) == {exact_both, exact_and_prefix, HTTP_SERVER, TITLE_ONLY} # http_server and "servers" match too
+
+
+def test_equal_scores_keep_the_shorter_and_then_the_first_added(index):
+    first, second = cpe("Acme Widget A", "acme", "widget"), cpe("Acme Widget B", "acme", "widget")
+    longer = cpe("Acme Widget Long", "acme", "widget")
+    index.add([first, longer, second])
+
+    assert index.search("widget") == [first, second, longer]
+
+
+def test_a_typo_still_matches(index):
+    assert index.search("tomccat") == [TOMCAT]
+
+
+def test_a_limit_keeps_the_best_matches(index):
+    assert index.search("apache", limit=3) == index.search("apache")[:3]
+
+
+def test_rank_keeps_the_given_order_among_equal_scores_and_unmatched_cpes_last():
+    index = CPEIndex()
+    fetched = [NGINX, TITLE_ONLY, TOMCAT, HTTP_SERVER, SUBAPACHE]
+
+    ranked = index.rank("apache", fetched)
+
+    assert ranked == [TOMCAT, HTTP_SERVER, TITLE_ONLY, SUBAPACHE, NGINX] # NVD's order among the exact vendor matches
+    assert index.rank("apache", fetched) == ranked # ranked again once they are indexed
+    assert len(index) == len(fetched)
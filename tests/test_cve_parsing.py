@@ -0,0 +1,69 @@
+import pytest
+
+from apis.nvd_api import NVD_API
+from benchmarks.payloads import make_vulnerabilities
+
+
+def cve_details(**changes) -> dict:
+    details = make_vulnerabilities(1, repos_per_cve=1)[0]["cve"]
+    details.update(changes)
+    return {key: value for key, value in details.items() if value is not None}
+
+
+def test_the_english_description_is_kept_whatever_its_position():
+    details = cve_details(descriptions=[{"lang": "es", "value": "Descripción."}, {"lang": "en", "value": "First sentence. Second one."}])
+
+    assert NVD_API.parse_CVE(details).description == "First sentence."
+
+
+@pytest.mark.parametrize("descriptions, description", [
+    ([{"lang": "es", "value": "Descripción. Segunda frase."}, {"lang": "fr", "value": "Description."}], "Descripción."),
+    ([], ""),
+    (None, ""), # no descriptions member at all
+])
+def test_a_CVE_without_an_english_description_is_still_parsed(descriptions, description):
+    details = cve_details(descriptions=descriptions)
+
+    assert NVD_API.parse_CVE(details).description == description
+    assert [cve.description for cve in NVD_API.parse_CVEs([details, cve_details()])][0] == description # the page is not cut short
+
+
+def exploit_reference(url: str, tags=("Exploit", "Third Party Advisory")) -> dict:
+    return {"url": url, "source": "example", "tags": list(tags)}
+
+
+@pytest.mark.parametrize("url, repo_url", [
+    ("https://github.com/Owner/Repo", "repos/Owner/Repo"),
+    ("http://github.com/owner/repo", "repos/owner/repo"),
+    ("https://www.github.com/owner/repo", "repos/owner/repo"),
+    ("https://github.com/owner/repo.git", "repos/owner/repo"),
+    ("https://github.com/owner/repo/blob/main/exploit.py", "repos/owner/repo"),
+    ("https://github.com/owner/repo?tab=readme", "repos/owner/repo"),
+    ("https://raw.githubusercontent.com/owner/repo/main/exploit.py", "repos/owner/repo"),
+    ("https://gist.github.com/owner/0123456789abcdef", None), # a gist is not a repo
+    ("https://github.com/advisories/GHSA-xxxx-xxxx-xxxx", None), # nor are GitHub's own pages
+    ("https://github.com/owner", None),
+    ("https://example.com/github.com/owner/repo", None),
+])
+def test_the_exploit_links_shapes(url, repo_url):
+    cve = NVD_API.parse_CVE(cve_details(references=[exploit_reference(url)]))
+
+    assert list(cve.relevant_repositories_urls) == ([repo_url] if repo_url else [])
+
+
+def test_only_exploit_links_are_kept_once_each_in_order():
+    references = [exploit_reference("https://github.com/owner/b"), exploit_reference("https://github.com/owner/advisory", tags=("Patch",)),
+                  exploit_reference("https://github.com/owner/a"), exploit_reference("https://github.com/owner/b.git")]
+
+    assert NVD_API.parse_CVE(cve_details(references=references)).relevant_repositories_urls == ("repos/owner/b", "repos/owner/a")
+
+
+@pytest.mark.parametrize("whole_description, description", [
+    ("Apache 2.4.49 allows path traversal. A second sentence.", "Apache 2.4.49 allows path traversal."), # not cut at the version
+    ("Ends with a dot.", "Ends with a dot."),
+    ("No sentence end " * 50, ("No sentence end " * 50)[:551]),
+])
+def test_the_description_is_its_first_sentence(whole_description, description):
+    details = cve_details(descriptions=[{"lang": "en", "value": whole_description}])
+
+    assert NVD_API.parse_CVE(details).description == description
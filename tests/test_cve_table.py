@@ -0,0 +1,112 @@
+import pytest
+
+from benchmarks.bench_cve_table import make_CVEs
+from classes.cve import CVE
+from classes.cve_table import SEVERITY_BANDS, SORT_COLUMNS, CVETable
+from classes.repository import Repository
+
+KEYWORDS = ["", "remote", "Remote CODE", "overflow", "exploit-1", "cve-2024-00001", "cve-2024-000001 remote", "no such word"]
+MIN_SEVERITIES = [0.0, 0.1, 4.0, 6.9, 7.0, 9.5, 10.0]
+
+
+@pytest.fixture(scope="module")
+def CVEs():
+    unscored = [CVE(f"CVE-2023-{index}", score, f"Unscored or tied {index}.") # without repos, so they tie on stars and forks
+                for index, score in enumerate([0.0, 0.0, 10.0, 7.0, 6.9, 3.9, 12.5])]
+    return make_CVEs(300) + unscored
+
+
+def stars_count(cve: CVE) -> int:
+    return sum(repo.stars_count for repo in cve.relevant_repositories_list)
+
+
+def forks_count(cve: CVE) -> int:
+    return sum(repo.forks_count for repo in cve.relevant_repositories_list)
+
+
+SORT_KEYS = {
+    "cve_id": lambda cve: (cve.cve_id[:8], len(cve.cve_id), cve.cve_id),
+    "severity": lambda cve: cve.severity,
+    "description": lambda cve: cve.description.lower(),
+    "stars_count": stars_count,
+    "forks_count": forks_count,
+}
+
+
+def expected_view(CVEs, min_severity=0.0, keyword="", sort_column=None, descending=False):
+    """
+    the view worked out on the CVE objects themselves, ties keep the order the CVEs were added in
+    """
+    def matches(cve: CVE) -> bool:
+        text = "\n".join((cve.cve_id, cve.description, *(repo.name for repo in cve.relevant_repositories_list))).lower()
+        return cve.severity >= min_severity and all(word in text for word in keyword.lower().split())
+    kept = [cve for cve in CVEs if matches(cve)]
+    if sort_column:
+        kept = sorted(kept, key=SORT_KEYS[sort_column], reverse=descending)
+    return [cve.cve_id for cve in kept]
+
+
+def view_ids(table: CVETable, **filters) -> list:
+    return [table.CVEs[row].cve_id for row in table.view(**filters)]
+
+
+@pytest.mark.parametrize("sort_column", [None, *SORT_COLUMNS])
+@pytest.mark.parametrize("descending", [False, True])
+def test_the_masks_and_orders_match_filtering_the_CVEs(CVEs, sort_column, descending):
+    table = CVETable(CVEs)
+    for min_severity in MIN_SEVERITIES:
+        for keyword in KEYWORDS:
+            filters = {"min_severity": min_severity, "keyword": keyword, "sort_column": sort_column, "descending": descending}
+            assert view_ids(table, **filters) == expected_view(CVEs, **filters), filters
+
+
+def test_a_keyword_typed_a_keystroke_at_a_time(CVEs):
+    table = CVETable(CVEs)
+    for word in ("overflow", "exploit-12", "cve-2024-0002"):
+        for length in range(1, len(word) + 1):
+            assert view_ids(table, min_severity=7.0, keyword=word[:length]) == expected_view(CVEs, 7.0, word[:length])
+    for length in range(len("overflow"), 0, -1): # and erased again
+        assert view_ids(table, keyword="overflow"[:length]) == expected_view(CVEs, keyword="overflow"[:length])
+
+
+def test_extending_matches_building_at_once(CVEs):
+    table = CVETable(CVEs[:100])
+    table.view(sort_column="severity", keyword="remote") # cached before extending
+    table.extend(CVEs[100:])
+
+    assert view_ids(table, sort_column="severity", keyword="remote") == expected_view(CVEs, keyword="remote", sort_column="severity")
+
+
+def test_repos_added_in_place_are_read_again():
+    CVEs = [CVE(f"CVE-2024-{index}", 5.0, "Description.", [f"repos/owner/repo-{index}"]) for index in range(5)]
+    table = CVETable(CVEs)
+    assert view_ids(table, sort_column="stars_count", descending=True) == [cve.cve_id for cve in CVEs] # all tied at 0
+
+    CVEs[3].add_relevant_repository(Repository("owner/repo-3", 50, 1), "repos/owner/repo-3")
+    CVEs[1].add_relevant_repository(Repository("owner/repo-1", 9, 1), "repos/owner/repo-1")
+    table.update_repositories(CVEs)
+
+    assert view_ids(table, sort_column="stars_count", descending=True) == ["CVE-2024-3", "CVE-2024-1", "CVE-2024-0", "CVE-2024-2", "CVE-2024-4"]
+    assert view_ids(table, keyword="repo-3") == ["CVE-2024-3"]
+    assert table.aggregates()["max_stars_count"] == 50
+
+
+def expected_aggregates(CVEs) -> dict:
+    bands = {band: 0 for band, _ in SEVERITY_BANDS}
+    for cve in CVEs: # scores above the last band's are counted in it
+        bands[next((band for band, max_score in SEVERITY_BANDS if cve.severity <= max_score), SEVERITY_BANDS[-1][0])] += 1
+    return {
+        "count": len(CVEs),
+        "severity_bands": bands,
+        "max_severity": max((cve.severity for cve in CVEs), default=None),
+        "max_stars_count": max(map(stars_count, CVEs), default=None),
+    }
+
+
+@pytest.mark.parametrize("min_severity, keyword", [(0.0, ""), (7.0, ""), (4.0, "remote"), (0.0, "no such word")])
+def test_the_aggregates_match_counting_the_CVEs(CVEs, min_severity, keyword):
+    table = CVETable(CVEs)
+    rows = table.view(min_severity=min_severity, keyword=keyword)
+
+    assert table.aggregates(rows) == expected_aggregates([table.CVEs[row] for row in rows])
+    assert table.aggregates() == expected_aggregates(CVEs)
@@ -0,0 +1,45 @@
+from apis.github_api import Repository
+from classes.cve import CVE
+
+URLS = ("repos/owner/first", "repos/owner/second", "repos/owner/third")
+
+
+def repository(url: str) -> Repository:
+    return Repository(url[len("repos/"):], len(url), 1)
+
+
+def test_a_partly_enriched_CVE_is_only_missing_its_unfetched_urls():
+    cve = CVE("CVE-2024-0001", 7.5, "description", URLS)
+    assert cve.missing_repositories_urls == list(URLS)
+
+    cve.add_relevant_repository(repository(URLS[0]), URLS[0]) # the search was cancelled after the first repo
+    assert cve.missing_repositories_urls == list(URLS[1:])
+
+    for url in cve.missing_repositories_urls: # a later search fetches the rest
+        cve.add_relevant_repository(repository(url), url)
+    assert cve.missing_repositories_urls == []
+    assert cve.relevant_repositories_list == tuple(sorted(map(repository, URLS)))
+
+
+def test_a_repo_added_twice_is_kept_once():
+    cve = CVE("CVE-2024-0001", 7.5, "description", URLS[:1])
+    cve.add_relevant_repository(repository(URLS[0]), URLS[0])
+    cve.add_relevant_repository(repository(URLS[0]), URLS[0]) # e.g. two searches sharing the CVE both fetched it
+
+    assert cve.relevant_repositories_list == (repository(URLS[0]),)
+
+
+def test_set_repositories_leaves_the_failed_urls_to_fetch():
+    cve = CVE("CVE-2024-0001", 7.5, "description", URLS)
+    cve.set_repositories({url: repository(url) for url in URLS[::2]}) # the second repo failed
+
+    assert cve.missing_repositories_urls == [URLS[1]]
+    assert cve.relevant_repositories_list == tuple(sorted(map(repository, URLS[::2])))
+
+
+def test_enrichment_bookkeeping_is_not_part_of_equality():
+    enriched = CVE("CVE-2024-0001", 7.5, "description", URLS[:1], [repository(URLS[0])])
+    fetched = CVE("CVE-2024-0001", 7.5, "description", URLS[:1])
+    fetched.add_relevant_repository(repository(URLS[0]), URLS[0])
+
+    assert enriched == fetched
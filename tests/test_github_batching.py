@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from apis.github_api import GITHUB_API
+from apis.session_cache import SessionCache
+from benchmarks.stub_server import StubServer, json_response
+
+REPO_URLS = [f"repos/owner{i % 7}/exploit-{i}" for i in range(1, 251)]
+MISSING_EVERY = 50 # deleted: 404 from REST, NOT_FOUND from GraphQL
+FORBIDDEN_EVERY = 35 # e.g. blocked by the owner: 403 from REST, a FORBIDDEN error beside the batch's other data from GraphQL
+
+
+def repo_index(name: str) -> int:
+    return int(name.rsplit("-", 1)[1])
+
+
+def rest_route(path, query, body):
+    index = repo_index(path.rsplit("/", 1)[1])
+    if index % MISSING_EVERY == 0:
+        return json_response({"message": "Not Found"}, status=404)
+    if index % FORBIDDEN_EVERY == 0:
+        return json_response({"message": "Repository access blocked"}, status=403)
+    return json_response({"stargazers_count": index * 3, "forks": index})
+
+
+def graphql_route(path, query, body):
+    variables = json.loads(body)["variables"]
+    data, errors = {}, []
+    for i in range(len(variables) // 2):
+        index = repo_index(variables[f"name{i}"])
+        if index % MISSING_EVERY == 0 or index % FORBIDDEN_EVERY == 0:
+            data[f"r{i}"] = None
+            errors.append({"type": "NOT_FOUND" if index % MISSING_EVERY == 0 else "FORBIDDEN", "path": [f"r{i}"],
+                           "message": "Could not resolve to a Repository"})
+        else:
+            data[f"r{i}"] = {"stargazerCount": index * 3, "forkCount": index}
+    return json_response({"data": data, "errors": errors} if errors else {"data": data})
+
+
+@pytest.fixture
+def server():
+    with StubServer({"/repos/": rest_route, "/graphql": graphql_route, "/broken/graphql": json_response(
+            {"data": None, "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]})}) as stub_server:
+        yield stub_server
+    GITHUB_API.close_sessions()
+
+
+def stub_api(base_url: str, token):
+    class StubGITHUB_API(GITHUB_API):
+        BASE_URL = base_url
+        RATE_LIMIT = None
+        AUTHENTICATED_RATE_LIMIT = None
+        CACHE_TTL = 0
+        MAX_RETRIES = 0
+        HTTP_BACKEND = "threads"
+        REPOSITORIES = SessionCache("github_repositories", 0)
+
+        @classmethod
+        def get_api_key(cls):
+            return token
+    return StubGITHUB_API
+
+
+def test_graphql_batches_resolve_the_same_repos_as_rest(server):
+    from_rest = stub_api(server.base_url, None).get_repositories_details(REPO_URLS)
+    requests_before = server.requests_count
+    from_graphql = stub_api(server.base_url, "stub-token").get_repositories_details(REPO_URLS)
+    assert from_graphql == from_rest
+    assert server.requests_count - requests_before == -(-len(REPO_URLS) // GITHUB_API.GRAPHQL_BATCH_SIZE)
+    skipped = {repo_url for repo_url in REPO_URLS if repo_index(repo_url) % MISSING_EVERY == 0 or repo_index(repo_url) % FORBIDDEN_EVERY == 0}
+    assert set(from_rest) == set(REPO_URLS) - skipped
+
+
+def test_a_batch_keeps_its_data_beside_partial_errors(server):
+    batch = [repo_url for repo_url in REPO_URLS if repo_index(repo_url) in (34, 35, 36, 50)]
+    repositories = stub_api(server.base_url, "stub-token").get_repositories_batch(batch)
+    assert {repo_url: (repository.stars_count, repository.forks_count) for repo_url, repository in repositories.items()} == \
+           {batch[0]: (102, 34), batch[2]: (108, 36)}
+
+
+def test_a_batch_without_data_raises(server):
+    with pytest.raises(Exception, match="API rate limit exceeded"):
+        stub_api(f"{server.base_url}/broken", "stub-token").get_repositories_batch(REPO_URLS[:3])
+
+
+def test_a_failed_batch_is_skipped_by_the_bulk_fetch(server):
+    assert stub_api(f"{server.base_url}/broken", "stub-token").get_repositories_details(REPO_URLS[:3]) == {}
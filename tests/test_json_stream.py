@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from apis import json_stream
+from apis.json_stream import JSONObjectStream
+
+DOCUMENT = {
+    "resultsPerPage": 3,
+    "vulnerabilities": [
+        {"id": "CVE-1", "description": "quote \" backslash \\ slash / tab \t unicode é pair 😀",
+         "scores": [0, -1.5, 1e-3, 2.5E+10, -0.0, 12345678901234567890], "flags": [True, False, None]},
+        {"id": "CVE-2", "description": "multibyte é ü 漢字 😀", "nested": {"empty": [], "object": {}, "list": [[1], [2, [3]]]}},
+        {"id": "CVE-3", "description": "", "scores": []},
+    ],
+    "totalResults": 3, # a header member after the items
+    "timestamp": "2024-06-01T00:00:00.000",
+}
+TEXT = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+# escapes are written as escapes, so the chunk boundaries also fall inside them
+ESCAPED_TEXT = json.dumps(DOCUMENT, ensure_ascii=True).replace(", ", ",\n ").encode("ascii")
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    monkeypatch.setattr(json_stream, "MIN_READ_AHEAD", 1) # otherwise these small documents are read whole at once
+
+
+def parse(chunks, items_key="vulnerabilities"):
+    stream = JSONObjectStream(chunks, items_key)
+    return list(stream), stream.header
+
+
+def split(text: bytes, *positions: int):
+    bounds = [0, *positions, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+EXPECTED = (DOCUMENT["vulnerabilities"], {key: value for key, value in DOCUMENT.items() if key != "vulnerabilities"})
+
+
+@pytest.mark.parametrize("text", [TEXT, ESCAPED_TEXT], ids=["utf-8", "escaped"])
+def test_a_single_chunk_boundary_anywhere(text):
+    for position in range(1, len(text)):
+        assert parse(split(text, position)) == EXPECTED, f"split at {position}: {text[position - 10:position + 10]!r}"
+
+
+@pytest.mark.parametrize("text", [TEXT, ESCAPED_TEXT], ids=["utf-8", "escaped"])
+def test_one_byte_chunks(text):
+    assert parse(text[i:i + 1] for i in range(len(text))) == EXPECTED
+
+
+@pytest.mark.parametrize("literal, value", [
+    (b"true", True), (b"false", False), (b"null", None), (b"-12.5e+3", -12500.0), (b"1.5", 1.5), (b"10", 10), (b'"\\u00e9"', "é"),
+])
+def test_values_cut_at_every_position(literal, value):
+    text = b'{"items": [' + literal + b', ' + literal + b'], "after": ' + literal + b'}'
+    for position in range(1, len(text)):
+        assert parse(split(text, position), "items") == ([value, value], {"after": value})
+
+
+def test_multibyte_characters_cut_between_their_bytes():
+    text = '{"items": ["é😀漢"]}'.encode("utf-8")
+    for first in range(1, len(text)):
+        for second in range(first, len(text)):
+            assert parse(split(text, first, second), "items")[0] == ["é😀漢"]
+
+
+@pytest.mark.parametrize("text, items, header", [
+    (b'{"items": []}', [], {}),
+    (b'  {\n"total": 0 ,"items" : [ ] , "after": []}  \n', [], {"total": 0, "after": []}),
+    (b'{"total": 0}', [], {"total": 0}),
+    (b'{}', [], {}),
+])
+def test_empty_arrays_and_documents(text, items, header):
+    assert parse([text], "items") == (items, header)
+
+
+@pytest.mark.parametrize("text", [
+    b'',
+    b'   ',
+    b'{',
+    b'{"items": [',
+    b'{"items": [{"id": 1}',
+    b'{"items": [{"id": 1},',
+    b'{"items": [{"id": 1}, {"id": 2',
+    b'{"items": [{"id": 1}, {"id": "unterminated',
+    b'{"items": [{"id": 1}], "total": 1',
+    b'{"items": [{"id": 1}], "total": tru',
+    b'{"items": [{"id": 1}], "total": 1.',
+    b'{"items": [{"id": 1}], "total": -',
+])
+def test_truncated_documents_raise(text):
+    for chunks in ([text], [text[i:i + 1] for i in range(len(text))]):
+        with pytest.raises(json.JSONDecodeError):
+            parse(chunks, "items")
+
+
+@pytest.mark.parametrize("text", [
+    b'[{"id": 1}]',
+    b'{"items": {"id": 1}}',
+    b'{"items" [{"id": 1}]}',
+    b'{"items": [{"id": 1} {"id": 2}]}',
+    b'{"items": [{"id": 1},]}',
+    b'{items: [{"id": 1}]}',
+    b'{1: 2, "items": []}',
+    b'{"items": [{"id": 1}]} {"items": []}',
+    b'{"items": [{"id": 1}], "total": 1,}',
+])
+def test_malformed_documents_raise(text):
+    with pytest.raises(json.JSONDecodeError):
+        parse([text], "items")
+
+
+def test_invalid_utf8_raises():
+    with pytest.raises(UnicodeDecodeError):
+        parse([b'{"items": ["\xff\xfe"]}'], "items")
+
+
+def test_the_items_before_a_truncation_are_whole():
+    stream = JSONObjectStream(split(b'{"items": [{"id": 1, "name": "a"}, {"id": 2, "name": "b', 20), "items")
+    items = []
+    with pytest.raises(json.JSONDecodeError):
+        for item in stream:
+            items.append(item)
+    assert items == [{"id": 1, "name": "a"}]
+
+
+def test_several_items_keys():
+    text = b'{"products": [1, 2], "format": "x", "vulnerabilities": [3]}'
+    assert parse([text], ("products", "vulnerabilities")) == ([1, 2, 3], {"format": "x"})
@@ -0,0 +1,157 @@
+import copy
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+
+from apis.nvd_api import NVD_API
+from apis.nvd_mirror import NVDMirror
+from apis.session_cache import SessionCache
+from benchmarks.payloads import load_fixture, make_cpe_name, make_cpe_products, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+
+# what NVD answers to cpeName queries for the CPEs of the sample feeds, the mirror has to work these out from the CVEs' configurations
+RECORDED_CVE_IDS_BY_CPE = {
+    "cpe:2.3:a:apache:http_server:2.4.49:*:*:*:*:*:*:*": ["CVE-2021-41773", "CVE-2021-42013"],
+    "cpe:2.3:a:apache:http_server:2.4.50:*:*:*:*:*:*:*": ["CVE-2021-42013"],
+    "cpe:2.3:a:apache:http_server:2.4.51:*:*:*:*:*:*:*": ["CVE-2024-00001"],
+    "cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*": ["CVE-2021-44228", "CVE-2021-44832"],
+    "cpe:2.3:a:apache:log4j:2.17.1:*:*:*:*:*:*:*": [],
+    "cpe:2.3:a:openssl:openssl:3.0.6:*:*:*:*:*:*:*": ["CVE-2022-3602"],
+    "cpe:2.3:a:openssl:openssl:0.9.8:*:*:*:*:*:*:*": ["CVE-2009-3555"],
+    "cpe:2.3:o:microsoft:windows_10_21h2:10.0.19044.1706:*:*:*:*:*:x64:*": [],
+}
+KEYWORDS = ["apache", "http server 2.4", "log4j", "OpenSSL 3", "windows x64", "Apache 2.4.5", "nonexistent"]
+
+
+class StubNVD:
+    """
+    serves the sample feeds like NVD: the whole collections, the items modified in a range, keyword searches and cpeName queries
+    """
+    def __init__(self):
+        self.products = load_fixture("nvd_cpes_sample.json")["products"]
+        self.vulnerabilities = load_fixture("nvd_cves_sample.json")["vulnerabilities"]
+        self.modified_vulnerabilities = []
+
+    def routes(self) -> dict:
+        return {"/cpes/2.0": self.__cpes, "/cves/2.0": self.__cves}
+
+    def __cpes(self, path, query, body):
+        products = self.products
+        if "keywordSearch" in query: # every word has to appear in the title or the CPE name
+            words = query["keywordSearch"].lower().split()
+            products = [product for product in products if all(word in f'{product["cpe"]["titles"][0]["title"]} {product["cpe"]["cpeName"]}'.lower()
+                                                               for word in words)]
+        elif "lastModStartDate" in query:
+            products = []
+        return json_response(nvd_page(products, "products", query))
+
+    def __cves(self, path, query, body):
+        vulnerabilities = self.vulnerabilities
+        if "cpeName" in query:
+            cve_ids = RECORDED_CVE_IDS_BY_CPE[query["cpeName"]]
+            vulnerabilities = [vulnerability for vulnerability in vulnerabilities if vulnerability["cve"]["id"] in cve_ids]
+        elif "lastModStartDate" in query:
+            vulnerabilities = self.modified_vulnerabilities
+        return json_response(nvd_page(vulnerabilities, "vulnerabilities", query))
+
+
+@pytest.fixture
+def stub_nvd(monkeypatch):
+    stub = StubNVD()
+    with StubServer(stub.routes()) as server:
+        monkeypatch.setattr(NVD_API, "BASE_URL", server.base_url)
+        monkeypatch.setattr(NVD_API, "RATE_LIMIT", None)
+        monkeypatch.setattr(NVD_API, "MAX_RETRIES", 0)
+        monkeypatch.setattr(NVD_API, "CPES_CACHE_TTL", 0)
+        monkeypatch.setattr(NVD_API, "CVES_CACHE_TTL", 0)
+        monkeypatch.setattr(NVD_API, "MIRROR", None)
+        monkeypatch.setattr(NVD_API, "CVES", SessionCache("nvd_cves", 0))
+        monkeypatch.setattr(NVD_API, "HTTP_BACKEND", "threads")
+        monkeypatch.delenv(NVD_API.MIRROR_PATH_ENV, raising=False)
+        monkeypatch.delenv(NVD_API.API_KEY_ENV, raising=False)
+        yield stub
+    NVD_API.close_sessions()
+
+
+@pytest.fixture
+def mirror(tmp_path, stub_nvd):
+    mirror = NVDMirror(str(tmp_path / "mirror.sqlite3"))
+    assert mirror.sync(datetime(2024, 6, 1, tzinfo=timezone.utc)) == (len(stub_nvd.products), len(stub_nvd.vulnerabilities) - 1) # one is rejected
+    yield mirror
+    mirror.close()
+
+
+def cve_details(CVEs) -> list:
+    return [(cve.cve_id, cve.severity, cve.description, tuple(cve.relevant_repositories_urls)) for cve in CVEs]
+
+
+@pytest.mark.parametrize("keyword", KEYWORDS)
+def test_keyword_search_matches_the_api(mirror, keyword):
+    assert mirror.search_CPEs(keyword) == NVD_API.get_CPEs_by_keyword(keyword)
+
+
+@pytest.mark.parametrize("cpe_name", RECORDED_CVE_IDS_BY_CPE)
+@pytest.mark.parametrize("min_severity", [0, 7.5])
+def test_CVEs_by_cpe_match_the_api(mirror, cpe_name, min_severity):
+    from_api = NVD_API.get_vulnerabilities_by_cpe_and_severity(cpe_name, min_severity)
+    assert cve_details(mirror.get_vulnerabilities(cpe_name, min_severity)) == cve_details(from_api)
+
+
+def test_paged_lookups_match_a_single_page(mirror):
+    mirror.import_CPEs(make_cpe_products(100))
+    mirror.import_vulnerabilities(make_vulnerabilities(40, make_cpe_name(0), repos_per_cve=1)) # all of them match the first CPE
+    for keyword in KEYWORDS + ["vendor", "Apache 2.4", "2 0"]:
+        pages = list(mirror.iter_CPEs(keyword, page_size=1))
+        assert [cpe for page in pages for cpe in page] == next(mirror.iter_CPEs(keyword, page_size=1000), []), keyword
+        assert [len(page) for page in pages[:-1]] == [2 ** index for index in range(len(pages) - 1)] # doubled every page
+    for cpe_name in [*RECORDED_CVE_IDS_BY_CPE, make_cpe_name(0), make_cpe_name(12)]:
+        for min_severity in (0, 7.5):
+            pages = list(mirror.iter_vulnerabilities(cpe_name, min_severity, page_size=1))
+            assert cve_details(cve for page in pages for cve in page) == cve_details(next(mirror.iter_vulnerabilities(cpe_name, min_severity, 1000), []))
+    assert len(mirror.get_vulnerabilities(make_cpe_name(0))) == 40
+
+
+def test_incremental_sync_applies_modified_and_rejected_CVEs(mirror, stub_nvd):
+    modified, rejected = copy.deepcopy(stub_nvd.vulnerabilities[0]), copy.deepcopy(stub_nvd.vulnerabilities[-1])
+    modified["cve"]["descriptions"] = [{"lang": "en", "value": "Updated description."}]
+    rejected["cve"]["vulnStatus"] = "Rejected"
+    stub_nvd.modified_vulnerabilities = [modified, rejected]
+
+    assert mirror.sync(datetime(2024, 7, 1, tzinfo=timezone.utc)) == (0, 1)
+    descriptions = {cve.cve_id: cve.description for cve in mirror.get_vulnerabilities("cpe:2.3:a:apache:http_server:2.4.49:*:*:*:*:*:*:*")}
+    assert descriptions[modified["cve"]["id"]] == "Updated description."
+    assert mirror.get_vulnerabilities("cpe:2.3:a:apache:http_server:2.4.51:*:*:*:*:*:*:*") == []
+
+
+def test_a_mirror_built_before_the_formatted_column_is_migrated(tmp_path):
+    path = str(tmp_path / "old_mirror.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE cpes (id INTEGER PRIMARY KEY, cpe_name TEXT UNIQUE NOT NULL, title TEXT NOT NULL);
+        CREATE VIRTUAL TABLE cpes_search USING fts5(title, cpe_name, formatted UNINDEXED, tokenize='trigram');
+        INSERT INTO cpes VALUES (1, 'cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*', 'Log4j 2.14.1');
+        INSERT INTO cpes_search (rowid, title, cpe_name, formatted)
+            VALUES (1, 'Log4j 2.14.1', 'cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*', 'Log4j 2.14.1 (cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*)');
+    """)
+    connection.commit()
+    connection.close()
+    mirror = NVDMirror(path)
+    assert mirror.search_CPEs("log4j") == ["Log4j 2.14.1 (cpe:2.3:a:apache:log4j:2.14.1:*:*:*:*:*:*:*)"]
+    mirror.close()
+
+
+def test_a_mirror_built_before_the_matches_were_paged_is_migrated(tmp_path, mirror):
+    CVEs = {cpe_name: cve_details(mirror.get_vulnerabilities(cpe_name)) for cpe_name in RECORDED_CVE_IDS_BY_CPE}
+    path = str(tmp_path / "mirror.sqlite3")
+    mirror.close()
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        DROP INDEX cve_matches_product_row;
+        ALTER TABLE cve_matches DROP COLUMN cve_row;
+        CREATE INDEX cve_matches_product_range ON cve_matches (vendor, product, cve_id, criteria, version_range);
+    """)
+    connection.close()
+    mirror = NVDMirror(path)
+    assert {cpe_name: cve_details(mirror.get_vulnerabilities(cpe_name)) for cpe_name in RECORDED_CVE_IDS_BY_CPE} == CVEs
+    mirror.close()
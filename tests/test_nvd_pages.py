@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+
+import pytest
+
+from apis.cancellation import TaskCancelledError, cancellable
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.payloads import make_cpe_products, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+
+REQUESTED_PER_PAGE = 10
+
+
+class StubPages:
+    """
+    NVD answering at most max_per_page items of a page whatever was requested, the pages of the offsets in delays
+    answered that many seconds late
+    """
+    def __init__(self, items_count: int, max_per_page: int = REQUESTED_PER_PAGE):
+        self.products = make_cpe_products(items_count)
+        self.vulnerabilities = make_vulnerabilities(items_count, repos_per_cve=0)
+        self.max_per_page = max_per_page
+        self.delays = {}
+        self.offsets = []
+        self._lock = threading.Lock()
+
+    def routes(self) -> dict:
+        return {"/cpes/2.0": lambda path, query, body: self.__page(self.products, "products", query),
+                "/cves/2.0": lambda path, query, body: self.__page(self.vulnerabilities, "vulnerabilities", query)}
+
+    def __page(self, items, items_key, query):
+        offset = int(query["startIndex"])
+        with self._lock:
+            self.offsets.append(offset)
+        time.sleep(self.delays.get(offset, 0))
+        return json_response(nvd_page(items, items_key, {**query, "resultsPerPage": min(int(query["resultsPerPage"]), self.max_per_page)}))
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    servers = []
+
+    def serve_pages(stub: StubPages, backend: str = "threads") -> StubPages:
+        server = StubServer(stub.routes()).__enter__()
+        servers.append(server)
+        monkeypatch.setattr(NVD_API, "BASE_URL", server.base_url)
+        monkeypatch.setattr(NVD_API, "HTTP_BACKEND", backend)
+        return stub
+
+    for setting, value in {"RATE_LIMIT": None, "AUTHENTICATED_RATE_LIMIT": None, "CACHE_TTL": 0, "CPES_CACHE_TTL": 0, "CVES_CACHE_TTL": 0,
+                           "MAX_RETRIES": 0, "MIRROR": None, "CPES_PER_PAGE": REQUESTED_PER_PAGE, "CVES_PER_PAGE": REQUESTED_PER_PAGE,
+                           "CVES": SessionCache("nvd_cves", 0)}.items():
+        monkeypatch.setattr(NVD_API, setting, value)
+    monkeypatch.delenv(NVD_API.API_KEY_ENV, raising=False)
+    monkeypatch.delenv(NVD_API.MIRROR_PATH_ENV, raising=False)
+    yield serve_pages
+    NVD_API.close_sessions()
+    for server in servers:
+        server.__exit__()
+
+
+def CPE_names(stub: StubPages) -> list:
+    return [NVD_API.format_CPE(product) for product in stub.products]
+
+
+def raw_CVE_ids() -> list:
+    return [vulnerability["cve"]["id"] for page in NVD_API.iter_raw_CVE_pages("cpe:2.3:a:vendor:product:1.0:*:*:*:*:*:*:*")
+            for vulnerability in json.loads(page)["vulnerabilities"]]
+
+
+@pytest.mark.parametrize("backend", ["threads", "asyncio"])
+def test_a_short_first_page_sets_the_step_of_the_next_offsets(serve, backend):
+    stub = serve(StubPages(23, max_per_page=4), backend)
+
+    assert NVD_API.get_CPEs_by_keyword("product") == CPE_names(stub)
+    assert sorted(stub.offsets) == list(range(0, 23, 4))
+
+
+def test_a_short_first_page_of_raw_pages(serve):
+    stub = serve(StubPages(23, max_per_page=4))
+
+    assert raw_CVE_ids() == [vulnerability["cve"]["id"] for vulnerability in stub.vulnerabilities]
+    assert sorted(stub.offsets) == list(range(0, 23, 4))
+
+
+@pytest.mark.parametrize("backend", ["threads", "asyncio"])
+def test_a_total_that_is_a_multiple_of_the_page_size_asks_no_empty_page(serve, backend):
+    stub = serve(StubPages(3 * REQUESTED_PER_PAGE), backend)
+
+    assert NVD_API.get_CPEs_by_keyword("product") == CPE_names(stub)
+    assert raw_CVE_ids() == [vulnerability["cve"]["id"] for vulnerability in stub.vulnerabilities]
+    assert sorted(stub.offsets) == sorted([0, 10, 20] * 2)
+
+
+@pytest.mark.parametrize("backend", ["threads", "asyncio"])
+def test_the_pages_are_yielded_in_order_when_later_pages_finish_first(serve, backend):
+    stub = serve(StubPages(5 * REQUESTED_PER_PAGE), backend)
+    stub.delays = {10: 0.3, 20: 0.15}
+
+    assert NVD_API.get_CPEs_by_keyword("product") == CPE_names(stub)
+    assert raw_CVE_ids() == [vulnerability["cve"]["id"] for vulnerability in stub.vulnerabilities]
+
+
+@pytest.mark.parametrize("backend", ["threads", "asyncio"])
+def test_cancelling_after_the_first_page_stops_fetching(serve, backend):
+    stub = serve(StubPages(40 * REQUESTED_PER_PAGE), backend)
+    stub.delays = {offset: 0.1 for offset in range(REQUESTED_PER_PAGE, 40 * REQUESTED_PER_PAGE, REQUESTED_PER_PAGE)}
+    cancel_event = threading.Event()
+
+    with cancellable(cancel_event):
+        pages = NVD_API.iter_CPEs_by_keyword("product")
+        assert next(pages) == CPE_names(stub)[:REQUESTED_PER_PAGE]
+        cancel_event.set()
+        with pytest.raises(TaskCancelledError):
+            next(pages)
+    time.sleep(0.5) # the pages in flight when cancelled end, and no others are asked
+
+    assert len(stub.offsets) <= 1 + NVD_API.MAX_PARALLEL_PAGES
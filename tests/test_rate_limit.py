@@ -0,0 +1,139 @@
+import time
+import threading
+from email.utils import formatdate
+
+import pytest
+
+from apis.api_template import APITemplate, RateLimitError
+from apis.rate_limiter import TokenBucket
+from benchmarks.stub_server import StubServer, json_response
+
+
+def flaky_route(failures: int, headers_factory, status: int = 429):
+    """
+    answers status (with the headers of headers_factory) to the first failures requests of every path, then 200
+    """
+    attempts = {}
+    lock = threading.Lock()
+
+    def route(path, query, body):
+        with lock:
+            attempts[path] = attempts.get(path, 0) + 1
+            attempt = attempts[path]
+        if attempt <= failures:
+            return json_response({"message": "rate limited"}, status=status, headers=headers_factory())
+        return json_response({"ok": True})
+    return route
+
+
+@pytest.fixture
+def server():
+    routes = {
+        "/retry-after/": flaky_route(2, lambda: {"Retry-After": "0.2"}),
+        "/retry-after-date/": flaky_route(1, lambda: {"Retry-After": formatdate(time.time() + 1.5, usegmt=True)}),
+        "/retry-after-malformed/": flaky_route(2, lambda: {"Retry-After": "soon"}),
+        "/retry-after-too-long/": flaky_route(1, lambda: {"Retry-After": "3600"}),
+        "/ratelimit-reset/": flaky_route(1, lambda: {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 0.5)}),
+        "/ratelimit-reset-403/": flaky_route(1, lambda: {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(time.time() + 0.3)}, 403),
+        "/no-headers/": flaky_route(2, lambda: {}),
+        "/always/": flaky_route(10 ** 6, lambda: {}),
+        "/ok/": json_response({"ok": True}),
+    }
+    with StubServer(routes) as stub_server:
+        yield stub_server
+    APITemplate.close_sessions()
+
+
+@pytest.fixture
+def api(server):
+    class StubAPI(APITemplate):
+        BASE_URL = server.base_url
+        BACKOFF_BASE = 0.01
+        MAX_RETRIES = 3
+        MAX_RATE_LIMIT_WAIT = 60
+    return StubAPI
+
+
+def timed_get(api, url):
+    start = time.perf_counter()
+    res = api.get(url)
+    return res, time.perf_counter() - start
+
+
+def test_retry_after_seconds_is_honoured(api, server):
+    res, seconds = timed_get(api, "retry-after/a")
+    assert res.json() == {"ok": True}
+    assert server.requests_count == 3
+    assert seconds >= 0.4
+
+
+def test_retry_after_http_date_is_honoured(api, server):
+    res, seconds = timed_get(api, "retry-after-date/a")
+    assert res.json() == {"ok": True}
+    assert server.requests_count == 2
+    assert seconds >= 0.4 # HTTP dates have a resolution of a second
+
+
+def test_malformed_retry_after_falls_back_to_backoff(api, server):
+    res, seconds = timed_get(api, "retry-after-malformed/a")
+    assert res.json() == {"ok": True}
+    assert server.requests_count == 3
+    assert seconds < 1
+
+
+def test_ratelimit_reset_is_honoured(api, server):
+    res, seconds = timed_get(api, "ratelimit-reset/a")
+    assert res.json() == {"ok": True}
+    assert server.requests_count == 2
+    assert seconds >= 0.3
+
+
+def test_github_style_403_is_retried_after_reset(api, server):
+    res, _ = timed_get(api, "ratelimit-reset-403/a")
+    assert res.json() == {"ok": True}
+    assert server.requests_count == 2
+
+
+def test_backoff_without_headers(api, server):
+    res, _ = timed_get(api, "no-headers/a")
+    assert res.json() == {"ok": True}
+    assert server.requests_count == 3
+
+
+def test_retries_are_bounded(api, server):
+    with pytest.raises(RateLimitError):
+        api.get("always/a")
+    assert server.requests_count == api.MAX_RETRIES + 1
+
+
+def test_wait_above_max_rate_limit_wait_fails_at_once(api, server):
+    start = time.perf_counter()
+    with pytest.raises(RateLimitError, match="3600 seconds"):
+        api.get("retry-after-too-long/a")
+    assert server.requests_count == 1
+    assert time.perf_counter() - start < 1
+
+
+def test_token_bucket_spaces_requests(server):
+    class LimitedStubAPI(APITemplate):
+        BASE_URL = server.base_url
+        RATE_LIMIT = (2, 0.2) # a burst of 2, then a request every 0.1 seconds
+
+    start = time.perf_counter()
+    for i in range(6):
+        LimitedStubAPI.get(f"ok/{i}")
+    assert time.perf_counter() - start >= 0.35
+    assert server.requests_count == 6
+
+
+def test_token_bucket_refuses_waits_above_max_wait():
+    bucket = TokenBucket(1, 10)
+    assert bucket.reserve(0) == 0
+    assert bucket.reserve(5) is None # the next token is 10 seconds away
+    assert bucket.reserve(60) == pytest.approx(10, abs=0.1)
+
+
+def test_token_bucket_pause_holds_callers_back():
+    bucket = TokenBucket(10, 1)
+    bucket.pause(2)
+    assert bucket.reserve(60) == pytest.approx(2, abs=0.05)
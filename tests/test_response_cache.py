@@ -0,0 +1,124 @@
+import pytest
+
+from apis import response_cache
+from apis.api_template import APITemplate
+from apis.response_cache import ResponseCache
+from benchmarks.stub_server import StubServer, json_response
+
+BODY = b"x" * 100
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        self.now += 1 # every call is a second later, so the accesses are ordered
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock.time)
+    return clock
+
+
+def keys(cache: ResponseCache) -> list:
+    return sorted(key for key, in cache._connection.execute("SELECT key FROM responses"))
+
+
+def test_an_entry_is_served_within_its_ttl_only(clock):
+    cache = ResponseCache(":memory:")
+    cache.set("a", BODY)
+
+    assert cache.get("a", 60) == BODY
+    clock.now += 120
+    assert cache.get("a", 60) is None
+    assert cache.get("a", 3600) == BODY # a longer TTL of the same entry
+    clock.now += 24 * 60 * 60
+    assert cache.get("a", 10 ** 9) is None # but none longer than max_age
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_an_entry_older_than_max_age_is_purged_on_lookup(clock):
+    cache = ResponseCache(":memory:", max_age=3600)
+    cache.set("a", BODY)
+    clock.now += 7200
+
+    assert cache.get("a", 60) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
+
+
+def test_the_entries_older_than_max_age_are_purged_on_open(tmp_path, clock):
+    path = str(tmp_path / "responses.sqlite3")
+    cache = ResponseCache(path, max_age=3600)
+    cache.set("old", BODY)
+    clock.now += 7200
+    cache.set("new", BODY * 2)
+    cache.close()
+
+    reopened = ResponseCache(path, max_age=3600)
+
+    assert keys(reopened) == ["new"]
+    assert reopened.stats()["bytes"] == 200
+
+
+def test_the_least_recently_used_entries_are_evicted_above_max_bytes(clock):
+    cache = ResponseCache(":memory:", max_bytes=300)
+    for key in "abc":
+        cache.set(key, BODY)
+    cache.get("a", 3600) # "b" is now the least recently used
+
+    cache.set("d", BODY)
+
+    assert keys(cache) == ["a", "d"] # down to 90% of max_bytes, "b" and then "c"
+    assert cache.stats()["bytes"] == 200
+
+
+def test_expired_entries_are_evicted_before_recently_used_ones(clock):
+    cache = ResponseCache(":memory:", max_bytes=350, max_age=3600)
+    cache.set("expired", BODY)
+    clock.now += 3000
+    cache.set("a", BODY)
+    cache.set("b", BODY)
+    assert cache.get("expired", 3600) == BODY # the most recently used entry
+    clock.now += 1000
+
+    cache.set("c", BODY)
+
+    assert keys(cache) == ["a", "b", "c"] # within 90% of max_bytes once the expired one is gone
+
+
+def test_nothing_is_evicted_below_max_bytes(clock):
+    cache = ResponseCache(":memory:", max_bytes=1000)
+    statements = []
+    cache._connection.set_trace_callback(statements.append)
+
+    for key in range(10):
+        cache.set(str(key), BODY)
+    cache.set("0", BODY) # replaced, not added
+
+    assert len(keys(cache)) == 10
+    assert cache.stats()["bytes"] == 1000
+    assert not any(statement.startswith("DELETE") for statement in statements)
+
+
+@pytest.mark.parametrize("status, cached", [(200, True), (203, True), (300, False), (404, False), (500, False)])
+def test_only_2xx_responses_are_cached(monkeypatch, status, cached):
+    cache = ResponseCache(":memory:")
+    monkeypatch.setattr(APITemplate, "_cache", cache)
+    with StubServer({"/answer": json_response({"status": status}, status=status)}) as server:
+        class StubAPI(APITemplate):
+            BASE_URL = server.base_url
+            CACHE_TTL = 3600
+            MAX_RETRIES = 0
+
+        try:
+            StubAPI.get("answer")
+        except Exception:
+            pass # e.g. the error of a 404
+        APITemplate.close_sessions()
+
+    assert (cache.get(f"{server.base_url}/answer", 3600) is not None) == cached
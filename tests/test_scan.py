@@ -0,0 +1,104 @@
+import csv
+import json
+
+import pytest
+
+import scan
+from apis.github_api import GITHUB_API
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+
+CPE_NAMES = [make_cpe_name(i) for i in range(4)]
+CVES_PER_CPE = 5
+
+
+class StubBackends:
+    """
+    NVD answering CVES_PER_CPE CVEs for every CPE, except the ones in failing which it answers 500 once
+    """
+    def __init__(self):
+        self.failing = set()
+        self.scanned = []
+
+    def routes(self) -> dict:
+        return {"/cves/2.0": self.__cves,
+                "/repos/": lambda path, query, body: json_response({"stargazers_count": len(path), "forks": 1})}
+
+    def __cves(self, path, query, body):
+        cpe_name = query["cpeName"]
+        if cpe_name in self.failing:
+            self.failing.discard(cpe_name)
+            return json_response({"message": "Server Error"}, status=500)
+        self.scanned.append(cpe_name)
+        return json_response(nvd_page(make_vulnerabilities(CVES_PER_CPE, cpe_name, repos_per_cve=1, seed=CPE_NAMES.index(cpe_name)),
+                                      "vulnerabilities", query))
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    stub = StubBackends()
+    with StubServer(stub.routes()) as server:
+        for api in (NVD_API, GITHUB_API):
+            monkeypatch.setattr(api, "BASE_URL", server.base_url)
+            monkeypatch.setattr(api, "RATE_LIMIT", None)
+            monkeypatch.setattr(api, "CACHE_TTL", 0)
+            monkeypatch.setattr(api, "MAX_RETRIES", 0)
+            monkeypatch.setattr(api, "HTTP_BACKEND", "threads")
+            monkeypatch.delenv(api.API_KEY_ENV, raising=False)
+        monkeypatch.setattr(GITHUB_API, "AUTHENTICATED_RATE_LIMIT", None)
+        monkeypatch.setattr(GITHUB_API, "REPOSITORIES", SessionCache("github_repositories", 1000))
+        monkeypatch.setattr(NVD_API, "CVES_CACHE_TTL", 0)
+        monkeypatch.setattr(NVD_API, "CVES", SessionCache("nvd_cves", 1000))
+        monkeypatch.setattr(NVD_API, "MIRROR", None)
+        monkeypatch.delenv(NVD_API.MIRROR_PATH_ENV, raising=False)
+        yield stub
+    NVD_API.close_sessions()
+
+
+def run_scan(capsys, *arguments: str) -> dict:
+    """
+    runs the scan and returns the stats it reports on stderr
+    """
+    capsys.readouterr()
+    scan.main(list(arguments))
+    err = capsys.readouterr().err
+    return json.loads(err[err.rindex('{\n  "wall_seconds"'):])
+
+
+def test_a_scan_run_again_resumes_from_its_checkpoint(tmp_path, capsys, backends):
+    inventory, output, checkpoint = tmp_path / "inventory.txt", tmp_path / "scan.csv", tmp_path / "checkpoint.txt"
+    inventory.write_text("\n".join(["# the inventory", *CPE_NAMES, CPE_NAMES[0], ""]), encoding="utf-8")
+    checkpoint.write_text(make_cpe_name(100) + "\n", encoding="utf-8") # completed by a scan of another inventory
+    arguments = (str(inventory), "--format", "csv", "--output", str(output), "--checkpoint", str(checkpoint))
+    backends.failing.add(CPE_NAMES[2])
+
+    first_counts = run_scan(capsys, *arguments)["counts"]
+
+    assert (first_counts["cpes"], first_counts["failed_cpes"], first_counts["skipped_cpes"]) == (3, 1, 0)
+    assert set(checkpoint.read_text(encoding="utf-8").split()) == {make_cpe_name(100), *CPE_NAMES} - {CPE_NAMES[2]}
+
+    second_counts = run_scan(capsys, *arguments)["counts"]
+
+    assert (second_counts["cpes"], second_counts["failed_cpes"], second_counts["skipped_cpes"]) == (1, 0, 3)
+    assert sorted(backends.scanned) == sorted(CPE_NAMES) # the failed CPE once more, and none of the others
+    with open(output, encoding="utf-8", newline="") as output_file:
+        rows = list(csv.reader(output_file))
+    assert rows[0] == list(scan.CSV_COLUMNS)
+    assert list(scan.CSV_COLUMNS) not in rows[1:] # not written again when appending
+    assert sorted({row[0] for row in rows[1:]}) == sorted(CPE_NAMES)
+    assert len(rows) == 1 + len(CPE_NAMES) * CVES_PER_CPE
+    assert all(row[5] for row in rows[1:]) # enriched with the repos
+
+
+def test_a_finished_scan_run_again_scans_nothing(tmp_path, capsys, backends):
+    inventory, output, checkpoint = tmp_path / "inventory.txt", tmp_path / "scan.jsonl", tmp_path / "checkpoint.txt"
+    inventory.write_text("\n".join(CPE_NAMES), encoding="utf-8")
+    arguments = (str(inventory), "--output", str(output), "--checkpoint", str(checkpoint))
+
+    run_scan(capsys, *arguments)
+    counts = run_scan(capsys, *arguments)["counts"]
+
+    assert (counts["cpes"], counts["skipped_cpes"], counts["rows"]) == (0, len(CPE_NAMES), 0)
+    assert len(output.read_text(encoding="utf-8").splitlines()) == len(CPE_NAMES) * CVES_PER_CPE
@@ -0,0 +1,132 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from apis.github_api import GITHUB_API
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.bench_session_cache import search_and_enrich
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+
+CPE_NAMES = [make_cpe_name(i) for i in range(3)]
+CVES_PER_CPE = 40
+STEP = 10 # every CPE shares 30 of its CVEs with the next one
+THREADS = 8
+
+
+class StubBackends:
+    """
+    NVD answering the CVEs of sibling CPEs and GitHub answering every repo, except the ones in failing which answer 500 once
+    """
+    def __init__(self):
+        self.vulnerabilities = make_vulnerabilities(CVES_PER_CPE + STEP * (len(CPE_NAMES) - 1), repos_per_cve=2)
+        self.repo_requests = Counter()
+        self.failing = set()
+        self._lock = threading.Lock()
+
+    def routes(self) -> dict:
+        return {"/cves/2.0": self.__cves, "/repos/": self.__repo}
+
+    def CVEs_of(self, cpe_name: str) -> list:
+        start = CPE_NAMES.index(cpe_name) * STEP
+        return self.vulnerabilities[start:start + CVES_PER_CPE]
+
+    def __cves(self, path, query, body):
+        return json_response(nvd_page(self.CVEs_of(query["cpeName"]), "vulnerabilities", query))
+
+    def __repo(self, path, query, body):
+        with self._lock:
+            self.repo_requests[path] += 1
+            if path in self.failing:
+                self.failing.discard(path)
+                return json_response({"message": "Server Error"}, status=500)
+        return json_response({"stargazers_count": len(path), "forks": len(path) // 2})
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    stub = StubBackends()
+    with StubServer(stub.routes(), latency=0.002) as server:
+        for api in (NVD_API, GITHUB_API):
+            monkeypatch.setattr(api, "BASE_URL", server.base_url)
+            monkeypatch.setattr(api, "RATE_LIMIT", None)
+            monkeypatch.setattr(api, "CACHE_TTL", 0)
+            monkeypatch.setattr(api, "MAX_RETRIES", 0)
+            monkeypatch.setattr(api, "HTTP_BACKEND", "threads")
+            monkeypatch.delenv(api.API_KEY_ENV, raising=False)
+        monkeypatch.setattr(GITHUB_API, "AUTHENTICATED_RATE_LIMIT", None)
+        monkeypatch.setattr(NVD_API, "CVES_CACHE_TTL", 0)
+        monkeypatch.setattr(NVD_API, "MIRROR", None)
+        monkeypatch.delenv(NVD_API.MIRROR_PATH_ENV, raising=False)
+        yield stub
+    NVD_API.close_sessions()
+
+
+def session_caches(monkeypatch, max_entries: int) -> None:
+    monkeypatch.setattr(NVD_API, "CVES", SessionCache("nvd_cves", max_entries))
+    monkeypatch.setattr(GITHUB_API, "REPOSITORIES", SessionCache("github_repositories", max_entries))
+
+
+def all_repo_urls(stub: StubBackends) -> list:
+    return sorted({url for cve in NVD_API.parse_CVEs(vulnerability["cve"] for vulnerability in stub.vulnerabilities)
+                   for url in cve.relevant_repositories_urls})
+
+
+def test_concurrent_threads_request_every_repo_once(monkeypatch, backends):
+    session_caches(monkeypatch, 50000)
+    repo_urls = all_repo_urls(backends)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        resolved = list(executor.map(lambda _: GITHUB_API.get_repositories_details(repo_urls), range(THREADS)))
+
+    assert all(sorted(repositories) == repo_urls for repositories in resolved) # the threads waiting for a repo get it too
+    assert len(backends.repo_requests) == len(repo_urls)
+    assert set(backends.repo_requests.values()) == {1}
+
+
+def test_sibling_searches_share_the_enriched_CVE_objects(monkeypatch, backends):
+    session_caches(monkeypatch, 50000)
+    search_and_enrich(CPE_NAMES[:1])
+    first_CVEs = {cve.cve_id: cve for cve in NVD_API.get_vulnerabilities_by_cpe_and_severity(CPE_NAMES[0])}
+
+    search_and_enrich(CPE_NAMES[1:2])
+    shared_CVEs = [cve for cve in NVD_API.get_vulnerabilities_by_cpe_and_severity(CPE_NAMES[1]) if cve.cve_id in first_CVEs]
+
+    assert len(shared_CVEs) == CVES_PER_CPE - STEP
+    assert all(cve is first_CVEs[cve.cve_id] for cve in shared_CVEs)
+    assert all(cve.relevant_repositories_list and not cve.missing_repositories_urls for cve in shared_CVEs)
+    assert set(backends.repo_requests.values()) == {1} # the shared CVEs' repos were not asked again
+
+
+def test_a_repo_that_failed_is_fetched_by_the_next_search(monkeypatch, backends):
+    session_caches(monkeypatch, 50000)
+    cve = NVD_API.parse_CVEs([backends.CVEs_of(CPE_NAMES[1])[0]["cve"]])[0] # shared by the first two CPEs
+    failed_url, fetched_url = cve.relevant_repositories_urls
+    backends.failing.add(f"/{failed_url}")
+
+    search_and_enrich(CPE_NAMES[:1])
+    shared_cve = NVD_API.CVES.get(cve.cve_id)
+    assert shared_cve.missing_repositories_urls == [failed_url]
+    assert [repo.name for repo in shared_cve.relevant_repositories_list] == [fetched_url.split("/")[-1]]
+
+    search_and_enrich(CPE_NAMES[1:2])
+    assert shared_cve.missing_repositories_urls == []
+    assert len(shared_cve.relevant_repositories_list) == 2
+    assert backends.repo_requests[f"/{failed_url}"] == 2
+    assert backends.repo_requests[f"/{fetched_url}"] == 1
+
+
+def test_the_session_caches_do_not_change_the_enriched_CVEs(monkeypatch, backends):
+    session_caches(monkeypatch, 0)
+    uncached = search_and_enrich(CPE_NAMES)
+    uncached_requests = sum(backends.repo_requests.values())
+    backends.repo_requests.clear()
+
+    session_caches(monkeypatch, 50000)
+    cached = search_and_enrich(CPE_NAMES)
+
+    assert cached == uncached
+    assert sum(backends.repo_requests.values()) < uncached_requests
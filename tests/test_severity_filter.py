@@ -0,0 +1,94 @@
+import pytest
+
+from apis.nvd_api import NVD_API
+from apis.session_cache import SessionCache
+from benchmarks.bench_severity_filter import make_history, matches_query
+from benchmarks.payloads import make_cpe_name, make_vulnerabilities, nvd_page
+from benchmarks.stub_server import StubServer, json_response
+
+CPE_NAME = make_cpe_name(0)
+EDGE_SCORES = (3.9, 4.0, 6.9, 7.0, 8.9, 9.0, 9.4, 9.5, 10.0) # the ends of the bands and the thresholds
+THRESHOLDS = (0, 4.0, 7.0, 7.5, 9.0, 9.5, 10.0)
+
+
+def with_metrics(vulnerability: dict, v3_score=None, v2_score=None) -> dict:
+    metrics = vulnerability["cve"]["metrics"]
+    if v3_score is None:
+        del metrics["cvssMetricV31"]
+    else:
+        metrics["cvssMetricV31"][0]["cvssData"]["baseScore"] = v3_score
+    if v2_score is None:
+        del metrics["cvssMetricV2"]
+    else:
+        metrics["cvssMetricV2"][0]["cvssData"]["baseScore"] = v2_score
+    return vulnerability
+
+
+def make_edge_cases() -> list:
+    """
+    CVEs scored exactly at the ends of the bands by v3 only, by v2 only, by both disagreeing, and not scored at all
+    """
+    scores = [(score, None) for score in EDGE_SCORES] + [(None, score) for score in EDGE_SCORES] + \
+             [(6.9, 7.5), (7.0, 3.0), (9.0, 6.9), (3.9, 10.0), (None, None)]
+    vulnerabilities = make_vulnerabilities(len(scores), CPE_NAME, repos_per_cve=1, seed=1)
+    return [with_metrics(vulnerability, v3_score, v2_score) for vulnerability, (v3_score, v2_score) in zip(vulnerabilities, scores)]
+
+
+@pytest.fixture(params=["history", "edge_cases"])
+def stub_nvd(request):
+    vulnerabilities = make_history(600, CPE_NAME) if request.param == "history" else make_edge_cases()
+    route = lambda path, query, body: json_response(nvd_page([vulnerability for vulnerability in vulnerabilities if matches_query(vulnerability, query)],
+                                                             "vulnerabilities", query))
+    with StubServer({"/cves/2.0": route}) as server:
+        class StubNVD_API(NVD_API):
+            BASE_URL = server.base_url
+            RATE_LIMIT = None
+            CVES_CACHE_TTL = 0
+            MAX_RETRIES = 0
+            CVES = SessionCache("nvd_cves", 0)
+            HTTP_BACKEND = "threads"
+
+            @classmethod
+            def get_api_key(cls):
+                return None
+
+            @classmethod
+            def get_mirror(cls):
+                return None
+        yield StubNVD_API, server
+    NVD_API.close_sessions()
+
+
+@pytest.mark.parametrize("min_severity", THRESHOLDS)
+def test_server_filter_keeps_the_CVEs_the_local_filter_keeps(stub_nvd, min_severity):
+    api, _ = stub_nvd
+    all_CVEs = api.get_vulnerabilities_by_cpe_and_severity(CPE_NAME, 0) # min_severity 0 sends no severity filter
+    CVEs = api.get_vulnerabilities_by_cpe_and_severity(CPE_NAME, min_severity)
+    assert sorted(cve.cve_id for cve in CVEs) == sorted(cve.cve_id for cve in all_CVEs if cve.severity >= min_severity)
+    assert len({cve.cve_id for cve in CVEs}) == len(CVEs) # the bands of both versions overlap, their CVEs are returned once
+
+
+@pytest.mark.parametrize("min_severity", THRESHOLDS)
+def test_server_filter_matches_a_local_only_filter(stub_nvd, min_severity):
+    api, _ = stub_nvd
+
+    class LocalFilterNVD_API(api):
+        SERVER_FILTER_MIN_SEVERITY = float("inf")
+
+    server_filtered = api.get_vulnerabilities_by_cpe_and_severity(CPE_NAME, min_severity)
+    locally_filtered = LocalFilterNVD_API.get_vulnerabilities_by_cpe_and_severity(CPE_NAME, min_severity)
+    assert sorted((cve.cve_id, cve.severity) for cve in server_filtered) == sorted((cve.cve_id, cve.severity) for cve in locally_filtered)
+
+
+def test_thresholds_below_the_server_filter_send_a_single_query(stub_nvd):
+    api, server = stub_nvd
+    requests_before = server.requests_count
+    api.get_vulnerabilities_by_cpe_and_severity(CPE_NAME, api.SERVER_FILTER_MIN_SEVERITY - 0.1)
+    assert server.requests_count - requests_before == 1
+
+
+def test_high_thresholds_query_only_the_bands_above_them(stub_nvd):
+    api, server = stub_nvd
+    requests_before = server.requests_count
+    api.get_vulnerabilities_by_cpe_and_severity(CPE_NAME, 9.0) # v3 CRITICAL and v2 HIGH, one page each
+    assert server.requests_count - requests_before == 2
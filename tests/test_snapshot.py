@@ -0,0 +1,88 @@
+import zlib
+
+import pytest
+
+from benchmarks.bench_cve_table import make_CVEs
+from classes.snapshot import HEADER, MAGIC, SECTION_ENTRY, VERSION, Snapshot, SnapshotError, SnapshotWriter
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    return Snapshot("cpe:2.3:a:vendor:product:1.0:*:*:*:*:*:*:*", CVEs=make_CVEs(20), min_severity=4.0)
+
+
+def encode_stored(stored_sections) -> bytes:
+    """
+    like SnapshotWriter.encode, for sections already compressed (or not compressed at all)
+    """
+    offset = HEADER.size + SECTION_ENTRY.size * len(stored_sections)
+    directory = []
+    for name, stored, raw_length in stored_sections:
+        directory.append(SECTION_ENTRY.pack(name.encode("ascii"), offset, len(stored), raw_length, zlib.crc32(stored)))
+        offset += len(stored)
+    return b"".join((HEADER.pack(MAGIC, VERSION, len(stored_sections)), *directory, *(stored for _, stored, _ in stored_sections)))
+
+
+def load_bytes(tmp_path, data: bytes) -> Snapshot:
+    path = tmp_path / "snapshot.cvesnap"
+    path.write_bytes(data)
+    return Snapshot.load(str(path))
+
+
+def load_sections(tmp_path, sections) -> Snapshot:
+    return load_bytes(tmp_path, SnapshotWriter.encode(sections))
+
+
+def test_round_trip(tmp_path, snapshot):
+    path = tmp_path / "snapshot.cvesnap"
+    snapshot.dump(str(path))
+    loaded = Snapshot.load(str(path))
+
+    assert (loaded.title, loaded.min_severity, loaded.CVEs) == (snapshot.title, snapshot.min_severity, snapshot.CVEs)
+
+
+def test_every_truncation_raises_snapshot_error(tmp_path, snapshot):
+    data = SnapshotWriter.encode(SnapshotWriter.sections(snapshot))
+    for length in range(0, len(data), 7):
+        with pytest.raises(SnapshotError):
+            load_bytes(tmp_path, data[:length])
+
+
+def test_every_flipped_byte_raises_snapshot_error_or_loads(tmp_path, snapshot):
+    data = SnapshotWriter.encode(SnapshotWriter.sections(snapshot))
+    for position in range(len(data)):
+        corrupted = bytearray(data)
+        corrupted[position] ^= 0xFF
+        try:
+            load_bytes(tmp_path, bytes(corrupted))
+        except SnapshotError:
+            pass # anything else, zlib.error or struct.error among them, fails the test
+
+
+def test_a_section_that_is_not_zlib_with_a_matching_crc_raises_snapshot_error(tmp_path, snapshot):
+    stored_sections = [(name, zlib.compress(raw), len(raw)) for name, raw in SnapshotWriter.sections(snapshot).items()]
+    stored_sections[0] = (stored_sections[0][0], b"not zlib at all", stored_sections[0][2])
+
+    with pytest.raises(SnapshotError, match="meta section .* is corrupted"):
+        load_bytes(tmp_path, encode_stored(stored_sections))
+
+
+@pytest.mark.parametrize("name, raw, message", [
+    ("meta", b"{not json", "meta section .* is corrupted"),
+    ("meta", b"{}", "meta section .* is corrupted"),
+    ("severities", b"\0" * 7, "severities section .* is corrupted"), # not a whole number of doubles
+    ("descriptions.text", b"\xff\xfe", "descriptions.text section .* is corrupted"),
+    ("cve_ids.lengths", b"\1\0\0\0", "cve_ids sections .* do not match"),
+    ("repos", b"\xff\xff\xff\xff", "repos section .* is corrupted"), # a repo index past the repos
+])
+def test_a_corrupted_section_raises_snapshot_error(tmp_path, snapshot, name, raw, message):
+    sections = SnapshotWriter.sections(snapshot)
+    sections[name] = raw
+
+    with pytest.raises(SnapshotError, match=message):
+        load_sections(tmp_path, sections)
+
+
+def test_a_directory_past_the_end_of_the_file_raises_snapshot_error(tmp_path):
+    with pytest.raises(SnapshotError, match="truncated"):
+        load_bytes(tmp_path, HEADER.pack(MAGIC, VERSION, 3) + b"\0" * SECTION_ENTRY.size)
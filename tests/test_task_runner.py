@@ -0,0 +1,61 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from apis import cancellation
+from apis.api_template import APITemplate
+from benchmarks.stub_server import StubServer, json_response
+from task_runner import TkTaskRunner
+
+
+class AfterQueue:
+    """
+    the after() of a Tk master, recording the callbacks instead of running them, the tests read the results queue directly
+    """
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, callback):
+        self.callbacks.append(callback)
+
+
+@pytest.fixture
+def rate_limited_api():
+    routes = {"/": json_response({"message": "rate limited"}, status=429, headers={"Retry-After": "30"})}
+    with StubServer(routes) as server:
+        class StubAPI(APITemplate):
+            BASE_URL = server.base_url
+            MAX_RETRIES = 2
+        yield StubAPI
+    APITemplate.close_sessions()
+
+
+def test_shutdown_wakes_a_task_waiting_on_a_rate_limit(rate_limited_api):
+    runner = TkTaskRunner(AfterQueue())
+    task = runner.submit(lambda task: rate_limited_api.get("slow"), on_done=lambda _: None)
+    time.sleep(0.3) # the worker is now waiting for the 30 seconds the server asked for
+    start = time.perf_counter()
+    runner.shutdown()
+    finished_task, kind, _ = runner._results.get(timeout=5)
+    assert finished_task is task and kind == "cancelled"
+    assert time.perf_counter() - start < 1
+
+
+def test_cancellation_reaches_the_threads_of_an_inner_executor():
+    cancel_event = threading.Event()
+    with cancellation.cancellable(cancel_event), ThreadPoolExecutor(2) as executor:
+        sleeps = [executor.submit(cancellation.propagated(cancellation.sleep), 30) for _ in range(2)]
+        start = time.perf_counter()
+        cancel_event.set()
+        for sleep in sleeps:
+            with pytest.raises(cancellation.TaskCancelledError):
+                sleep.result(timeout=5)
+    assert time.perf_counter() - start < 1
+
+
+def test_sleep_outside_of_a_task_is_not_cancellable():
+    start = time.perf_counter()
+    cancellation.sleep(0.05)
+    assert time.perf_counter() - start >= 0.05